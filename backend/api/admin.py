@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import UserProfile, BlacklistRecord, AuditApplication, Wallet, Transaction, Notification, Conversation, \
-    Message
+    ConversationMember, Message
 
 
 @admin.register(UserProfile)
@@ -153,6 +153,13 @@ class NotificationAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
 
+class ConversationMemberInline(admin.TabularInline):
+    model = ConversationMember
+    extra = 0
+    raw_id_fields = ('user',)
+    readonly_fields = ('joined_at',)
+
+
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ('get_participants', 'last_message', 'last_message_time', 'created_at')
@@ -160,6 +167,7 @@ class ConversationAdmin(admin.ModelAdmin):
     search_fields = ('last_message',)
     readonly_fields = ('created_at',)
     ordering = ('-last_message_time',)
+    inlines = (ConversationMemberInline,)
 
     def get_participants(self, obj):
         return ', '.join([user.username for user in obj.participants.all()])
@@ -0,0 +1,84 @@
+# backend/api/announcement_service.py
+"""
+生效公告集合
+
+按 start_time / end_time 计算当前生效的公告（按 -priority, -created_at, -id 排序，
+按类型分组）存入缓存，同时记下集合下一次变化的时间点（最近的开始时间或结束时间），
+到点后才重新查询；公告增删改后由 signals.py 清除缓存。接口读取时只查缓存
+"""
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from .models import Announcement
+from .projections import AnnouncementProjection
+
+CACHE_KEY = 'announcements:active'
+MAX_CACHE_SECONDS = 3600  # 兜底：即使没有时间点到达也定期重建（防止漏掉的失效，如 queryset.update）
+ORDERING = ('-priority', '-created_at', '-id')
+
+
+def _build(now):
+    """查询当前生效的公告，以及集合下一次变化的时间点"""
+    candidates = Announcement.objects.filter(is_active=True).filter(Q(end_time__isnull=True) | Q(end_time__gte=now))
+
+    boundaries = []
+    for start_time, end_time in candidates.values_list('start_time', 'end_time'):
+        if start_time and start_time > now:
+            boundaries.append(start_time)
+        if end_time:
+            # 与 Announcement.is_currently_active 一致：end_time 当刻仍生效，之后失效
+            boundaries.append(end_time + timedelta(microseconds=1))
+
+    live = candidates.filter(Q(start_time__isnull=True) | Q(start_time__lte=now))
+    rows = list(AnnouncementProjection.project(live, list(AnnouncementProjection.fields), ORDERING).order_by(*ORDERING))
+    by_type = {}
+    for row in rows:
+        by_type.setdefault(row['announcement_type'], []).append(row)
+
+    return {
+        'all': rows,
+        'by_type': by_type,
+        'next_change': min(boundaries) if boundaries else None
+    }
+
+
+def _load():
+    now = timezone.now()
+    entry = cache.get(CACHE_KEY)
+    if entry is not None and (entry['next_change'] is None or now < entry['next_change']):
+        return entry
+
+    entry = _build(now)
+    cache.set(CACHE_KEY, entry, _seconds_until(entry['next_change'], now, MAX_CACHE_SECONDS))
+    return entry
+
+
+def _seconds_until(moment, now, limit):
+    if moment is None:
+        return limit
+    return max(1, min(limit, math.ceil((moment - now).total_seconds())))
+
+
+def get_active_announcements(announcement_type=None):
+    """
+    当前生效的公告（values() 行，含 AnnouncementProjection 的全部列），已排序
+
+    Args:
+        announcement_type: 只返回该类型，为空时返回全部
+    """
+    entry = _load()
+    if announcement_type:
+        return entry['by_type'].get(announcement_type, [])
+    return entry['all']
+
+
+def response_cache_timeout():
+    """公告接口响应缓存的秒数：不超过默认值，且在生效集合变化时到期"""
+    return _seconds_until(_load()['next_change'], timezone.now(), settings.PUBLIC_RESPONSE_CACHE_TIMEOUT)
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
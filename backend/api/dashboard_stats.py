@@ -0,0 +1,314 @@
+# backend/api/dashboard_stats.py
+import time
+import logging
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .db_utils import bulk_upsert
+from .models import AuditApplication, DailyStats, Order, StatsCounter, UserFeedback, UserProfile, Wallet
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEYS = (
+    'users_total', 'users_verified', 'users_riders', 'users_blacklisted',
+    'orders_total', 'orders_pending', 'orders_completed',
+    'feedbacks_pending', 'applications_pending',
+    'wallet_balance', 'wallet_frozen',
+)
+DAILY_FIELDS = ('new_users', 'new_orders', 'completed_orders')
+
+CACHE_KEY = 'dashboard_stats'
+REFRESH_LOCK_KEY = 'dashboard_stats:refreshing'
+FRESH_SECONDS = 30  # 看板数据的新鲜期；recount_stats --loop 在新鲜期内定时刷新
+STALE_SECONDS = 600  # 过了新鲜期后旧数据最多再保留的时间
+REFRESH_LOCK_SECONDS = 30  # 刷新锁超时，重建的请求异常退出时到期释放
+
+
+def _local_date(value):
+    if value is None:
+        return None
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+# ===== 各模型对统计的贡献 =====
+# 返回 {统计项: 数值}，每日统计的键为 (日期, 字段)
+
+def _user_stats(user):
+    return {'users_total': 1, (_local_date(user.date_joined), 'new_users'): 1}
+
+
+def _profile_stats(profile):
+    return {
+        'users_verified': int(profile.is_verified),
+        'users_riders': int(profile.is_rider),
+        'users_blacklisted': int(profile.is_blacklisted),
+    }
+
+
+def _order_stats(order):
+    stats = {
+        'orders_total': 1,
+        'orders_pending': int(order.status == 'pending'),
+        'orders_completed': int(order.status == 'completed'),
+    }
+    if order.created_at:
+        stats[(_local_date(order.created_at), 'new_orders')] = 1
+    if order.status == 'completed' and order.completed_at:
+        stats[(_local_date(order.completed_at), 'completed_orders')] = 1
+    return stats
+
+
+def _feedback_stats(feedback):
+    return {'feedbacks_pending': int(feedback.status == 'pending')}
+
+
+def _application_stats(application):
+    return {'applications_pending': int(application.status == 'pending')}
+
+
+def _wallet_stats(wallet):
+    # 未从数据库读取的实例上可能是 float 默认值
+    return {
+        'wallet_balance': Decimal(str(wallet.balance)),
+        'wallet_frozen': Decimal(str(wallet.frozen_balance)),
+    }
+
+
+# 模型 -> (保存时可能变化的字段, 贡献函数)；字段为空表示只在创建和删除时变化，
+# 否则模型需继承 LoadedRowMixin（保存时按读出的列计算变化量）
+TRACKED = {
+    User: ((), _user_stats),
+    UserProfile: (('is_verified', 'is_rider', 'is_blacklisted'), _profile_stats),
+    Order: (('status', 'created_at', 'completed_at'), _order_stats),
+    UserFeedback: (('status',), _feedback_stats),
+    AuditApplication: (('status',), _application_stats),
+    Wallet: (('balance', 'frozen_balance'), _wallet_stats),
+}
+
+
+def _loaded_values(instance, fields):
+    """
+    读出时的字段值：上次保存后的值，或 from_db 记下的列（LoadedRowMixin）
+
+    字段被 defer 的实例返回 None，其变化由定时全量重算（recount_stats）修正
+    """
+    loaded = instance.__dict__.get('_stats_loaded')
+    if loaded is not None:
+        return loaded
+    row = instance.__dict__.get('_loaded_row')
+    if row is None:
+        return None
+    values = dict(zip(*row))
+    if any(field not in values for field in fields):
+        return None
+    return {field: values[field] for field in fields}
+
+
+def track_save(sender, instance, created, update_fields=None):
+    """
+    保存后按读出时和保存后的贡献之差更新统计（post_save 调用）
+
+    两个请求基于同一份旧数据并发保存同一行时，变化量会被重复计入；
+    这类偏差由 recount_stats 定时全量重算修正
+    """
+    fields, contribute = TRACKED[sender]
+    if created:
+        record(contribute(instance))
+        saved = {field: getattr(instance, field) for field in fields}
+    else:
+        loaded = _loaded_values(instance, fields)
+        if loaded is None:
+            return
+        saved = {
+            field: getattr(instance, field) if update_fields is None or field in update_fields else loaded[field]
+            for field in fields
+        }
+        deltas = Counter(contribute(SimpleNamespace(**saved)))
+        deltas.subtract(contribute(SimpleNamespace(**loaded)))
+        record(deltas)
+    if fields:
+        instance._stats_loaded = saved
+
+
+def track_delete(sender, instance):
+    """删除后扣除贡献（post_delete 调用）"""
+    _, contribute = TRACKED[sender]
+    record({key: -value for key, value in contribute(instance).items()})
+
+
+def record(deltas):
+    """
+    在当前事务提交后应用统计变化量
+
+    供绕过信号的批量更新调用，例如派单时 queryset.update 改变订单状态
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+    if deltas:
+        transaction.on_commit(lambda: apply_deltas(deltas))
+
+
+def apply_deltas(deltas):
+    """
+    原子增减计数；尚未初始化的统计项（或当天尚无记录）跳过，读取时按明细重算
+    """
+    now = timezone.now()
+    daily = {}
+    for key, value in deltas.items():
+        if isinstance(key, tuple):
+            date, field = key
+            if date is not None:
+                daily.setdefault(date, {})[field] = F(field) + value
+        else:
+            StatsCounter.objects.filter(key=key).update(value=F('value') + value, updated_at=now)
+    for date, updates in daily.items():
+        DailyStats.objects.filter(date=date).update(updated_at=now, **updates)
+
+
+# ===== 全量重算 =====
+
+def recount_counters():
+    """
+    按明细表重算全部计数并写入
+
+    Returns:
+        dict: {统计项: 数值}
+    """
+    profiles = UserProfile.objects.aggregate(
+        verified=Count('id', filter=Q(is_verified=True)),
+        riders=Count('id', filter=Q(is_rider=True)),
+        blacklisted=Count('id', filter=Q(is_blacklisted=True))
+    )
+    orders = Order.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        completed=Count('id', filter=Q(status='completed'))
+    )
+    wallets = Wallet.objects.aggregate(balance=Sum('balance'), frozen=Sum('frozen_balance'))
+
+    values = {
+        'users_total': User.objects.count(),
+        'users_verified': profiles['verified'],
+        'users_riders': profiles['riders'],
+        'users_blacklisted': profiles['blacklisted'],
+        'orders_total': orders['total'],
+        'orders_pending': orders['pending'],
+        'orders_completed': orders['completed'],
+        'feedbacks_pending': UserFeedback.objects.filter(status='pending').count(),
+        'applications_pending': AuditApplication.objects.filter(status='pending').count(),
+        'wallet_balance': wallets['balance'] or 0,
+        'wallet_frozen': wallets['frozen'] or 0,
+    }
+
+    now = timezone.now()
+    bulk_upsert(
+        StatsCounter,
+        [StatsCounter(key=key, value=value, updated_at=now) for key, value in values.items()],
+        unique_fields=['key'],
+        update_fields=['value', 'updated_at']
+    )
+    return values
+
+
+def _count_by_day(queryset, field, start, end):
+    return dict(
+        queryset.filter(**{f'{field}__date__gte': start, f'{field}__date__lte': end})
+        .annotate(day=TruncDate(field)).order_by().values('day')
+        .annotate(total=Count('id')).values_list('day', 'total')
+    )
+
+
+def recount_daily(start, end):
+    """
+    重算 [start, end] 每天的统计并写入
+
+    Returns:
+        list[DailyStats]
+    """
+    new_users = _count_by_day(User.objects.all(), 'date_joined', start, end)
+    new_orders = _count_by_day(Order.objects.all(), 'created_at', start, end)
+    completed_orders = _count_by_day(Order.objects.filter(status='completed'), 'completed_at', start, end)
+
+    now = timezone.now()
+    rows = []
+    day = start
+    while day <= end:
+        rows.append(DailyStats(
+            date=day,
+            new_users=new_users.get(day, 0),
+            new_orders=new_orders.get(day, 0),
+            completed_orders=completed_orders.get(day, 0),
+            updated_at=now
+        ))
+        day += timedelta(days=1)
+    bulk_upsert(DailyStats, rows, unique_fields=['date'], update_fields=list(DAILY_FIELDS) + ['updated_at'])
+    return rows
+
+
+# ===== 看板数据 =====
+
+def build_dashboard_stats():
+    """由计数表和当天统计组装看板数据（两次查询），未初始化时先重算"""
+    counters = dict(StatsCounter.objects.values_list('key', 'value'))
+    if any(key not in counters for key in COUNTER_KEYS):
+        counters = recount_counters()
+
+    today = timezone.localdate()
+    daily = DailyStats.objects.filter(date=today).first()
+    if daily is None:
+        daily = recount_daily(today, today)[0]
+
+    return {
+        'user_stats': {
+            'total': int(counters['users_total']),
+            'verified': int(counters['users_verified']),
+            'riders': int(counters['users_riders']),
+            'blacklisted': int(counters['users_blacklisted']),
+            'today_new': daily.new_users
+        },
+        'order_stats': {
+            'total': int(counters['orders_total']),
+            'pending': int(counters['orders_pending']),
+            'completed': int(counters['orders_completed']),
+            'today_total': daily.new_orders,
+            'today_completed': daily.completed_orders
+        },
+        'system_stats': {
+            'pending_feedbacks': int(counters['feedbacks_pending']),
+            'pending_applications': int(counters['applications_pending']),
+            'total_balance': float(counters['wallet_balance']),
+            'total_frozen': float(counters['wallet_frozen'])
+        }
+    }
+
+
+def refresh_dashboard_stats(fresh_seconds=FRESH_SECONDS):
+    """重建看板数据并写入缓存：fresh_seconds 内为新鲜数据，之后最多再作为旧数据保留 STALE_SECONDS"""
+    data = build_dashboard_stats()
+    cache.set(CACHE_KEY, {'data': data, 'fresh_until': time.time() + fresh_seconds}, fresh_seconds + STALE_SECONDS)
+    return data
+
+
+def get_dashboard_stats():
+    """
+    读取看板数据（stale-while-revalidate）
+
+    新鲜期内直接返回缓存；过了新鲜期仍返回旧数据，只有抢到刷新锁的一个请求重建（两次查询），
+    其余请求不等待。recount_stats --loop 在新鲜期内刷新，正常情况下请求不会重建；
+    缓存不存在（冷启动，或旧数据超过 STALE_SECONDS）时才在请求中同步重建
+    """
+    entry = cache.get(CACHE_KEY)
+    if entry is None:
+        return refresh_dashboard_stats()
+    if entry['fresh_until'] <= time.time() and cache.add(REFRESH_LOCK_KEY, 1, REFRESH_LOCK_SECONDS):
+        try:
+            return refresh_dashboard_stats()
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+    return entry['data']
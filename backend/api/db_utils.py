@@ -0,0 +1,18 @@
+# backend/api/db_utils.py
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields):
+    """
+    批量写入，唯一键冲突时更新 update_fields
+
+    MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突列（Django 传 unique_fields 会报
+    NotSupportedError），按表上的唯一约束判断冲突；其他数据库用 ON CONFLICT (unique_fields)
+    """
+    connection = connections[router.db_for_write(model)]
+    return model.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=None if connection.vendor == 'mysql' else unique_fields,
+        update_fields=update_fields
+    )
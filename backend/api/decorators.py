@@ -1,58 +1,77 @@
 # backend/api/decorators.py
 from functools import wraps
-from django.http import JsonResponse
+from asgiref.sync import iscoroutinefunction, sync_to_async
 import logging
 from django.contrib.auth.decorators import login_required
+from .responses import api_error
+from .token_utils import verify_access_token, load_token_user
 
 logger = logging.getLogger(__name__)
 
 
+def _authenticate(request):
+    """
+    验证请求中的令牌，成功时设置 request.user 等属性并返回 None，
+    失败时返回 401 响应
+    """
+    # 从请求头获取token
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    token = None
+
+    if auth_header.startswith('Token '):
+        token = auth_header[6:]
+    elif auth_header.startswith('Bearer '):
+        token = auth_header[7:]
+
+    # 从查询参数获取token（兼容性）
+    if not token:
+        token = request.GET.get('token', '')
+
+    if not token:
+        logger.warning(f"未授权访问: {request.path}, IP: {get_client_ip(request)}")
+        return api_error(401, '请先登录', status=401)
+
+    # 验证JWT令牌（同一令牌只解码一次）
+    entry = verify_access_token(token)
+    if entry is None:
+        logger.warning(f"令牌无效或已过期: {request.path}, IP: {get_client_ip(request)}")
+        return api_error(401, '登录已过期，请重新登录', status=401)
+
+    # 用户对象随令牌缓存，命中时不查库
+    user = load_token_user(entry)
+    if user is None:
+        logger.warning(f"令牌对应的用户不存在或已停用: {request.path}, IP: {get_client_ip(request)}")
+        return api_error(401, '账号不可用，请重新登录', status=401)
+
+    request.user = user
+    request.token = token
+    request.token_payload = entry['payload']
+    return None
+
+
 def api_login_required(view_func):
     """
     API登录验证装饰器
-    检查请求头中的token或查询参数中的token
+    检查请求头中的token或查询参数中的token，并验证JWT有效性
+    同时支持同步视图和异步视图
     """
 
+    if iscoroutinefunction(view_func):
+        # 异步视图：令牌验证可能查库（吊销列表重建），放到线程池执行
+        @wraps(view_func)
+        async def async_wrapped_view(request, *args, **kwargs):
+            error_response = await sync_to_async(_authenticate)(request)
+            if error_response is not None:
+                return error_response
+            return await view_func(request, *args, **kwargs)
+
+        return async_wrapped_view
+
     @wraps(view_func)
     def wrapped_view(request, *args, **kwargs):
-        # 从请求头获取token
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        token = None
-
-        if auth_header.startswith('Token '):
-            token = auth_header[6:]
-        elif auth_header.startswith('Bearer '):
-            token = auth_header[7:]
-
-        # 从查询参数获取token（兼容性）
-        if not token:
-            token = request.GET.get('token', '')
-
-        if not token:
-            logger.warning(f"未授权访问: {request.path}, IP: {get_client_ip(request)}")
-            return JsonResponse({
-                'code': 401,
-                'msg': '请先登录',
-                'data': None
-            }, status=401)
-
-        # TODO: 实际应该验证token有效性
-        # 这里简化处理，后续实现完整的token验证
-        # try:
-        #     from api.models import UserProfile
-        #     user_profile = UserProfile.objects.filter(token=token).select_related('user').first()
-        #     if not user_profile:
-        #         raise AuthenticationFailed('无效的token')
-        #     request.user = user_profile.user
-        #     request.token = token
-        # except Exception as e:
-        #     logger.error(f"Token验证失败: {e}")
-        #     return JsonResponse({
-        #         'code': 401,
-        #         'msg': '登录已过期，请重新登录',
-        #         'data': None
-        #     }, status=401)
-
+        error_response = _authenticate(request)
+        if error_response is not None:
+            return error_response
         return view_func(request, *args, **kwargs)
 
     return wrapped_view
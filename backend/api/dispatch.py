@@ -0,0 +1,248 @@
+# backend/api/dispatch.py
+import heapq
+import threading
+import time
+import logging
+from collections import deque
+from django.db import connection, transaction
+from django.utils import timezone
+from . import dashboard_stats
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+class OrderQueue:
+    """
+    进程内待接订单队列
+
+    按订单分类维护待接订单ID（先进先出）。队列只是候选索引，订单能否被接以数据库状态为准；
+    定期从数据库补充，以发现其他进程创建的订单。
+
+    取出的候选在认领事务结束前记为“认领中”：事务提交后由 settle() 移除，
+    没接到的由 push_back() 放回队首；补充时跳过认领中的订单，避免同一订单同时交给两个骑手。
+    事务回滚后（进程内未能放回的情况）认领中的订单超过 CLAIM_TIMEOUT 仍待接，补充时重新入队
+    """
+
+    REFILL_INTERVAL = 5  # 秒
+    CLAIM_TIMEOUT = 30  # 秒
+
+    def __init__(self):
+        self._queues = {}  # category_id -> deque[(created_at, order_id)]
+        self._queued = set()
+        self._inflight = {}  # order_id -> 取出时间
+        self._refilled_at = {}
+        self._lock = threading.Lock()
+
+    def push(self, category_id, order_id, created_at):
+        with self._lock:
+            if order_id in self._queued or order_id in self._inflight:
+                return
+            queue = self._queues.setdefault(category_id, deque())
+            # 新订单通常最晚创建，直接追加到队尾
+            if queue and queue[-1][0] > created_at:
+                items = sorted(list(queue) + [(created_at, order_id)])
+                queue.clear()
+                queue.extend(items)
+            else:
+                queue.append((created_at, order_id))
+            self._queued.add(order_id)
+
+    def pop(self, category_ids, count):
+        """取出最早的 count 个候选订单（记为认领中），返回 [(created_at, order_id, category_id)]"""
+        with self._lock:
+            heads = [
+                (self._queues[category_id][0], category_id)
+                for category_id in category_ids
+                if self._queues.get(category_id)
+            ]
+            heapq.heapify(heads)
+
+            entries = []
+            popped_at = time.monotonic()
+            while heads and len(entries) < count:
+                (created_at, order_id), category_id = heapq.heappop(heads)
+                queue = self._queues[category_id]
+                queue.popleft()
+                self._queued.discard(order_id)
+                self._inflight[order_id] = popped_at
+                entries.append((created_at, order_id, category_id))
+                if queue:
+                    heapq.heappush(heads, (queue[0], category_id))
+            return entries
+
+    def push_back(self, entries):
+        """将未接到的候选订单放回队首"""
+        with self._lock:
+            for created_at, order_id, category_id in sorted(entries, reverse=True):
+                self._inflight.pop(order_id, None)
+                if order_id in self._queued:
+                    continue
+                self._queues.setdefault(category_id, deque()).appendleft((created_at, order_id))
+                self._queued.add(order_id)
+
+    def settle(self, order_ids):
+        """认领已提交（或订单已不再待接），不再跟踪"""
+        with self._lock:
+            for order_id in order_ids:
+                self._inflight.pop(order_id, None)
+
+    def needs_refill(self, category_id):
+        refilled_at = self._refilled_at.get(category_id)
+        if refilled_at is None or not self._queues.get(category_id):
+            return True
+        return time.monotonic() - refilled_at >= self.REFILL_INTERVAL
+
+    def refill(self, category_id, entries):
+        with self._lock:
+            now = time.monotonic()
+            queue = self._queues.setdefault(category_id, deque())
+            items = set(queue)
+            for created_at, order_id in entries:
+                if order_id in self._queued:
+                    continue
+                popped_at = self._inflight.get(order_id)
+                if popped_at is not None:
+                    if now - popped_at < self.CLAIM_TIMEOUT:
+                        continue
+                    # 认领事务已回滚，订单仍待接
+                    del self._inflight[order_id]
+                items.add((created_at, order_id))
+                self._queued.add(order_id)
+            queue.clear()
+            queue.extend(sorted(items))
+            self._refilled_at[category_id] = now
+
+    def __len__(self):
+        return len(self._queued)
+
+
+class OrderDispatcher:
+    """
+    订单派发引擎
+
+    从分类队列取候选订单，再在数据库中加锁认领：
+    - 支持 SKIP LOCKED 的数据库使用 SELECT ... FOR UPDATE SKIP LOCKED，
+      被其他骑手锁住的订单直接跳过，骑手之间互不阻塞
+    - 其他数据库使用条件更新（status='pending'）原子认领
+    """
+
+    REFILL_BATCH = 200  # 每个分类每次从数据库补充的订单数
+    CANDIDATE_FACTOR = 3  # 每次取出的候选数 = 需要数量 * 系数
+
+    def __init__(self, queue=None):
+        self.queue = queue or OrderQueue()
+
+    def _refill(self, category_ids):
+        for category_id in category_ids:
+            if not self.queue.needs_refill(category_id):
+                continue
+            entries = Order.objects.filter(
+                category_id=category_id,
+                status='pending'
+            ).order_by('created_at').values_list('created_at', 'id')[:self.REFILL_BATCH]
+            self.queue.refill(category_id, list(entries))
+
+    def on_order_created(self, order):
+        """新订单入队"""
+        if order.status == 'pending' and order.category_id:
+            self.queue.push(order.category_id, order.id, order.created_at)
+
+    def claim(self, rider, category_ids, count=1):
+        """
+        为骑手认领订单，须在事务中调用
+
+        Args:
+            rider: 骑手用户
+            category_ids: 骑手可接的分类ID
+            count: 最多认领数量
+
+        Returns:
+            list[Order]: 认领成功的订单（已更新为 accepted）
+        """
+        category_ids = list(category_ids)
+        claimed = []
+        # 每轮都失败（候选已被其他进程接走）时重新补充，最多两轮
+        for _ in range(2):
+            self._refill(category_ids)
+            while len(claimed) < count:
+                candidates = self.queue.pop(category_ids, (count - len(claimed)) * self.CANDIDATE_FACTOR)
+                if not candidates:
+                    break
+                try:
+                    claimed.extend(self._claim_candidates(rider, candidates, count - len(claimed)))
+                except Exception:
+                    # 事务将回滚，本次取出的候选和已认领的订单都仍待接
+                    self.queue.push_back(candidates)
+                    self.requeue(claimed)
+                    raise
+            if len(claimed) >= count:
+                break
+
+        claimed_ids = [order.id for order in claimed]
+        transaction.on_commit(lambda: self.queue.settle(claimed_ids))
+        return claimed
+
+    def requeue(self, orders):
+        """认领事务回滚时调用：订单仍待接，放回队列"""
+        self.queue.push_back([(order.created_at, order.id, order.category_id) for order in orders])
+
+    def _claim_candidates(self, rider, candidates, count):
+        candidate_ids = [order_id for _, order_id, _ in candidates]
+        now = timezone.now()
+
+        if connection.features.has_select_for_update_skip_locked:
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('category', 'user__userprofile')
+                .filter(id__in=candidate_ids, status='pending')
+                .order_by('created_at')[:count]
+            )
+            if orders:
+                Order.objects.filter(id__in=[order.id for order in orders]).update(
+                    rider=rider, status='accepted', accepted_at=now
+                )
+        else:
+            orders = []
+            for order_id in candidate_ids:
+                if len(orders) >= count:
+                    break
+                if Order.objects.filter(id=order_id, status='pending').update(
+                        rider=rider, status='accepted', accepted_at=now):
+                    orders.append(order_id)
+            orders = list(
+                Order.objects.select_related('category', 'user__userprofile').filter(id__in=orders).order_by('created_at')
+            )
+
+        # 没用上的候选如果仍待接（例如被其他骑手锁住后回滚），放回队列
+        claimed_ids = {order.id for order in orders}
+        leftover = [entry for entry in candidates if entry[1] not in claimed_ids]
+        if leftover:
+            still_pending = set(
+                Order.objects.filter(id__in=[entry[1] for entry in leftover], status='pending')
+                .values_list('id', flat=True)
+            )
+            self.queue.push_back([entry for entry in leftover if entry[1] in still_pending])
+            self.queue.settle([entry[1] for entry in leftover if entry[1] not in still_pending])
+
+        for order in orders:
+            order.rider = rider
+            order.status = 'accepted'
+            order.accepted_at = now
+        # queryset.update 不触发信号，看板的待接订单数在此扣减
+        dashboard_stats.record({'orders_pending': -len(orders)})
+        return orders
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """进程内共享的派发引擎"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = OrderDispatcher()
+    return _dispatcher
@@ -0,0 +1,138 @@
+# backend/api/feed_views.py
+import time
+import logging
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from .decorators import api_login_required
+from .models import Order, RiderSettings, UserProfile
+from .order_feed import category_channel, feed_unavailable_reason, get_order_feed_broker, serialize_feed_order
+from .responses import api_error, api_ok, get_json_encoder
+
+logger = logging.getLogger(__name__)
+
+LONG_POLL_TIMEOUT = 25  # 长轮询默认等待时间（秒）
+MAX_LONG_POLL_TIMEOUT = 30
+SSE_HEARTBEAT = 15  # SSE 心跳间隔（秒），防止代理断开空闲连接
+SSE_MAX_DURATION = 300  # 单个 SSE 连接最长时间，到期后客户端带 Last-Event-ID 重连
+BACKLOG_LIMIT = 50  # 重连时补发的订单上限
+
+
+def _rider_feed_categories(request):
+    """
+    校验骑手身份并返回订阅的分类
+
+    Returns:
+        tuple: (错误响应或 None, 分类ID列表)
+    """
+    try:
+        if not request.user.userprofile.is_rider:
+            return api_error(403, '您还不是骑手，请先申请骑手认证', status=403), []
+    except UserProfile.DoesNotExist:
+        return api_error(404, '用户资料不存在'), []
+
+    category_ids = list(
+        RiderSettings.objects.filter(user=request.user).values_list('categories', flat=True)
+    )
+    category_ids = [category_id for category_id in category_ids if category_id]
+    if not category_ids:
+        return api_error(400, '请先设置可接订单分类'), []
+    return None, category_ids
+
+
+def _pending_orders_since(category_ids, since):
+    """断线期间新增的待接订单（按ID递增）"""
+    orders = Order.objects.filter(
+        category_id__in=category_ids,
+        status='pending',
+        id__gt=since
+    ).order_by('id')[:BACKLOG_LIMIT]
+    return [serialize_feed_order(order) for order in orders]
+
+
+def _parse_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+async def _event_stream(subscription, backlog):
+    try:
+        for message in backlog:
+            yield f"id: {message['order_id']}\nevent: order\ndata: {get_json_encoder().dumps(message).decode()}\n\n"
+
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while time.monotonic() < deadline:
+            message = await subscription.get(SSE_HEARTBEAT)
+            if message is None:
+                yield ": ping\n\n"
+                continue
+            yield f"id: {message['order_id']}\nevent: order\ndata: {get_json_encoder().dumps(message).decode()}\n\n"
+    finally:
+        subscription.close()
+
+
+@csrf_exempt
+@transaction.non_atomic_requests
+@api_login_required
+async def rider_order_feed(request):
+    """
+    骑手新订单推送 - 需要登录
+
+    订阅骑手设置中所选分类的新待接订单，由订单创建时发布，不再轮询订单表：
+    - 默认长轮询：等待到有新订单或超时（timeout，默认25秒）后返回
+    - mode=sse：Server-Sent Events 持续推送，带心跳
+    - since（或 SSE 的 Last-Event-ID）：上次收到的订单ID，补发断线期间的新订单
+
+    需部署在 ASGI（smart_backend.asgi）下，等待期间不占用工作线程；多进程部署需配置
+    RedisBroker（ORDER_FEED_REDIS_URL），否则返回 503（见 feed_unavailable_reason）
+    """
+    if request.method != 'GET':
+        return api_error(405, '请使用GET请求', status=405)
+
+    error_response, category_ids = await sync_to_async(_rider_feed_categories)(request)
+    if error_response is not None:
+        return error_response
+
+    broker = get_order_feed_broker()
+    reason = feed_unavailable_reason(request, broker)
+    if reason:
+        logger.error(f'订单推送不可用: {reason}')
+        return api_error(503, f'{reason}，请使用订单列表接口刷新', status=503)
+
+    mode = request.GET.get('mode', 'poll')
+    since = _parse_int(request.GET.get('since') or request.headers.get('Last-Event-ID'), 0)
+
+    # 先订阅再查补发，避免两者之间发布的订单丢失
+    subscription = broker.subscribe(category_channel(category_id) for category_id in category_ids)
+    try:
+        backlog = await sync_to_async(_pending_orders_since)(category_ids, since) if since else []
+    except Exception:
+        subscription.close()
+        raise
+
+    if mode == 'sse':
+        response = StreamingHttpResponse(_event_stream(subscription, backlog), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    try:
+        messages = backlog + subscription.drain()
+        if not messages:
+            timeout = min(max(_parse_int(request.GET.get('timeout'), LONG_POLL_TIMEOUT), 0), MAX_LONG_POLL_TIMEOUT)
+            message = await subscription.get(timeout)
+            if message is not None:
+                messages = [message] + subscription.drain()
+    finally:
+        subscription.close()
+
+    # 补发与推送可能重复（订阅后、查询前创建的订单）
+    orders = list({message['order_id']: message for message in messages}.values())
+
+    return api_ok({
+        'orders': orders,
+        'last_id': max([order['order_id'] for order in orders], default=since)
+    })
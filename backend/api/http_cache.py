@@ -0,0 +1,102 @@
+# backend/api/http_cache.py
+"""
+公开只读接口的响应缓存
+
+渲染后的响应按完整 URL（含 host 和查询参数）存入 Django 缓存，附带强 ETag 和
+Last-Modified，客户端带 If-None-Match / If-Modified-Since 时直接返回 304。
+缓存按分组失效：每个分组有一个版本号，相关模型保存/删除后（signals.py）
+更换版本号，旧版本的缓存不再命中，随超时自然淘汰
+"""
+import time
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+KEY_PREFIX = 'http_cache'
+
+ANNOUNCEMENTS = 'announcements'
+ORDER_CATEGORIES = 'order_categories'
+WELCOME = 'welcome'
+
+
+def _version_key(group):
+    return f'{KEY_PREFIX}:version:{group}'
+
+
+def _group_version(group):
+    """分组当前版本号；版本号被淘汰时生成新的，保证不会命中失效前的缓存"""
+    version = cache.get(_version_key(group))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(group), version, None):
+            version = cache.get(_version_key(group), version)
+    return version
+
+
+def invalidate(*groups):
+    """使分组下的所有缓存失效"""
+    cache.set_many({_version_key(group): time.time_ns() for group in groups}, None)
+
+
+def _cacheable(response):
+    """只缓存成功的 JSON 响应：HTTP 200 且 api_json 记录的 code 不是 5xx"""
+    if response.status_code != 200 or response.streaming:
+        return False
+    if not response.get('Content-Type', '').startswith('application/json'):
+        return False
+    code = getattr(response, 'api_code', None)
+    return not (isinstance(code, int) and code >= 500)
+
+
+def _build_response(entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def cache_public_response(group, timeout=None):
+    """
+    缓存 GET 接口的响应（只用于不区分用户的公开接口）
+
+    Args:
+        group: 缓存分组，invalidate(group) 使其失效
+        timeout: 缓存秒数，或返回秒数的函数（每次写入缓存时调用），默认 settings.PUBLIC_RESPONSE_CACHE_TIMEOUT
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            url = request.build_absolute_uri()
+            key = f"{KEY_PREFIX}:{group}:{_group_version(group)}:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+            entry = cache.get(key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if not _cacheable(response):
+                    return response
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': f'"{hashlib.sha256(response.content).hexdigest()[:32]}"',
+                    'last_modified': int(time.time())
+                }
+                seconds = timeout if timeout is not None else settings.PUBLIC_RESPONSE_CACHE_TIMEOUT
+                if callable(seconds):
+                    seconds = seconds()
+                cache.set(key, entry, seconds)
+
+            return get_conditional_response(
+                request,
+                etag=entry['etag'],
+                last_modified=entry['last_modified'],
+                response=_build_response(entry)
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+# backend/api/login_views.py
+import asyncio
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.views.decorators.csrf import csrf_exempt
+from .responses import api_error, api_ok
+from .token_utils import TokenManager
+from .user_service import get_or_create_wechat_user
+from .wechat_client import get_wechat_client, WechatClientError
+from .wechat_token import get_access_token_provider, WechatAPIError, WECHAT_TOKEN_EXPIRED_ERRCODES
+
+logger = logging.getLogger(__name__)
+
+
+def _call_wechat(func, *args):
+    """
+    在线程池中执行同步的微信接口调用
+
+    沿用 WechatClient 的连接池、重试和熔断，多个调用可以并发执行
+    """
+    return sync_to_async(func, thread_sensitive=False)(*args)
+
+
+async def _fetch_openid(appid, appsecret, wx_code):
+    """wx.login() 的 code 换取 openid"""
+    return await _call_wechat(get_wechat_client().jscode2session, appid, appsecret, wx_code)
+
+
+async def _fetch_phone(phone_code):
+    """
+    access_token -> getuserphonenumber 调用链
+
+    Returns:
+        tuple: (手机号, 国家码)，获取失败时手机号为空
+    """
+    token_provider = get_access_token_provider()
+    try:
+        access_token = await _call_wechat(token_provider.get_token)
+    except (WechatAPIError, WechatClientError) as e:
+        logger.error(f'获取微信access_token失败: {e}')
+        return '', '86'
+
+    phone_data = await _call_wechat(get_wechat_client().get_user_phone_number, access_token, phone_code)
+
+    if phone_data.get('errcode') == 0:
+        phone_info = phone_data.get('phone_info', {})
+        pure_phone = phone_info.get('purePhoneNumber', '')
+        logger.info(f'获取手机号成功: {pure_phone}')
+        return pure_phone, phone_info.get('countryCode', '86')
+
+    if phone_data.get('errcode') in WECHAT_TOKEN_EXPIRED_ERRCODES:
+        await _call_wechat(token_provider.invalidate, access_token)
+    return '', '86'
+
+
+def _login_success(profile_obj, openid, country_code):
+    user = profile_obj.user
+    tokens = TokenManager.generate_tokens(user.id)
+
+    return api_ok({
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'nickname': profile_obj.real_name,
+            'phone': profile_obj.phone or '',
+            'avatar_url': profile_obj.avatar_url,
+            'country_code': country_code
+        },
+        'token': tokens['access_token'],
+        **tokens,
+        'openid': openid
+    }, '登录成功')
+
+
+@csrf_exempt
+@transaction.non_atomic_requests
+async def login(request):
+    """
+    登录接口（异步） - 使用正确的微信登录流程
+
+    jscode2session 与 access_token -> getuserphonenumber 调用链并发执行：
+    两者仍是同步的 WechatClient 调用，各自在线程池中执行（sync_to_async，thread_sensitive=False），
+    登录耗时取两者中较慢的一个而不是相加；用户查询/创建同样通过 sync_to_async 调用同步 ORM
+    """
+    if request.method != 'POST':
+        return api_error(400, '请使用POST请求')
+
+    try:
+        data = json.loads(request.body)
+        login_type = data.get('login_type', 'normal')
+
+        if login_type != 'wechat':
+            # 只支持微信登录（旧的普通登录返回固定的测试令牌，无法通过令牌校验）
+            return api_error(400, '不支持的登录方式，请使用微信登录')
+
+        # 微信一键登录
+        wx_code = data.get('code')  # wx.login() 获取的code
+        phone_code = data.get('phone_code')  # 手机号授权码
+        user_info = data.get('userInfo', {})
+
+        # 开发环境：模拟登录
+        dev_phone = data.get('dev_phone')
+        if dev_phone:
+            logger.info(f'开发环境模拟登录，手机号: {dev_phone}')
+
+            # 模拟 openid（同一手机号固定，重复登录复用同一用户）
+            mock_openid = f"dev_openid_{dev_phone}"
+            profile_obj, created = await sync_to_async(get_or_create_wechat_user)(
+                mock_openid,
+                dev_phone,
+                {
+                    'nickName': user_info.get('nickName', '开发用户'),
+                    'avatarUrl': user_info.get('avatarUrl', '/media/default-avatar.png')
+                },
+                username=f"dev_{dev_phone}"
+            )
+            return _login_success(profile_obj, mock_openid, '86')
+
+        # 真机环境：使用微信 code 换取 openid
+        if not wx_code:
+            return api_error(400, '缺少微信登录凭证')
+
+        # 获取微信配置
+        wechat_config = getattr(settings, 'WECHAT_MINIPROGRAM', {})
+        appid = wechat_config.get('APPID', '')
+        appsecret = wechat_config.get('APPSECRET', '')
+
+        if not appid or not appsecret:
+            logger.error('微信小程序配置缺失')
+            return api_error(500, '微信小程序配置缺失')
+
+        # 1. 换取 openid 与 2. 获取手机号 并发执行
+        openid_task = asyncio.ensure_future(_fetch_openid(appid, appsecret, wx_code))
+        phone_task = asyncio.ensure_future(_fetch_phone(phone_code)) if phone_code else None
+
+        try:
+            code_data = await openid_task
+        except Exception as e:
+            if phone_task:
+                phone_task.cancel()
+            logger.error(f"请求微信接口失败: {str(e)}")
+            return api_error(500, f'请求微信接口失败: {str(e)}')
+
+        openid = code_data.get('openid')
+        if 'errcode' in code_data or not openid:
+            if phone_task:
+                phone_task.cancel()
+            logger.error(f"获取openid失败: {code_data}")
+            return api_error(500, f'获取openid失败: {code_data.get("errmsg", "无法获取openid")}')
+
+        logger.info(f'获取openid成功: {openid[:10]}...')
+
+        pure_phone, country_code = await phone_task if phone_task else ('', '86')
+
+        # 3. 使用 openid 查找或创建用户
+        profile_obj, created = await sync_to_async(get_or_create_wechat_user)(openid, pure_phone, user_info)
+
+        # 4. 生成 JWT 令牌
+        return _login_success(profile_obj, openid, country_code)
+
+    except json.JSONDecodeError as e:
+        logger.error(f'请求数据格式错误: {str(e)}')
+        return api_error(400, '请求数据格式错误')
+    except Exception as e:
+        logger.error(f'登录错误: {str(e)}')
+        return api_error(500, f'服务器错误: {str(e)}')
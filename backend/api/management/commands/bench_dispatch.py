@@ -0,0 +1,85 @@
+# backend/api/management/commands/bench_dispatch.py
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, transaction
+from api.dispatch import OrderDispatcher
+from api.models import Order, OrderCategory
+
+
+class Command(BaseCommand):
+    help = '压测订单派发：多个模拟骑手并发认领待接订单，统计吞吐并校验每个订单只被认领一次'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='待接订单数')
+        parser.add_argument('--categories', type=int, default=4, help='订单分类数')
+        parser.add_argument('--riders', type=int, default=32, help='模拟骑手数（并发线程数）')
+
+    def handle(self, *args, **options):
+        prefix = f"bench_{uuid.uuid4().hex[:8]}"
+        customer = User.objects.create(username=f"{prefix}_customer")
+        riders = [User(username=f"{prefix}_rider_{i}") for i in range(options['riders'])]
+        User.objects.bulk_create(riders)
+        riders = list(User.objects.filter(username__startswith=f"{prefix}_rider_"))
+        categories = [
+            OrderCategory.objects.create(name=f"{prefix}_{i}", code=f"{prefix}_{i}")
+            for i in range(options['categories'])
+        ]
+        category_ids = [category.id for category in categories]
+        Order.objects.bulk_create([
+            Order(
+                order_no=f"{prefix}_{i}",
+                user=customer,
+                category=categories[i % len(categories)],
+                title='压测订单',
+                description='',
+                price=Decimal('1.00')
+            )
+            for i in range(options['orders'])
+        ], batch_size=500)
+
+        dispatcher = OrderDispatcher()
+        claims = Counter()
+        errors = Counter()
+
+        def ride(rider):
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            orders = dispatcher.claim(rider, category_ids)
+                    except OperationalError:
+                        # SQLite 写锁冲突，稍后重试
+                        errors[rider.id] += 1
+                        time.sleep(0.01)
+                        continue
+                    if not orders:
+                        return
+                    claims[orders[0].id] += 1
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(riders)) as executor:
+            list(executor.map(ride, riders))
+        elapsed = time.perf_counter() - start
+
+        claimed = sum(claims.values())
+        accepted = Order.objects.filter(order_no__startswith=prefix, status='accepted').count()
+        duplicated = [order_id for order_id, count in claims.items() if count > 1]
+
+        self.stdout.write(f"{len(riders)} 个骑手认领 {claimed} 单，耗时 {elapsed:.2f}s，{claimed / elapsed:.0f} 单/秒")
+        self.stdout.write(f"数据库已接订单 {accepted}，期望 {options['orders']}，写冲突重试 {sum(errors.values())} 次")
+
+        Order.objects.filter(order_no__startswith=prefix).delete()
+        OrderCategory.objects.filter(id__in=category_ids).delete()
+        User.objects.filter(username__startswith=prefix).delete()
+
+        if duplicated or accepted != options['orders'] or claimed != options['orders']:
+            self.stderr.write(self.style.ERROR(f'校验失败：重复认领 {len(duplicated)} 单'))
+        else:
+            self.stdout.write(self.style.SUCCESS('校验通过：每个订单只被认领一次'))
@@ -0,0 +1,211 @@
+# backend/api/management/commands/bench_indexes.py
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from api.models import (
+    AuditApplication, Conversation, ConversationMember, Message, Notification,
+    Order, OrderCategory, RiderGrabRecord, Transaction, Wallet
+)
+
+# 0007_composite_indexes 新增的索引
+INDEXES = {
+    AuditApplication: ['api_audit_status_created_idx'],
+    Message: ['api_msg_conv_created_idx'],
+    Notification: ['api_notif_user_created_idx', 'api_notif_user_unread_idx'],
+    Order: ['api_order_cat_status_idx', 'api_order_cat_pending_idx'],
+    RiderGrabRecord: ['api_grab_user_time_idx', 'api_grab_user_open_idx'],
+    Transaction: ['api_trans_wallet_created_idx', 'api_trans_wallet_type_idx'],
+}
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+    """暂时关闭 auto_now_add，使造数可以写入分散的历史时间"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        '索引压测：按比例造数，分别在删除和加上 0007 新增索引时输出热点查询的 EXPLAIN 和耗时。'
+        '全部操作在一个事务内执行并回滚；MySQL 的 DDL 会隐式提交，请只在测试库运行'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='用户数')
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='数据量倍数（1 约为 10 万通知、10 万消息、5 万订单）')
+        parser.add_argument('--repeat', type=int, default=20, help='每个查询执行次数')
+
+    def handle(self, *args, **options):
+        # SQLite 需在事务外关闭外键检查才能在事务内修改索引
+        with connection.constraint_checks_disabled(), transaction.atomic():
+            context = self._seed(options['users'], options['scale'])
+            queries = self._queries(context)
+
+            removed = self._toggle_indexes(add=False)
+            self._analyze()
+            before = self._run(queries, options['repeat'], '删除新索引')
+
+            self._toggle_indexes(add=True, only=removed)
+            self._analyze()
+            after = self._run(queries, options['repeat'], '使用新索引')
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n===== 对比 ====='))
+            for name in queries:
+                self.stdout.write(f"{name}: {before[name]:.2f}ms -> {after[name]:.2f}ms")
+
+            transaction.set_rollback(True)
+
+    def _seed(self, user_count, scale):
+        prefix = f"bench_{uuid.uuid4().hex[:8]}"
+        now = timezone.now()
+        rng = random.Random(0)
+
+        def past(days=180):
+            return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+        start = time.perf_counter()
+        User.objects.bulk_create([User(username=f"{prefix}_{i}") for i in range(user_count)])
+        users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+        riders = users[:max(1, user_count // 10)]
+
+        Wallet.objects.bulk_create([Wallet(user=user) for user in users])
+        wallets = list(Wallet.objects.filter(user__in=users))
+        categories = OrderCategory.objects.bulk_create([
+            OrderCategory(name=f"{prefix}_{i}", code=f"{prefix}_{i}") for i in range(8)
+        ])
+        conversations = Conversation.objects.bulk_create([Conversation() for _ in range(user_count)])
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user)
+            for index, conversation in enumerate(conversations)
+            for user in (users[index], users[(index + 1) % user_count])
+        ])
+
+        with _explicit_timestamps(
+            Notification._meta.get_field('created_at'),
+            Message._meta.get_field('created_at'),
+            Transaction._meta.get_field('created_at'),
+            Order._meta.get_field('created_at'),
+            RiderGrabRecord._meta.get_field('grabbed_at'),
+            AuditApplication._meta.get_field('created_at'),
+        ):
+            # 大部分通知已读，未读只占一成
+            Notification.objects.bulk_create((
+                Notification(user=rng.choice(users), notification_type='system', title='压测通知', content='',
+                             is_read=rng.random() > 0.1, created_at=past())
+                for _ in range(int(100000 * scale))
+            ), batch_size=2000)
+            Message.objects.bulk_create((
+                Message(conversation=rng.choice(conversations), sender=rng.choice(users), content='压测消息',
+                        created_at=past())
+                for _ in range(int(100000 * scale))
+            ), batch_size=2000)
+            Transaction.objects.bulk_create((
+                Transaction(wallet=rng.choice(wallets), amount=Decimal('1.00'), description='压测交易',
+                            transaction_type=rng.choice(['income', 'expenditure', 'refund', 'withdraw']),
+                            created_at=past())
+                for _ in range(int(50000 * scale))
+            ), batch_size=2000)
+            # 历史订单大多已完成，待接订单只占少数
+            orders = Order.objects.bulk_create((
+                Order(order_no=f"{prefix}_{i}", user=rng.choice(users), category=rng.choice(categories),
+                      title='压测订单', description='', price=Decimal('1.00'), created_at=past(),
+                      status='pending' if rng.random() < 0.02 else 'completed')
+                for i in range(int(50000 * scale))
+            ), batch_size=2000)
+            RiderGrabRecord.objects.bulk_create((
+                RiderGrabRecord(user=riders[i % len(riders)], order=order, grabbed_at=order.created_at,
+                                completed=order.status == 'completed')
+                for i, order in enumerate(orders) if order.status == 'completed'
+            ), batch_size=2000)
+            AuditApplication.objects.bulk_create((
+                AuditApplication(user=rng.choice(users), audit_type='rider', application_data={},
+                                 created_at=past(),
+                                 status='pending' if rng.random() < 0.05 else 'approved')
+                for _ in range(int(10000 * scale))
+            ), batch_size=2000)
+
+        self.stdout.write(f"造数完成，耗时 {time.perf_counter() - start:.1f}s")
+        return {
+            'user': users[0],
+            'rider': riders[0],
+            'wallet': wallets[0],
+            'conversation': conversations[0],
+            'category': categories[0],
+            'now': now,
+        }
+
+    def _queries(self, context):
+        """与接口中一致的查询形状"""
+        hour_ago = context['now'] - timedelta(hours=1)
+        return {
+            '通知列表': Notification.objects.filter(user=context['user']).order_by('-created_at', '-id')[:20],
+            '未读通知': Notification.objects.filter(user=context['user'], is_read=False).order_by('-created_at')[:20],
+            '会话消息': Message.objects.filter(conversation=context['conversation']).order_by('-created_at', '-id')[:50],
+            '按类型交易记录': Transaction.objects.filter(
+                wallet=context['wallet'], transaction_type='income'
+            ).order_by('-created_at')[:20],
+            '骑手接单窗口': RiderGrabRecord.objects.filter(user=context['rider'], grabbed_at__gte=hour_ago),
+            '骑手未完成订单': RiderGrabRecord.objects.filter(user=context['rider'], completed=False),
+            '分类待接订单': Order.objects.filter(
+                category=context['category'], status='pending'
+            ).order_by('created_at')[:200],
+            '待审核申请': AuditApplication.objects.filter(status='pending').order_by('-created_at')[:20],
+        }
+
+    def _toggle_indexes(self, add, only=None):
+        """删除或加回新增索引，返回实际操作的 (模型, 索引) 列表"""
+        changed = []
+        with connection.cursor() as cursor, connection.schema_editor(atomic=False) as editor:
+            for model, names in INDEXES.items():
+                existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                for index in model._meta.indexes:
+                    if index.name not in names or (only is not None and (model, index) not in only):
+                        continue
+                    if add and index.name not in existing:
+                        editor.add_index(model, index)
+                        changed.append((model, index))
+                    elif not add and index.name in existing:
+                        editor.remove_index(model, index)
+                        changed.append((model, index))
+        return changed
+
+    def _analyze(self):
+        """刷新统计信息，让查询计划反映当前数据量"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for model in INDEXES:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'mysql':
+                for model in INDEXES:
+                    cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(model._meta.db_table)}')
+                    cursor.fetchall()
+
+    def _run(self, queries, repeat, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n===== {title} ====='))
+        timings = {}
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_LABEL(f'\n-- {name}'))
+            self.stdout.write(queryset.explain())
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            timings[name] = (time.perf_counter() - start) * 1000 / repeat
+            self.stdout.write(f'平均 {timings[name]:.2f}ms')
+        return timings
@@ -0,0 +1,71 @@
+# backend/api/management/commands/bench_json_responses.py
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.utils import timezone
+from api.responses import DATETIME_FORMAT, OrjsonEncoder, StdlibJSONEncoder, api_json, orjson
+
+
+class Command(BaseCommand):
+    help = (
+        '压测列表接口的 JSON 序列化：构造交易流水样式的列表数据，'
+        '对比旧写法（逐行 strftime + JsonResponse）与标准库 / orjson 编码器的耗时'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='列表行数')
+        parser.add_argument('--repeat', type=int, default=200, help='每个场景执行次数')
+
+    def handle(self, *args, **options):
+        rows = self._rows(options['rows'])
+
+        def legacy():
+            data = [
+                {
+                    **row,
+                    'amount': str(row['amount']),
+                    'created_at': row['created_at'].strftime(DATETIME_FORMAT),
+                    'completed_at': row['completed_at'].strftime(DATETIME_FORMAT) if row['completed_at'] else None
+                }
+                for row in rows
+            ]
+            return JsonResponse({'code': 200, 'msg': '获取成功', 'data': {'list': data}}).content
+
+        payload = {'code': 200, 'msg': '获取成功', 'data': {'list': rows}}
+        scenarios = {
+            '旧写法：strftime + JsonResponse': legacy,
+            '标准库编码器': lambda: StdlibJSONEncoder().dumps(payload),
+        }
+        if orjson is not None:
+            scenarios['orjson 编码器'] = lambda: OrjsonEncoder().dumps(payload)
+        else:
+            self.stdout.write('未安装 orjson，跳过 orjson 场景')
+
+        for name, func in scenarios.items():
+            self._measure(name, func, options['repeat'])
+        self._measure('api_json（当前配置）', lambda: api_json(payload).content, options['repeat'])
+
+    def _rows(self, count):
+        now = timezone.now()
+        return [
+            {
+                'id': i,
+                'transaction_type': 'income' if i % 3 else 'withdraw',
+                'amount': Decimal(f'{i % 500}.{i % 100:02d}'),
+                'status': 'completed' if i % 4 else 'pending',
+                'description': f'订单收入 #{i}',
+                'created_at': now - timedelta(minutes=i),
+                'completed_at': now - timedelta(minutes=i - 1) if i % 4 else None
+            }
+            for i in range(count)
+        ]
+
+    def _measure(self, name, func, repeat):
+        size = len(func())  # 预热
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - start) * 1000 / repeat
+        self.stdout.write(f"{name}: 平均 {elapsed:.2f}ms，{size} 字节")
@@ -0,0 +1,98 @@
+# backend/api/management/commands/bench_user_list.py
+import json
+import time
+import uuid
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from api.models import Order, OrderCategory, UserProfile
+from api.pagination import encode_cursor
+from api.token_revocation import revocation_list
+from api.token_utils import TokenManager
+from api.views import get_user_list
+
+
+class Command(BaseCommand):
+    help = (
+        '压测管理员用户列表：造指定数量的用户和订单，统计各页的查询次数和耗时，'
+        '并与逐行 count() 的旧写法对比。全部操作在一个事务内执行并回滚'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='用户数')
+        parser.add_argument('--orders-per-user', type=int, default=3, help='平均每个用户的订单数')
+        parser.add_argument('--page-size', type=int, default=20, help='每页条数')
+        parser.add_argument('--repeat', type=int, default=5, help='每个场景执行次数')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            admin, middle_id = self._seed(options['users'], options['orders_per_user'])
+            token = TokenManager.generate_tokens(admin.id)['access_token']
+            revocation_list.rebuild()
+            factory = RequestFactory()
+            page_size = options['page_size']
+
+            def request_page(params):
+                request = factory.get('/api/user/list/', {'page_size': page_size, **params},
+                                      HTTP_AUTHORIZATION=f'Bearer {token}')
+                return json.loads(get_user_list(request).content)
+
+            scenarios = {
+                '第1页': {'page': 1},
+                '中间页（OFFSET）': {'page': options['users'] // page_size // 2},
+                '中间页（游标）': {'cursor': encode_cursor([middle_id])},
+                '中间页（游标+估算总数）': {'cursor': encode_cursor([middle_id]), 'count': 'estimate'},
+            }
+            for name, params in scenarios.items():
+                self._measure(name, lambda: request_page(params), options['repeat'])
+
+            # 旧写法：本页每个用户两次 count()
+            profiles = list(UserProfile.objects.select_related('user').order_by('-id')[:page_size])
+
+            def per_row_counts():
+                return [
+                    (Order.objects.filter(user=profile.user).count(), Order.objects.filter(rider=profile.user).count())
+                    for profile in profiles
+                ]
+
+            self._measure('旧写法：第1页逐行 count()', per_row_counts, options['repeat'])
+            transaction.set_rollback(True)
+
+    def _seed(self, user_count, orders_per_user):
+        prefix = f"bench_{uuid.uuid4().hex[:8]}"
+        start = time.perf_counter()
+        admin = User.objects.create(username=f"{prefix}_admin", is_staff=True)
+        category = OrderCategory.objects.create(name=prefix, code=prefix)
+
+        for offset in range(0, user_count, 5000):
+            batch = range(offset, min(offset + 5000, user_count))
+            User.objects.bulk_create([User(username=f"{prefix}_{i}") for i in batch])
+            users = list(User.objects.filter(username__in=[f"{prefix}_{i}" for i in batch]).order_by('id'))
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, openid=user.username, real_name='', student_id='', is_rider=index % 10 == 0)
+                for index, user in enumerate(users)
+            ])
+            Order.objects.bulk_create([
+                Order(order_no=f"{user.username}_{i}", user=user, category=category, title='压测订单',
+                      description='', price=Decimal('1.00'), rider=users[(index + 1) % len(users)],
+                      status='completed')
+                for index, user in enumerate(users)
+                for i in range((index % (orders_per_user * 2 + 1)))
+            ], batch_size=5000)
+
+        ids = UserProfile.objects.filter(user__username__startswith=prefix).order_by('id').values_list('id', flat=True)
+        middle_id = ids[user_count // 2]
+        self.stdout.write(f"造数完成：{user_count} 个用户，耗时 {time.perf_counter() - start:.1f}s")
+        return admin, middle_id
+
+    def _measure(self, name, func, repeat):
+        func()  # 预热
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            elapsed = (time.perf_counter() - start) * 1000 / repeat
+        self.stdout.write(f"{name}: 平均 {elapsed:.1f}ms，{len(ctx) // repeat} 次查询")
@@ -0,0 +1,42 @@
+# backend/api/management/commands/bench_wechat_login.py
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.models import UserProfile
+from api.user_service import get_or_create_wechat_user
+
+
+class Command(BaseCommand):
+    help = '压测微信登录用户创建：多线程并发调用 get_or_create_wechat_user，统计吞吐并校验无重复用户'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=2000, help='登录次数')
+        parser.add_argument('--users', type=int, default=500, help='不同 openid 数量（重复登录模拟老用户和并发首次登录）')
+        parser.add_argument('--workers', type=int, default=16, help='并发线程数')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        prefix = f"bench_{uuid.uuid4().hex[:8]}_"
+        openids = [f"{prefix}{i}" for i in range(options['users'])]
+
+        def login(i):
+            try:
+                return get_or_create_wechat_user(openids[i % len(openids)], '', {'nickName': '压测用户'})[1]
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            created = sum(executor.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+
+        profiles = UserProfile.objects.filter(openid__startswith=prefix).count()
+        self.stdout.write(f"登录 {logins} 次，耗时 {elapsed:.2f}s，{logins / elapsed:.0f} 次/秒")
+        self.stdout.write(f"新建用户 {created}，数据库中用户 {profiles}，期望 {len(openids)}")
+
+        if created != len(openids) or profiles != len(openids):
+            self.stderr.write(self.style.ERROR('用户数量不一致，存在重复创建或丢失'))
+        else:
+            self.stdout.write(self.style.SUCCESS('校验通过：每个 openid 只创建了一个用户'))
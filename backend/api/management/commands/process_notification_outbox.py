@@ -0,0 +1,27 @@
+# backend/api/management/commands/process_notification_outbox.py
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.notification_service import BATCH_SIZE, process_outbox
+
+
+class Command(BaseCommand):
+    help = '处理通知发件箱：把待发送的群发通知展开为每个用户的通知（批量写入）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='持续运行，处理完后等待新记录')
+        parser.add_argument('--interval', type=float, default=2.0, help='持续运行时的轮询间隔（秒）')
+        parser.add_argument('--limit', type=int, default=100, help='每轮最多处理的记录数')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='每批写入的通知条数')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_outbox(limit=options['limit'], batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f"已处理 {processed} 条发件箱记录")
+
+            if not options['loop']:
+                break
+            close_old_connections()
+            if processed < options['limit']:
+                time.sleep(options['interval'])
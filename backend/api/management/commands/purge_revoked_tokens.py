@@ -0,0 +1,11 @@
+# backend/api/management/commands/purge_revoked_tokens.py
+from django.core.management.base import BaseCommand
+from api.token_revocation import revocation_list
+
+
+class Command(BaseCommand):
+    help = '删除已过期的令牌吊销记录（过期令牌本身已无法通过验证），保持 RevokedToken 表很小'
+
+    def handle(self, *args, **options):
+        deleted = revocation_list.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条过期的吊销记录'))
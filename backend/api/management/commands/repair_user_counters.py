@@ -0,0 +1,29 @@
+# backend/api/management/commands/repair_user_counters.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from api.user_counters import recompute_user_counters
+
+
+class Command(BaseCommand):
+    help = '按通知和消息明细重算用户未读计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='只重算指定用户（可多次指定）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批重算的用户数')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if user_ids is None:
+            user_ids = User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=options['batch_size'])
+
+        total = 0
+        batch = []
+        for user_id in user_ids:
+            batch.append(user_id)
+            if len(batch) >= options['batch_size']:
+                total += len(recompute_user_counters(batch))
+                batch = []
+        if batch:
+            total += len(recompute_user_counters(batch))
+
+        self.stdout.write(self.style.SUCCESS(f'已重算 {total} 个用户的未读计数'))
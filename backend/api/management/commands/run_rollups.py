@@ -0,0 +1,40 @@
+# backend/api/management/commands/run_rollups.py
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from api.rollups import ROLLUPS, run_rollups
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'日期格式错误: {value}，应为 YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = '生成订单、交易和骑手日汇总：默认按水位增量重算有变化的日期，--since 时回填指定区间'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=list(ROLLUPS), help='只运行指定汇总（可多次指定）')
+        parser.add_argument('--since', help='回填起始日期 YYYY-MM-DD（含）')
+        parser.add_argument('--until', help='回填结束日期 YYYY-MM-DD（含），默认今天')
+        parser.add_argument('--loop', action='store_true', help='持续运行，按间隔增量汇总')
+        parser.add_argument('--interval', type=float, default=300.0, help='持续运行时的间隔（秒）')
+
+    def handle(self, *args, **options):
+        start = _parse_date(options['since']) if options['since'] else None
+        end = _parse_date(options['until']) if options['until'] else None
+        if end is not None and start is None:
+            raise CommandError('--until 需要和 --since 一起使用')
+
+        while True:
+            result = run_rollups(options['only'], start, end)
+            for name, rows in result.items():
+                self.stdout.write(f"{name}: 写入 {rows} 行")
+
+            if not options['loop'] or start is not None:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
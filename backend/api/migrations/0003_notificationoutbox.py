@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('staff', '全部管理员')], default='staff', max_length=20, verbose_name='接收对象')),
+                ('notification_type', models.CharField(choices=[('order', '订单通知'), ('payment', '支付通知'), ('system', '系统通知'), ('promotion', '推广通知')], max_length=20, verbose_name='通知类型')),
+                ('title', models.CharField(max_length=200, verbose_name='标题')),
+                ('content', models.TextField(verbose_name='内容')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='元数据')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='处理时间')),
+                ('recipient_count', models.PositiveIntegerField(default=0, verbose_name='发送人数')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='处理次数')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+            ],
+            options={
+                'verbose_name': '通知发件箱',
+                'verbose_name_plural': '通知发件箱',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='api_notific_process_77aa7d_idx')],
+            },
+        ),
+    ]
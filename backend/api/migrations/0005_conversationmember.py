@@ -0,0 +1,111 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+BATCH_SIZE = 1000
+
+
+def _watermarks(Message, conversation_ids):
+    """一批会话各两次分组查询：最后一条消息ID，以及各发送者最早的未读消息ID"""
+    messages = Message.objects.filter(conversation_id__in=conversation_ids).order_by()
+    last_ids = dict(messages.values('conversation_id').annotate(last=Max('id')).values_list('conversation_id', 'last'))
+    first_unread = {}
+    rows = messages.filter(is_read=False).values('conversation_id', 'sender_id').annotate(first=Min('id'))
+    for row in rows.values_list('conversation_id', 'sender_id', 'first'):
+        first_unread.setdefault(row[0], []).append(row[1:])
+    return last_ids, first_unread
+
+
+def _member_rows(ConversationMember, Message, rows):
+    last_ids, first_unread = _watermarks(Message, {conversation_id for conversation_id, _ in rows})
+    members = []
+    for conversation_id, user_id in rows:
+        # 水位设在第一条未读的他人消息之前；没有则为最后一条消息
+        firsts = [first for sender_id, first in first_unread.get(conversation_id, ()) if sender_id != user_id]
+        watermark = min(firsts) - 1 if firsts else last_ids.get(conversation_id) or 0
+        members.append(ConversationMember(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            last_read_message_id=watermark
+        ))
+    return members
+
+
+def copy_participants(apps, schema_editor):
+    """把原自动中间表的参与者复制为会话成员，每批参与者只做两次分组查询和一次批量写入"""
+    Conversation = apps.get_model('api', 'Conversation')
+    ConversationMember = apps.get_model('api', 'ConversationMember')
+    Message = apps.get_model('api', 'Message')
+    Participants = Conversation.participants.through
+
+    rows = []
+    participants = Participants.objects.order_by('id').values_list('conversation_id', 'user_id')
+    for row in participants.iterator(chunk_size=BATCH_SIZE):
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            ConversationMember.objects.bulk_create(_member_rows(ConversationMember, Message, rows), ignore_conflicts=True)
+            rows = []
+    if rows:
+        ConversationMember.objects.bulk_create(_member_rows(ConversationMember, Message, rows), ignore_conflicts=True)
+
+
+def restore_participants(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    ConversationMember = apps.get_model('api', 'ConversationMember')
+    Participants = Conversation.participants.through
+    Participants.objects.bulk_create([
+        Participants(conversation_id=conversation_id, user_id=user_id)
+        for conversation_id, user_id in ConversationMember.objects.values_list('conversation_id', 'user_id')
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def drop_auto_table(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    schema_editor.delete_model(Conversation.participants.through)
+
+
+def create_auto_table(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    schema_editor.create_model(Conversation.participants.through)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_usercounters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0, verbose_name='已读到的消息ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True, verbose_name='加入时间')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='api.conversation', verbose_name='会话')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '会话成员',
+                'verbose_name_plural': '会话成员',
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(copy_participants, restore_participants),
+        # 参与者改为经由 ConversationMember，删除原自动中间表
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_auto_table, create_auto_table),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(through='api.ConversationMember', to=settings.AUTH_USER_MODEL, verbose_name='参与者'),
+                ),
+            ],
+        ),
+    ]
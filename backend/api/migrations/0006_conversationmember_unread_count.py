@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def compute_unread_counts(apps, schema_editor):
+    """未读数 = 已读水位之后他人发送的消息数"""
+    ConversationMember = apps.get_model('api', 'ConversationMember')
+    Message = apps.get_model('api', 'Message')
+    unread = Message.objects.filter(
+        conversation_id=OuterRef('conversation_id'),
+        id__gt=OuterRef('last_read_message_id')
+    ).exclude(sender_id=OuterRef('user_id')).order_by().values('conversation_id').annotate(
+        total=Count('id')
+    ).values('total')[:1]
+    ConversationMember.objects.update(unread_count=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_conversationmember'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationmember',
+            name='unread_count',
+            field=models.IntegerField(default=0, verbose_name='未读消息数'),
+        ),
+        migrations.RunPython(compute_unread_counts, migrations.RunPython.noop),
+    ]
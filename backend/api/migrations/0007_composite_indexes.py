@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_conversationmember_unread_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditapplication',
+            index=models.Index(fields=['status', '-created_at'], name='api_audit_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-created_at', '-id'], name='api_msg_conv_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='api_notif_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['category', 'status', 'created_at'], name='api_order_cat_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['category', 'created_at', 'id'], name='api_order_cat_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ridergrabrecord',
+            index=models.Index(fields=['user', 'grabbed_at', 'completed'], name='api_grab_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ridergrabrecord',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['user'], name='api_grab_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', '-created_at', '-id'], name='api_trans_wallet_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'transaction_type', '-created_at'], name='api_trans_wallet_type_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='日期')),
+                ('new_users', models.IntegerField(default=0, verbose_name='新增用户数')),
+                ('new_orders', models.IntegerField(default=0, verbose_name='新增订单数')),
+                ('completed_orders', models.IntegerField(default=0, verbose_name='完成订单数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '每日统计',
+                'verbose_name_plural': '每日统计',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsCounter',
+            fields=[
+                ('key', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='统计项')),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='数值')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '系统统计',
+                'verbose_name_plural': '系统统计',
+            },
+        ),
+    ]
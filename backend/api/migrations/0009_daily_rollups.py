@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_stats_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='汇总名称')),
+                ('processed_until', models.DateTimeField(verbose_name='已处理到')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '汇总水位',
+                'verbose_name_plural': '汇总水位',
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('transaction_type', models.CharField(choices=[('income', '收入'), ('expenditure', '支出'), ('refund', '退款'), ('withdraw', '提现')], max_length=20, verbose_name='交易类型')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='交易笔数')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='交易金额')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='已完成笔数')),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='已完成金额')),
+            ],
+            options={
+                'verbose_name': '交易日汇总',
+                'verbose_name_plural': '交易日汇总',
+                'ordering': ['date'],
+                'unique_together': {('date', 'transaction_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('created_count', models.IntegerField(default=0, verbose_name='新建订单数')),
+                ('created_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='新建订单金额')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='完成订单数')),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='完成订单金额')),
+                ('cancelled_count', models.IntegerField(default=0, verbose_name='取消订单数')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.ordercategory', verbose_name='订单分类')),
+            ],
+            options={
+                'verbose_name': '订单日汇总',
+                'verbose_name_plural': '订单日汇总',
+                'ordering': ['date'],
+                'unique_together': {('date', 'category')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RiderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('grabbed_count', models.IntegerField(default=0, verbose_name='接单数')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='完成数')),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='完成订单金额')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='骑手')),
+            ],
+            options={
+                'verbose_name': '骑手日汇总',
+                'verbose_name_plural': '骑手日汇总',
+                'ordering': ['date'],
+                'unique_together': {('date', 'rider')},
+            },
+        ),
+    ]
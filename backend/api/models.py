@@ -5,7 +5,21 @@ from django.utils import timezone
 import uuid
 
 
-class UserProfile(models.Model):
+class LoadedRowMixin:
+    """
+    记录从数据库读出时的列（只保存 from_db 收到的引用，不复制、不建字典）
+
+    保存时 dashboard_stats.track_save 据此计算统计变化量，不必在保存前回查数据库
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_row = (field_names, values)
+        return instance
+
+
+class UserProfile(LoadedRowMixin, models.Model):
     """用户资料扩展"""
     GENDER_CHOICES = [
         ('male', '男'),
@@ -125,7 +139,7 @@ class BlacklistRecord(models.Model):
         return True
 
 
-class AuditApplication(models.Model):
+class AuditApplication(LoadedRowMixin, models.Model):
     """审核申请"""
     AUDIT_TYPES = [
         ('rider', '骑手申请'),
@@ -153,12 +167,16 @@ class AuditApplication(models.Model):
     class Meta:
         verbose_name = '审核申请'
         verbose_name_plural = '审核管理'
+        indexes = [
+            # 审核列表：按状态筛选、按申请时间倒序
+            models.Index(fields=['status', '-created_at'], name='api_audit_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_audit_type_display()}"
 
 
-class Wallet(models.Model):
+class Wallet(LoadedRowMixin, models.Model):
     """用户钱包"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='用户')
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='余额')
@@ -213,6 +231,11 @@ class Transaction(models.Model):
         verbose_name = '交易记录'
         verbose_name_plural = '交易记录管理'
         ordering = ['-created_at']
+        indexes = [
+            # 交易记录列表（含游标分页），以及按类型筛选
+            models.Index(fields=['wallet', '-created_at', '-id'], name='api_trans_wallet_created_idx'),
+            models.Index(fields=['wallet', 'transaction_type', '-created_at'], name='api_trans_wallet_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.amount}"
@@ -243,6 +266,13 @@ class Notification(models.Model):
         verbose_name = '用户通知'
         verbose_name_plural = '用户通知管理'
         ordering = ['-created_at']
+        indexes = [
+            # 通知列表（含游标分页）
+            models.Index(fields=['user', '-created_at', '-id'], name='api_notif_user_created_idx'),
+            # 未读通知：只索引未读行，已读的历史通知不占索引
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False),
+                         name='api_notif_user_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -257,11 +287,11 @@ class Notification(models.Model):
 
 class Conversation(models.Model):
     """会话"""
-    participants = models.ManyToManyField(User, verbose_name='参与者')
+    participants = models.ManyToManyField(User, through='ConversationMember', verbose_name='参与者')
     last_message = models.TextField(blank=True, verbose_name='最后一条消息')
     last_message_time = models.DateTimeField(auto_now=True, verbose_name='最后消息时间')
 
-    # 新增字段
+    # 新增字段（已停用：未读数按成员记录在 ConversationMember.unread_count）
     unread_count = models.IntegerField(default=0, verbose_name='未读消息数')
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -276,11 +306,14 @@ class Conversation(models.Model):
         return f"{participants_str} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
     def update_last_message(self, message, sender):
-        """更新最后一条消息"""
+        """更新最后一条消息，并为发送者以外的成员增加未读数"""
         self.last_message = message[:100]  # 只保存前100个字符
         self.last_message_time = timezone.now()
-        self.unread_count += 1
-        self.save()
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message=self.last_message,
+            last_message_time=self.last_message_time
+        )
+        self.members.exclude(user=sender).update(unread_count=models.F('unread_count') + 1)
 
 
 class Message(models.Model):
@@ -308,11 +341,34 @@ class Message(models.Model):
         verbose_name = '消息'
         verbose_name_plural = '消息管理'
         ordering = ['created_at']
+        indexes = [
+            # 会话消息列表（含游标分页）
+            models.Index(fields=['conversation', '-created_at', '-id'], name='api_msg_conv_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:20]}..."
 
 
+class ConversationMember(models.Model):
+    """会话成员：参与者及其已读位置（已读水位）和未读数，计数用 F 表达式更新"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members',
+                                     verbose_name='会话')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships',
+                             verbose_name='用户')
+    last_read_message_id = models.BigIntegerField(default=0, verbose_name='已读到的消息ID')
+    unread_count = models.IntegerField(default=0, verbose_name='未读消息数')
+    joined_at = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
+
+    class Meta:
+        verbose_name = '会话成员'
+        verbose_name_plural = '会话成员'
+        unique_together = ['conversation', 'user']
+
+    def __str__(self):
+        return f"{self.user.username} @ {self.conversation_id}"
+
+
 # 订单分类模型
 class OrderCategory(models.Model):
     """订单分类"""
@@ -341,7 +397,7 @@ class OrderCategory(models.Model):
 
 
 # 订单模型
-class Order(models.Model):
+class Order(LoadedRowMixin, models.Model):
     """订单模型"""
     STATUS_CHOICES = [
         ('pending', '待接单'),
@@ -394,6 +450,10 @@ class Order(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['user', 'status']),
             models.Index(fields=['rider', 'status']),
+            models.Index(fields=['category', 'status', 'created_at'], name='api_order_cat_status_idx'),
+            # 派单队列补充：各分类最早的待接订单，只索引 pending 行
+            models.Index(fields=['category', 'created_at', 'id'], condition=models.Q(status='pending'),
+                         name='api_order_cat_pending_idx'),
         ]
 
     def __str__(self):
@@ -443,6 +503,12 @@ class RiderGrabRecord(models.Model):
         verbose_name_plural = '骑手接单记录'
         ordering = ['-grabbed_at']
         unique_together = ['user', 'order']  # 一个骑手只能接一个订单一次
+        indexes = [
+            # 接单额度：时间窗口内的接单记录
+            models.Index(fields=['user', 'grabbed_at', 'completed'], name='api_grab_user_time_idx'),
+            # 未完成订单数
+            models.Index(fields=['user'], condition=models.Q(completed=False), name='api_grab_user_open_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} 接了订单 {self.order.order_no}"
@@ -493,7 +559,7 @@ class Announcement(models.Model):
         return True
 
 
-class UserFeedback(models.Model):
+class UserFeedback(LoadedRowMixin, models.Model):
     """用户反馈"""
     FEEDBACK_TYPES = [
         ('bug', '问题反馈'),
@@ -559,6 +625,186 @@ class WechatSession(models.Model):
         return self.expires_at > timezone.now()
 
 
+# 已吊销令牌
+class RevokedToken(models.Model):
+    """已吊销的JWT令牌（退出登录等），过期后可清理"""
+    jti = models.CharField(max_length=64, unique=True, verbose_name='令牌ID')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name='用户')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='令牌过期时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='吊销时间')
+
+    class Meta:
+        verbose_name = '已吊销令牌'
+        verbose_name_plural = '已吊销令牌'
+
+    def __str__(self):
+        return self.jti
+
+
+class NotificationOutbox(models.Model):
+    """
+    通知发件箱
+
+    需要群发的通知（如通知全部管理员）先在业务事务中写入一行，
+    由 process_notification_outbox 命令在后台展开为 Notification
+    """
+    AUDIENCE_CHOICES = [
+        ('staff', '全部管理员'),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default='staff', verbose_name='接收对象')
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES,
+                                         verbose_name='通知类型')
+    title = models.CharField(max_length=200, verbose_name='标题')
+    content = models.TextField(verbose_name='内容')
+    metadata = models.JSONField(default=dict, blank=True, verbose_name='元数据')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='处理时间')
+    recipient_count = models.PositiveIntegerField(default=0, verbose_name='发送人数')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='处理次数')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+
+    class Meta:
+        verbose_name = '通知发件箱'
+        verbose_name_plural = '通知发件箱'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_audience_display()} - {self.title}"
+
+
+class UserCounters(models.Model):
+    """
+    用户未读计数（冗余字段）
+
+    通知/消息创建和已读时用 F 表达式原子增减，角标查询只需一次主键查找；
+    与明细表不一致时用 repair_user_counters 命令重算
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='counters',
+                                verbose_name='用户')
+    unread_notifications = models.IntegerField(default=0, verbose_name='未读通知数')
+    unread_messages = models.IntegerField(default=0, verbose_name='未读消息数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '用户计数'
+        verbose_name_plural = '用户计数'
+
+    def __str__(self):
+        return f"{self.user_id} 未读通知 {self.unread_notifications} / 未读消息 {self.unread_messages}"
+
+
+class StatsCounter(models.Model):
+    """
+    系统统计计数（管理后台看板）
+
+    相关模型保存/删除时按变化量用 F 表达式增减；与明细表不一致时用 recount_stats 命令重算
+    """
+    key = models.CharField(max_length=50, primary_key=True, verbose_name='统计项')
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name='数值')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '系统统计'
+        verbose_name_plural = '系统统计'
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class DailyStats(models.Model):
+    """每日统计（按本地日期），维护方式同 StatsCounter"""
+    date = models.DateField(unique=True, verbose_name='日期')
+    new_users = models.IntegerField(default=0, verbose_name='新增用户数')
+    new_orders = models.IntegerField(default=0, verbose_name='新增订单数')
+    completed_orders = models.IntegerField(default=0, verbose_name='完成订单数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '每日统计'
+        verbose_name_plural = '每日统计'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date} 新增用户 {self.new_users} / 新增订单 {self.new_orders}"
+
+
+class OrderDailyRollup(models.Model):
+    """订单日汇总（按本地日期和分类），由 run_rollups 命令按天整体重算"""
+    date = models.DateField(verbose_name='日期')
+    category = models.ForeignKey(OrderCategory, on_delete=models.CASCADE, null=True, blank=True,
+                                 verbose_name='订单分类')
+    created_count = models.IntegerField(default=0, verbose_name='新建订单数')
+    created_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='新建订单金额')
+    completed_count = models.IntegerField(default=0, verbose_name='完成订单数')
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='完成订单金额')
+    cancelled_count = models.IntegerField(default=0, verbose_name='取消订单数')
+
+    class Meta:
+        verbose_name = '订单日汇总'
+        verbose_name_plural = '订单日汇总'
+        unique_together = ['date', 'category']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.category_id} 新建 {self.created_count} / 完成 {self.completed_count}"
+
+
+class RevenueDailyRollup(models.Model):
+    """交易日汇总（按创建日期和交易类型），由 run_rollups 命令按天整体重算"""
+    date = models.DateField(verbose_name='日期')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES,
+                                        verbose_name='交易类型')
+    transaction_count = models.IntegerField(default=0, verbose_name='交易笔数')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='交易金额')
+    completed_count = models.IntegerField(default=0, verbose_name='已完成笔数')
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='已完成金额')
+
+    class Meta:
+        verbose_name = '交易日汇总'
+        verbose_name_plural = '交易日汇总'
+        unique_together = ['date', 'transaction_type']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.transaction_type} {self.amount}"
+
+
+class RiderDailyRollup(models.Model):
+    """骑手日汇总（按本地日期），由 run_rollups 命令按天整体重算"""
+    date = models.DateField(verbose_name='日期')
+    rider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name='骑手')
+    grabbed_count = models.IntegerField(default=0, verbose_name='接单数')
+    completed_count = models.IntegerField(default=0, verbose_name='完成数')
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='完成订单金额')
+
+    class Meta:
+        verbose_name = '骑手日汇总'
+        verbose_name_plural = '骑手日汇总'
+        unique_together = ['date', 'rider']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.rider_id} 接单 {self.grabbed_count} / 完成 {self.completed_count}"
+
+
+class RollupWatermark(models.Model):
+    """汇总水位：该时间之后有变化的明细所在日期会在下次运行时重算"""
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='汇总名称')
+    processed_until = models.DateTimeField(verbose_name='已处理到')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '汇总水位'
+        verbose_name_plural = '汇总水位'
+
+    def __str__(self):
+        return f"{self.name} {self.processed_until}"
+
+
 # 地址模型
 class Address(models.Model):
     """用户地址"""
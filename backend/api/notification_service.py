@@ -0,0 +1,104 @@
+# backend/api/notification_service.py
+import logging
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Notification, NotificationOutbox
+from .user_counters import add_unread_notifications
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500  # 每批写入的通知条数
+MAX_ATTEMPTS = 5  # 超过后不再重试，保留 last_error 供排查
+
+
+def notify_admins(notification_type, title, content, metadata=None):
+    """
+    通知全部管理员
+
+    只在当前事务中写入一行发件箱，与业务数据一起提交或回滚；
+    展开为每个管理员的 Notification 由后台命令完成
+    """
+    return NotificationOutbox.objects.create(
+        audience='staff',
+        notification_type=notification_type,
+        title=title,
+        content=content,
+        metadata=metadata or {}
+    )
+
+
+def _recipient_ids(audience):
+    if audience == 'staff':
+        return User.objects.filter(is_staff=True).order_by('id').values_list('id', flat=True)
+    raise ValueError(f'未知的接收对象: {audience}')
+
+
+def _bulk_create(notifications):
+    """批量写入通知并更新未读计数（bulk_create 不触发信号）"""
+    Notification.objects.bulk_create(notifications)
+    add_unread_notifications([notification.user_id for notification in notifications])
+    return len(notifications)
+
+
+def _expand(entry, batch_size):
+    """按批 bulk_create 通知，返回发送人数"""
+    total = 0
+    batch = []
+    for user_id in _recipient_ids(entry.audience).iterator(chunk_size=batch_size):
+        batch.append(Notification(
+            user_id=user_id,
+            notification_type=entry.notification_type,
+            title=entry.title,
+            content=entry.content,
+            metadata=entry.metadata
+        ))
+        if len(batch) >= batch_size:
+            total += _bulk_create(batch)
+            batch = []
+    if batch:
+        total += _bulk_create(batch)
+    return total
+
+
+def process_outbox(limit=100, batch_size=BATCH_SIZE):
+    """
+    处理待发送的发件箱记录
+
+    每条记录在独立事务中展开并标记完成，失败时回滚该条并记录错误；
+    支持 SKIP LOCKED 的数据库上多个 worker 可以并行处理
+
+    Returns:
+        int: 处理完成的记录数
+    """
+    processed = 0
+    failed_ids = []  # 本轮失败的记录留到下一轮重试
+    while processed < limit:
+        with transaction.atomic():
+            pending = NotificationOutbox.objects.filter(
+                processed_at__isnull=True,
+                attempts__lt=MAX_ATTEMPTS
+            ).exclude(id__in=failed_ids).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            entry = pending.first()
+            if entry is None:
+                break
+
+            try:
+                with transaction.atomic():
+                    entry.recipient_count = _expand(entry, batch_size)
+            except Exception as e:
+                logger.error(f'展开通知发件箱 {entry.id} 失败: {str(e)}')
+                NotificationOutbox.objects.filter(id=entry.id).update(
+                    attempts=entry.attempts + 1,
+                    last_error=str(e)
+                )
+                failed_ids.append(entry.id)
+                continue
+
+            entry.attempts += 1
+            entry.processed_at = timezone.now()
+            entry.save(update_fields=['recipient_count', 'attempts', 'processed_at'])
+            processed += 1
+    return processed
@@ -0,0 +1,215 @@
+# backend/api/order_feed.py
+import json
+import time
+import asyncio
+import threading
+import logging
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .responses import get_json_encoder
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """一个订阅者：在自己的事件循环上接收消息"""
+
+    MAX_PENDING = 100  # 消费过慢时丢弃多余消息，客户端可按 since 补拉
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.MAX_PENDING)
+
+    def deliver(self, message):
+        """可在任意线程调用"""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning('订单推送订阅者消费过慢，丢弃消息')
+
+    async def get(self, timeout):
+        """等待下一条消息，超时返回 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self):
+        """取出已到达的全部消息"""
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    进程内发布/订阅
+
+    发布方可以是任意线程（同步视图、信号），订阅方是 ASGI 事件循环上的请求。
+    只能推送给同一进程内的订阅者，多进程部署使用 RedisBroker（接口相同：
+    subscribe(channels) / unsubscribe(subscription) / publish(channel, message)，
+    shared 表示能否收到其他进程发布的消息）
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._subscribers = {}  # channel -> set[Subscription]
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        return self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        """投递给本进程内订阅了该频道的订阅者"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    基于 Redis pub/sub 的发布/订阅，多进程共享
+
+    发布写入 Redis 频道 order_feed:{channel}；每个进程在第一次订阅时启动一个监听线程，
+    按模式订阅 order_feed:*，收到的消息再投递给本进程内的订阅者
+    """
+
+    shared = True
+    CHANNEL_PREFIX = 'order_feed:'
+    RECONNECT_DELAY = 1  # 连接断开后重连的间隔（秒）
+
+    def __init__(self, url=None):
+        super().__init__()
+        import redis
+
+        self._redis = redis.Redis.from_url(url or settings.ORDER_FEED_REDIS_URL)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def publish(self, channel, message):
+        """返回收到消息的进程数"""
+        return self._redis.publish(self.CHANNEL_PREFIX + channel, get_json_encoder().dumps(message))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='order-feed-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.CHANNEL_PREFIX + '*')
+                for item in pubsub.listen():
+                    self._handle(item)
+            except Exception as e:
+                # 断线期间的消息由客户端按 since 补拉
+                logger.error(f'订单推送 Redis 订阅断开: {e}')
+                time.sleep(self.RECONNECT_DELAY)
+
+    def _handle(self, item):
+        if item.get('type') != 'pmessage':
+            return
+        channel = item['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        self._deliver(channel[len(self.CHANNEL_PREFIX):], json.loads(item['data']))
+
+
+def category_channel(category_id):
+    return f"order_category:{category_id}"
+
+
+def serialize_feed_order(order):
+    """推送给骑手的订单摘要"""
+    return {
+        'order_id': order.id,
+        'order_no': str(order.order_no),
+        'category_id': order.category_id,
+        'title': order.title,
+        'price': float(order.price),
+        'pickup_location': order.pickup_location,
+        'delivery_location': order.delivery_location,
+        'created_at': order.created_at or '',
+    }
+
+
+def publish_order(order):
+    """新待接订单推送给订阅了该分类的骑手"""
+    if not order.category_id:
+        return 0
+    try:
+        return get_order_feed_broker().publish(category_channel(order.category_id), serialize_feed_order(order))
+    except Exception as e:
+        # 推送失败不影响下单，骑手可按 since 补拉
+        logger.error(f'推送新订单失败: {e}')
+        return 0
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_order_feed_broker():
+    """按 ORDER_FEED_BROKER 配置（类路径）返回进程内共享的 broker"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = getattr(settings, 'ORDER_FEED_BROKER', 'api.order_feed.InProcessBroker')
+                _broker = import_string(broker_class)()
+    return _broker
+
+
+def feed_unavailable_reason(request, broker):
+    """
+    不能提供推送（长轮询 / SSE）的原因，可以时返回 None
+
+    - WSGI 下等待会一直占用工作线程
+    - 进程内 broker 收不到其他 worker 发布的订单，只有声明单进程部署
+      （ORDER_FEED_SINGLE_PROCESS）或 DEBUG 时使用
+    """
+    from django.core.handlers.asgi import ASGIRequest
+
+    if not isinstance(request, ASGIRequest):
+        return '订单推送需要部署在 ASGI 下'
+    if not broker.shared and not (settings.DEBUG or getattr(settings, 'ORDER_FEED_SINGLE_PROCESS', False)):
+        return '订单推送未配置共享的发布/订阅服务'
+    return None
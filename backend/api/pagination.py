@@ -0,0 +1,203 @@
+# backend/api/pagination.py
+import base64
+import json
+from django.db import connection
+from django.db.models import Q
+
+ESTIMATE_EXACT_LIMIT = 10000  # 估算总数时，不超过该值的结果给出精确数
+
+
+def encode_cursor(values):
+    """排序字段值编码为不透明的游标字符串"""
+    raw = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解码游标
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('无效的游标') from e
+    if not isinstance(values, list):
+        raise ValueError('无效的游标')
+    return values
+
+
+class CursorPaginator:
+    """
+    键集（游标）分页
+
+    按 ordering 中的字段（最后一个字段须唯一，通常是 id）定位下一页，
+    不使用 OFFSET，翻页深度不影响查询代价
+    """
+
+    def __init__(self, queryset, ordering=('-created_at', '-id'), page_size=20, max_page_size=100):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.page_size = max(1, min(int(page_size), max_page_size))
+
+    def _after(self, values):
+        """构造“排在游标之后”的条件"""
+        model = self.queryset.model
+        values = [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            field = self.fields[index]
+            clause = Q(**{f'{field}__{lookup}': values[index]})
+            for prev_field, prev_value in zip(self.fields[:index], values[:index]):
+                clause &= Q(**{prev_field: prev_value})
+            condition |= clause
+        return condition
+
+    def page(self, cursor=None):
+        """
+        Args:
+            cursor: 上一页返回的 next_cursor，为空时取第一页
+
+        Returns:
+            tuple: (本页对象列表, 下一页游标或 None)
+
+        Raises:
+            ValueError: 游标格式错误
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(self.fields):
+                raise ValueError('无效的游标')
+            queryset = queryset.filter(self._after(values))
+
+        items = list(queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[:self.page_size]
+            last = items[-1]
+            next_cursor = encode_cursor([self._value(last, name) for name in self.fields])
+        return items, next_cursor
+
+    @staticmethod
+    def _value(item, name):
+        value = item[name] if isinstance(item, dict) else getattr(item, name)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def estimate_count(queryset, exact_limit=ESTIMATE_EXACT_LIMIT):
+    """
+    估算结果总数
+
+    最多精确统计 exact_limit + 1 行（带 LIMIT 的子查询），超过后在 PostgreSQL 上
+    取查询计划的行数估计，其他数据库返回 exact_limit + 1 作为下限
+
+    Returns:
+        tuple: (总数, 是否精确)
+    """
+    total = queryset.order_by()[:exact_limit + 1].count()
+    if total <= exact_limit:
+        return total, True
+
+    if connection.vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return max(int(plan[0]['Plan']['Plan Rows']), total), False
+        except (ValueError, KeyError, IndexError, TypeError):
+            pass
+    return total, False
+
+
+def paginate_by_cursor(request, queryset, ordering=('-created_at', '-id'), default_page_size=20):
+    """
+    按请求参数进行游标分页，供列表接口在请求带 cursor 参数时使用
+
+    请求参数：
+        cursor: 上一页返回的 next_cursor，首页传空字符串
+        page_size: 每页条数
+        count: exact 精确总数 / estimate 估算总数，默认不统计
+
+    Returns:
+        tuple: (本页对象列表, 分页信息 dict)
+
+    Raises:
+        ValueError: 参数或游标格式错误
+    """
+    paginator = CursorPaginator(
+        queryset,
+        ordering=ordering,
+        page_size=request.GET.get('page_size') or default_page_size
+    )
+    items, next_cursor = paginator.page(request.GET.get('cursor'))
+
+    meta = {
+        'next_cursor': next_cursor,
+        'page_size': paginator.page_size
+    }
+    count_mode = request.GET.get('count', '')
+    if count_mode == 'exact':
+        meta['total'] = queryset.count()
+        meta['total_is_estimate'] = False
+    elif count_mode == 'estimate':
+        meta['total'], exact = estimate_count(queryset)
+        meta['total_is_estimate'] = not exact
+    return items, meta
+
+
+def paginate_list_by_cursor(request, items, model, ordering=('-created_at', '-id'), default_page_size=20):
+    """
+    对已按 ordering 排好序的内存列表（dict）做游标分页，参数和返回与 paginate_by_cursor 相同
+
+    用于数据已在缓存中的小列表，总数总是精确的
+
+    Raises:
+        ValueError: 参数或游标格式错误
+    """
+    paginator = CursorPaginator(model.objects.none(), ordering=ordering,
+                                page_size=request.GET.get('page_size') or default_page_size)
+    start = 0
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(paginator.fields):
+            raise ValueError('无效的游标')
+        after = [model._meta.get_field(name).to_python(value) for name, value in zip(paginator.fields, values)]
+        start = len(items)
+        for index, item in enumerate(items):
+            if _is_after(item, after, paginator.ordering):
+                start = index
+                break
+
+    page = items[start:start + paginator.page_size]
+    next_cursor = None
+    if start + paginator.page_size < len(items):
+        next_cursor = encode_cursor([paginator._value(page[-1], name) for name in paginator.fields])
+
+    meta = {
+        'next_cursor': next_cursor,
+        'page_size': paginator.page_size
+    }
+    if request.GET.get('count', '') in ('exact', 'estimate'):
+        meta['total'] = len(items)
+        meta['total_is_estimate'] = False
+    return page, meta
+
+
+def _is_after(item, values, ordering):
+    """item 是否排在游标位置之后"""
+    for name, value in zip(ordering, values):
+        current = item[name.lstrip('-')]
+        if current != value:
+            return current < value if name.startswith('-') else current > value
+    return False
+
+
+def wants_cursor(request):
+    """请求是否选择游标分页（带 cursor 参数，首页可为空）"""
+    return 'cursor' in request.GET
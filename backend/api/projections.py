@@ -0,0 +1,190 @@
+# backend/api/projections.py
+"""
+列表接口的列投影
+
+列表只用 values() 取输出需要的列，不实例化模型，也不读取列表用不到的
+大字段（content、metadata、application_data 等）。请求可通过 fields 参数
+（逗号分隔）只取部分字段，完整内容在详情接口获取
+"""
+from .models import Announcement, AuditApplication, Notification, Transaction, UserFeedback
+
+
+class Field:
+    """
+    输出字段
+
+    Args:
+        source: values() 中的列（可跨关联，如 user__username），默认与输出字段同名
+        render: 对非空值的转换
+        default: 值为 None 时的输出
+    """
+
+    def __init__(self, source=None, render=None, default=None):
+        self.source = source
+        self.render = render
+        self.default = default
+
+    def bind(self, name, model):
+        if self.source is None:
+            self.source = name
+
+    @property
+    def columns(self):
+        return (self.source,)
+
+    def value(self, row):
+        value = row[self.source]
+        if value is None:
+            return self.default
+        return self.render(value) if self.render else value
+
+
+class ChoiceDisplay(Field):
+    """choices 字段的显示名，等同于 get_FOO_display()"""
+
+    def bind(self, name, model):
+        super().bind(name, model)
+        self.choices = dict(model._meta.get_field(self.source).flatchoices)
+
+    def value(self, row):
+        value = row[self.source]
+        return self.choices.get(value, value)
+
+
+class ListProjection:
+    """
+    声明式的列表投影，子类声明 model 和 fields（输出字段名 -> Field）
+
+    用法：
+        names = NotificationProjection.parse_fields(request)
+        rows = NotificationProjection.project(queryset, names)[offset:offset + page_size]
+        data = NotificationProjection.render(rows, names)
+    """
+    model = None
+    fields = {}
+    required = ('id',)  # 始终返回的字段
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, field in cls.fields.items():
+            field.bind(name, cls.model)
+
+    @classmethod
+    def parse_fields(cls, request):
+        """
+        读取 fields 参数，未传时返回全部字段
+
+        Raises:
+            ValueError: 包含未知字段
+        """
+        raw = request.GET.get('fields', '').strip()
+        if not raw:
+            return list(cls.fields)
+
+        names = list(cls.required)
+        for name in (part.strip() for part in raw.split(',')):
+            if not name or name in names:
+                continue
+            if name not in cls.fields:
+                raise ValueError(f'未知字段: {name}')
+            names.append(name)
+        return names
+
+    @classmethod
+    def project(cls, queryset, names, ordering=()):
+        """只查询 names 需要的列；ordering 中的排序字段一并取出，供游标分页使用"""
+        columns = []
+        for name in names:
+            columns.extend(cls.fields[name].columns)
+        columns.extend(name.lstrip('-') for name in ordering)
+        return queryset.values(*dict.fromkeys(columns))
+
+    @classmethod
+    def render(cls, rows, names):
+        fields = [(name, cls.fields[name]) for name in names]
+        return [{name: field.value(row) for name, field in fields} for row in rows]
+
+
+class TransactionProjection(ListProjection):
+    model = Transaction
+    fields = {
+        'id': Field(),
+        'transaction_type': Field(),
+        'transaction_type_display': ChoiceDisplay('transaction_type'),
+        'amount': Field(render=str),
+        'status': Field(),
+        'status_display': ChoiceDisplay('status'),
+        'description': Field(),
+        'metadata': Field(),
+        'created_at': Field(),
+        'completed_at': Field(),
+    }
+
+
+class NotificationProjection(ListProjection):
+    model = Notification
+    fields = {
+        'id': Field(),
+        'notification_type': Field(),
+        'notification_type_display': ChoiceDisplay('notification_type'),
+        'title': Field(),
+        'content': Field(),
+        'is_read': Field(),
+        'metadata': Field(),
+        'created_at': Field(),
+        'read_at': Field(),
+    }
+
+
+class AnnouncementProjection(ListProjection):
+    model = Announcement
+    fields = {
+        'id': Field(),
+        'announcement_type': Field(),
+        'announcement_type_display': ChoiceDisplay('announcement_type'),
+        'title': Field(),
+        'content': Field(),
+        'priority': Field(),
+        'cover_image': Field(),
+        'is_active': Field(),
+        'created_at': Field(),
+        'updated_at': Field(),
+    }
+
+
+class FeedbackProjection(ListProjection):
+    model = UserFeedback
+    fields = {
+        'id': Field(),
+        'user_id': Field(),
+        'username': Field('user__username', default='匿名'),
+        'feedback_type': Field(),
+        'feedback_type_display': ChoiceDisplay('feedback_type'),
+        'title': Field(),
+        'content': Field(),
+        'status': Field(),
+        'status_display': ChoiceDisplay('status'),
+        'reply': Field(),
+        'contact': Field(),
+        'created_at': Field(),
+        'updated_at': Field(),
+    }
+
+
+class AuditApplicationProjection(ListProjection):
+    model = AuditApplication
+    fields = {
+        'id': Field(),
+        'user_id': Field(),
+        'username': Field('user__username'),
+        'real_name': Field('user__userprofile__real_name', default=''),
+        'audit_type': Field(),
+        'audit_type_display': ChoiceDisplay('audit_type'),
+        'application_data': Field(),
+        'status': Field(),
+        'status_display': ChoiceDisplay('status'),
+        'reject_reason': Field(),
+        'created_at': Field(),
+        'reviewed_at': Field(),
+        'reviewer': Field('reviewer__username'),
+    }
@@ -0,0 +1,184 @@
+# backend/api/report_views.py
+import logging
+from datetime import date, timedelta
+from django.db.models import Sum
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from .decorators import api_login_required
+from .responses import api_error, api_ok
+from .models import OrderDailyRollup, RevenueDailyRollup, RiderDailyRollup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+RIDER_RANKING_LIMIT = 100
+
+
+def _forbidden():
+    return api_error(403, '权限不足', status=403)
+
+
+def _parse_range(request):
+    """
+    读取 start/end（YYYY-MM-DD，含两端），默认最近30天
+
+    Raises:
+        ValueError: 日期格式错误或区间过大
+    """
+    try:
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = (date.fromisoformat(request.GET['start']) if request.GET.get('start')
+                 else end - timedelta(days=DEFAULT_RANGE_DAYS - 1))
+    except ValueError:
+        raise ValueError('日期格式错误，应为 YYYY-MM-DD')
+    if start > end:
+        raise ValueError('开始日期不能晚于结束日期')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'查询区间不能超过{MAX_RANGE_DAYS}天')
+    return start, end
+
+
+def _number(value):
+    """金额转为 float，与其他统计接口一致"""
+    return float(value) if value is not None else 0
+
+
+def _range_response(fetch, request):
+    """统一处理区间参数和错误，fetch(start, end) 返回 data"""
+    try:
+        start, end = _parse_range(request)
+        return api_ok({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **fetch(start, end)
+        }, '获取成功')
+    except ValueError as e:
+        return api_error(400, str(e))
+    except Exception as e:
+        logger.error(f'获取汇总数据失败: {str(e)}')
+        return api_error(500, f'服务器错误: {str(e)}')
+
+
+@csrf_exempt
+@api_login_required
+@require_http_methods(["GET"])
+def order_rollup_report(request):
+    """
+    订单日趋势（管理员）
+
+    参数：start、end（含两端），category_id 可选；按天返回，无数据的日期补 0
+    """
+    if not request.user.is_staff:
+        return _forbidden()
+
+    fields = ('created_count', 'created_amount', 'completed_count', 'completed_amount', 'cancelled_count')
+
+    def fetch(start, end):
+        rollups = OrderDailyRollup.objects.filter(date__gte=start, date__lte=end)
+        if request.GET.get('category_id'):
+            rollups = rollups.filter(category_id=int(request.GET['category_id']))
+        by_date = {
+            row['date']: row
+            for row in rollups.values('date').annotate(**{field: Sum(field) for field in fields}).order_by('date')
+        }
+
+        series = []
+        day = start
+        while day <= end:
+            row = by_date.get(day, {})
+            series.append({
+                'date': day.isoformat(),
+                **{field: _number(row.get(field)) if field.endswith('amount') else row.get(field, 0)
+                   for field in fields}
+            })
+            day += timedelta(days=1)
+        totals = {field: sum(item[field] for item in series) for field in fields}
+        return {'series': series, 'totals': totals}
+
+    return _range_response(fetch, request)
+
+
+@csrf_exempt
+@api_login_required
+@require_http_methods(["GET"])
+def revenue_rollup_report(request):
+    """
+    交易日汇总（管理员）
+
+    参数：start、end（含两端），type 可选（交易类型）；按天、类型返回
+    """
+    if not request.user.is_staff:
+        return _forbidden()
+
+    def fetch(start, end):
+        rollups = RevenueDailyRollup.objects.filter(date__gte=start, date__lte=end).order_by('date', 'transaction_type')
+        if request.GET.get('type'):
+            rollups = rollups.filter(transaction_type=request.GET['type'])
+        return {
+            'series': [
+                {
+                    'date': rollup.date.isoformat(),
+                    'transaction_type': rollup.transaction_type,
+                    'transaction_count': rollup.transaction_count,
+                    'amount': _number(rollup.amount),
+                    'completed_count': rollup.completed_count,
+                    'completed_amount': _number(rollup.completed_amount)
+                }
+                for rollup in rollups
+            ]
+        }
+
+    return _range_response(fetch, request)
+
+
+@csrf_exempt
+@api_login_required
+@require_http_methods(["GET"])
+def rider_rollup_report(request):
+    """
+    骑手业绩（管理员）
+
+    参数：start、end（含两端）；带 rider_id 时返回该骑手按天的数据，
+    否则返回区间内按完成数排序的骑手排行（limit，默认20）
+    """
+    if not request.user.is_staff:
+        return _forbidden()
+
+    def fetch(start, end):
+        rollups = RiderDailyRollup.objects.filter(date__gte=start, date__lte=end)
+        if request.GET.get('rider_id'):
+            rollups = rollups.filter(rider_id=int(request.GET['rider_id'])).order_by('date')
+            return {
+                'series': [
+                    {
+                        'date': rollup.date.isoformat(),
+                        'grabbed_count': rollup.grabbed_count,
+                        'completed_count': rollup.completed_count,
+                        'completed_amount': _number(rollup.completed_amount)
+                    }
+                    for rollup in rollups
+                ]
+            }
+
+        limit = max(1, min(int(request.GET.get('limit', 20)), RIDER_RANKING_LIMIT))
+        ranking = rollups.values('rider_id', 'rider__username').annotate(
+            grabbed=Sum('grabbed_count'),
+            completed=Sum('completed_count'),
+            amount=Sum('completed_amount')
+        ).order_by('-completed', '-grabbed', 'rider_id')[:limit]
+        return {
+            'ranking': [
+                {
+                    'rider_id': row['rider_id'],
+                    'username': row['rider__username'],
+                    'grabbed_count': row['grabbed'],
+                    'completed_count': row['completed'],
+                    'completed_amount': _number(row['amount'])
+                }
+                for row in ranking
+            ]
+        }
+
+    return _range_response(fetch, request)
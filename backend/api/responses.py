@@ -0,0 +1,101 @@
+# backend/api/responses.py
+import json
+import uuid
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 与各接口原有的 strftime 格式一致（不做时区转换）
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _default(obj):
+    """标准库和 orjson 都不直接支持（或需保持原格式）的类型"""
+    if isinstance(obj, datetime):
+        # 与 strftime(DATETIME_FORMAT) 结果相同，isoformat 快约一倍
+        return obj.isoformat(' ', 'seconds')[:19]
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'无法序列化 {type(obj).__name__}')
+
+
+class StdlibJSONEncoder:
+    """标准库 json"""
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonEncoder:
+    """orjson：datetime 交给 _default 以保持原有格式，其余类型原生处理"""
+    name = 'orjson'
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=_default, option=self.OPTIONS)
+
+
+def _create_encoder():
+    backend = getattr(settings, 'API_JSON_ENCODER', 'auto')
+    if backend == 'json':
+        return StdlibJSONEncoder()
+    if orjson is None:
+        if backend == 'orjson':
+            logger.warning('API_JSON_ENCODER=orjson 但未安装 orjson，使用标准库 json')
+        return StdlibJSONEncoder()
+    return OrjsonEncoder()
+
+
+_encoder = None
+
+
+def get_json_encoder():
+    global _encoder
+    if _encoder is None:
+        _encoder = _create_encoder()
+    return _encoder
+
+
+def api_json(payload, status=200):
+    """
+    把任意可序列化对象作为 JSON 响应返回（非标准结构，如微信回调应答）
+
+    返回体带 code 时记在 response.api_code 上，供中间层判断业务结果而不必重新解析
+    """
+    response = HttpResponse(
+        get_json_encoder().dumps(payload),
+        status=status,
+        content_type='application/json'
+    )
+    response.api_code = payload.get('code') if isinstance(payload, dict) else None
+    return response
+
+
+def api_ok(data=None, msg='成功'):
+    """成功响应：{'code': 200, 'msg': msg, 'data': data}"""
+    return api_json({'code': 200, 'msg': msg, 'data': data})
+
+
+def api_error(code, msg, data=None, status=200):
+    """
+    错误响应：{'code': code, 'msg': msg, 'data': data}
+
+    与原有接口一致，业务错误默认仍返回 HTTP 200，仅部分场景（如 401/403）同时设置 status
+    """
+    return api_json({'code': code, 'msg': msg, 'data': data}, status=status)
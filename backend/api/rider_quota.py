@@ -0,0 +1,355 @@
+# backend/api/rider_quota.py
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache as default_cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import RiderGrabRecord, RiderSettings
+
+logger = logging.getLogger(__name__)
+
+
+class RiderQuotaService(ABC):
+    """
+    骑手接单配额
+
+    按骑手统计滑动窗口（1小时）内的接单数、未完成数和今日接单数，
+    由接单/完成事件增量更新，并定期与 RiderGrabRecord 对账，
+    配额检查不再每次 COUNT 查询
+    """
+
+    WINDOW = 3600  # 滑动窗口（秒）
+    RECONCILE_INTERVAL = 300  # 对账间隔（秒）
+    MAX_INCOMPLETE_ORDERS = 20  # 1小时内未完成订单上限
+
+    @abstractmethod
+    def usage(self, user_id):
+        """
+        Returns:
+            dict: {'recent_grabs', 'incomplete', 'today_grabs'}
+        """
+
+    @abstractmethod
+    def record_grab(self, user_id, order_id, grabbed_at):
+        """接单事务提交后调用"""
+
+    @abstractmethod
+    def record_complete(self, user_id, order_id, grabbed_at):
+        """订单完成后调用"""
+
+    @abstractmethod
+    def reconcile(self, user_id):
+        """按数据库重建该骑手的计数"""
+
+    def _load_records(self, user_id, now):
+        """从数据库读取窗口内及今日的接单记录"""
+        since = min(now - timedelta(seconds=self.WINDOW), _today_start(now))
+        return list(
+            RiderGrabRecord.objects.filter(user_id=user_id, grabbed_at__gte=since)
+            .order_by('grabbed_at')
+            .values_list('order_id', 'grabbed_at', 'completed')
+        )
+
+
+def _lock_rider(user_id):
+    """
+    锁住骑手设置行（需在事务内调用）
+
+    auto_grab_order 持有同一行锁完成配额检查、认领和计数，
+    对账与之串行：不会在接单事务提交前读库，接单检查也读不到对账到一半的计数
+    """
+    list(RiderSettings.objects.select_for_update().filter(user_id=user_id).values_list('pk', flat=True))
+
+
+def _today_start(now):
+    return timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def count_usage(user_id, now=None):
+    """按 RiderGrabRecord 统计配额用量（一次聚合查询），返回值同 RiderQuotaService.usage"""
+    now = now or timezone.now()
+    window_start = now - timedelta(seconds=RiderQuotaService.WINDOW)
+    today_start = _today_start(now)
+    counts = RiderGrabRecord.objects.filter(
+        user_id=user_id, grabbed_at__gte=min(window_start, today_start)
+    ).aggregate(
+        recent_grabs=Count('id', filter=Q(grabbed_at__gte=window_start)),
+        incomplete=Count('id', filter=Q(grabbed_at__gte=window_start, completed=False)),
+        today_grabs=Count('id', filter=Q(grabbed_at__gte=today_start))
+    )
+    return counts
+
+
+class DatabaseRiderQuota(RiderQuotaService):
+    """每次检查都查数据库，没有共享缓存时的兜底（多进程下仍然准确）"""
+
+    def usage(self, user_id):
+        return count_usage(user_id)
+
+    def record_grab(self, user_id, order_id, grabbed_at):
+        pass
+
+    def record_complete(self, user_id, order_id, grabbed_at):
+        pass
+
+    def reconcile(self, user_id):
+        pass
+
+
+class _RiderWindow:
+    __slots__ = ('grabs', 'order_ids', 'completed', 'day', 'today', 'synced_at')
+
+    def __init__(self):
+        self.grabs = deque()  # [(时间戳, 订单ID)]，按时间升序
+        self.order_ids = set()
+        self.completed = set()
+        self.day = None
+        self.today = 0
+        self.synced_at = 0
+
+
+class InMemoryRiderQuota(RiderQuotaService):
+    """进程内滑动窗口计数，适合单进程部署"""
+
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, window, now_ts):
+        start = now_ts - self.WINDOW
+        while window.grabs and window.grabs[0][0] < start:
+            _, order_id = window.grabs.popleft()
+            window.order_ids.discard(order_id)
+            window.completed.discard(order_id)
+
+    def _window(self, user_id):
+        window = self._windows.get(user_id)
+        if window is None or time.monotonic() - window.synced_at >= self.RECONCILE_INTERVAL:
+            window = self.reconcile(user_id)
+        return window
+
+    def usage(self, user_id):
+        now = timezone.now()
+        window = self._window(user_id)
+        with self._lock:
+            self._prune(window, now.timestamp())
+            recent = len(window.grabs)
+            return {
+                'recent_grabs': recent,
+                'incomplete': recent - len(window.completed),
+                'today_grabs': window.today if window.day == timezone.localdate(now) else 0,
+            }
+
+    def record_grab(self, user_id, order_id, grabbed_at):
+        window = self._window(user_id)
+        with self._lock:
+            if order_id in window.order_ids:
+                return
+            window.grabs.append((grabbed_at.timestamp(), order_id))
+            window.order_ids.add(order_id)
+            day = timezone.localdate(grabbed_at)
+            if window.day != day:
+                window.day, window.today = day, 0
+            window.today += 1
+
+    def record_complete(self, user_id, order_id, grabbed_at):
+        window = self._window(user_id)
+        with self._lock:
+            if order_id in window.order_ids:
+                window.completed.add(order_id)
+
+    def reconcile(self, user_id):
+        with transaction.atomic():
+            _lock_rider(user_id)
+            return self._rebuild(user_id)
+
+    def _rebuild(self, user_id):
+        now = timezone.now()
+        records = self._load_records(user_id, now)
+        window = _RiderWindow()
+        window.day = timezone.localdate(now)
+        today_start = _today_start(now)
+        window_start = now.timestamp() - self.WINDOW
+        for order_id, grabbed_at, completed in records:
+            if grabbed_at >= today_start:
+                window.today += 1
+            if grabbed_at.timestamp() >= window_start:
+                window.grabs.append((grabbed_at.timestamp(), order_id))
+                window.order_ids.add(order_id)
+                if completed:
+                    window.completed.add(order_id)
+        window.synced_at = time.monotonic()
+        with self._lock:
+            self._windows[user_id] = window
+        return window
+
+
+class CacheRiderQuota(RiderQuotaService):
+    """
+    基于 Django 缓存的分桶滑动窗口，多进程共享
+
+    按分钟分桶累加接单数和完成数，读取时一次 get_many 取回窗口内的桶；
+    窗口边界精确到桶，最多多计一个桶的接单（偏保守）。
+
+    计数键带有代号（epoch 键，RECONCILE_INTERVAL 后过期）。对账先写入新代号，
+    再查数据库，把各桶计数作为一个基数键、连同各订单的去重标记一次 set_many 写入；
+    record_grab / record_complete 的增量记在单独的桶键上，读取时与基数相加，互不覆盖。
+    对账查询之后提交的接单由 record_grab 计入新代号；在切换代号和写入基数之间到达的
+    计数可能与基数重复（偏保守，下一次对账修正）。
+    代号或基数过期期间 record_grab 直接跳过，下一次读取时的对账会从数据库计入
+    """
+
+    BUCKET_SECONDS = 60
+    KEY_PREFIX = 'rider_quota'
+
+    def __init__(self, cache=None):
+        self.cache = cache or default_cache
+
+    def _key(self, user_id, *parts):
+        return ':'.join([self.KEY_PREFIX, str(user_id), *map(str, parts)])
+
+    def _epoch_key(self, user_id):
+        return self._key(user_id, 'epoch')
+
+    def _bucket(self, moment):
+        return int(moment.timestamp()) // self.BUCKET_SECONDS
+
+    def _buckets(self, now):
+        current = self._bucket(now)
+        return range(current - self.WINDOW // self.BUCKET_SECONDS, current + 1)
+
+    def _incr(self, key, timeout, delta=1):
+        if self.cache.add(key, delta, timeout):
+            return
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # 键刚好过期
+            self.cache.add(key, delta, timeout)
+
+    def _read(self, user_id, epoch, now):
+        """读取代号下的基数和增量（一次 get_many），基数不存在时返回 None"""
+        base_key = self._key(user_id, epoch, 'base')
+        day = timezone.localdate(now).isoformat()
+        today_key = self._key(user_id, epoch, 'today', day)
+        buckets = self._buckets(now)
+        keys = [base_key, today_key]
+        for bucket in buckets:
+            keys.append(self._key(user_id, epoch, 'g', bucket))
+            keys.append(self._key(user_id, epoch, 'c', bucket))
+        values = self.cache.get_many(keys)
+        base = values.get(base_key)
+        if base is None:
+            return None
+
+        recent = sum(
+            base['g'].get(bucket, 0) + values.get(self._key(user_id, epoch, 'g', bucket), 0) for bucket in buckets
+        )
+        completed = sum(
+            base['c'].get(bucket, 0) + values.get(self._key(user_id, epoch, 'c', bucket), 0) for bucket in buckets
+        )
+        return {
+            'recent_grabs': recent,
+            'incomplete': max(recent - completed, 0),
+            'today_grabs': values.get(today_key, 0) + (base['today'] if base['day'] == day else 0),
+        }
+
+    def usage(self, user_id):
+        now = timezone.now()
+        epoch = self.cache.get(self._epoch_key(user_id))
+        usage = self._read(user_id, epoch, now) if epoch is not None else None
+        if usage is None:
+            usage = self._read(user_id, self.reconcile(user_id), now)
+        return usage or {'recent_grabs': 0, 'incomplete': 0, 'today_grabs': 0}
+
+    def record_grab(self, user_id, order_id, grabbed_at):
+        epoch = self.cache.get(self._epoch_key(user_id))
+        if epoch is None:
+            return
+        # 同一订单只计一次（事件重放或已由对账计入）
+        if not self.cache.add(self._key(user_id, epoch, 'seen_g', order_id), 1, self.WINDOW + self.BUCKET_SECONDS):
+            return
+        self._incr(self._key(user_id, epoch, 'g', self._bucket(grabbed_at)), self.WINDOW + self.BUCKET_SECONDS)
+        self._incr(self._key(user_id, epoch, 'today', timezone.localdate(grabbed_at).isoformat()), 86400)
+
+    def record_complete(self, user_id, order_id, grabbed_at):
+        epoch = self.cache.get(self._epoch_key(user_id))
+        if epoch is None:
+            return
+        if not self.cache.add(self._key(user_id, epoch, 'seen_c', order_id), 1, self.WINDOW + self.BUCKET_SECONDS):
+            return
+        self._incr(self._key(user_id, epoch, 'c', self._bucket(grabbed_at)), self.WINDOW + self.BUCKET_SECONDS)
+
+    def reconcile(self, user_id):
+        """切换到新代号并按数据库写入基数，返回新代号"""
+        with transaction.atomic():
+            _lock_rider(user_id)
+            return self._rebuild(user_id)
+
+    def _rebuild(self, user_id):
+        epoch = time.time_ns()
+        self.cache.set(self._epoch_key(user_id), epoch, self.RECONCILE_INTERVAL)
+
+        now = timezone.now()
+        today_start = _today_start(now)
+        window_start = self._buckets(now)[0]
+        base = {'g': {}, 'c': {}, 'day': timezone.localdate(now).isoformat(), 'today': 0}
+        entries = {}
+        for order_id, grabbed_at, completed in self._load_records(user_id, now):
+            # 与 record_grab / record_complete 共用去重标记，之后到达的重放不再计数
+            entries[self._key(user_id, epoch, 'seen_g', order_id)] = 1
+            if grabbed_at >= today_start:
+                base['today'] += 1
+            bucket = self._bucket(grabbed_at)
+            if bucket < window_start:
+                continue
+            base['g'][bucket] = base['g'].get(bucket, 0) + 1
+            if completed:
+                entries[self._key(user_id, epoch, 'seen_c', order_id)] = 1
+                base['c'][bucket] = base['c'].get(bucket, 0) + 1
+
+        # 标记和基数只在本代号内使用，与代号同时过期
+        entries[self._key(user_id, epoch, 'base')] = base
+        self.cache.set_many(entries, self.RECONCILE_INTERVAL)
+        return epoch
+
+
+_quota = None
+_quota_lock = threading.Lock()
+
+
+def _is_shared(cache):
+    """进程内缓存（LocMemCache / DummyCache）不在 worker 之间共享"""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def get_rider_quota():
+    """
+    按 RIDER_QUOTA_BACKEND 配置返回进程内共享的配额服务
+
+    cache（默认）：共享缓存计数；默认缓存是进程内缓存时退回 db，避免多 worker 各自计数放宽上限
+    db：每次按数据库统计
+    memory：进程内计数，只适合单进程部署
+    """
+    global _quota
+    if _quota is None:
+        with _quota_lock:
+            if _quota is None:
+                backend = getattr(settings, 'RIDER_QUOTA_BACKEND', 'cache')
+                if backend == 'memory':
+                    _quota = InMemoryRiderQuota()
+                elif backend == 'cache' and _is_shared(caches['default']):
+                    _quota = CacheRiderQuota()
+                else:
+                    if backend == 'cache':
+                        logger.warning('默认缓存不是共享缓存，骑手接单配额改为按数据库统计')
+                    _quota = DatabaseRiderQuota()
+    return _quota
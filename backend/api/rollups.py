@@ -0,0 +1,222 @@
+# backend/api/rollups.py
+import logging
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import (
+    Order, OrderDailyRollup, RevenueDailyRollup, RiderDailyRollup, RiderGrabRecord,
+    RollupWatermark, Transaction
+)
+
+logger = logging.getLogger(__name__)
+
+# 水位比本次开始时间提前一段，覆盖运行期间才提交、时间戳却更早的事务（重算是幂等的）
+WATERMARK_LAG = timedelta(minutes=5)
+
+
+def _day_bounds(start, end):
+    """本地日期区间 [start, end] 对应的时间范围 [lo, hi)"""
+    tz = timezone.get_current_timezone()
+    lo = timezone.make_aware(datetime.combine(start, time.min), tz)
+    hi = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return lo, hi
+
+
+def _group_by_day(queryset, field, start, end, keys, **aggregates):
+    """按本地日期和 keys 分组聚合，返回 {(日期, *keys): 聚合结果}"""
+    lo, hi = _day_bounds(start, end)
+    rows = (
+        queryset.filter(**{f'{field}__gte': lo, f'{field}__lt': hi})
+        .annotate(day=TruncDate(field)).order_by()
+        .values('day', *keys).annotate(**aggregates)
+    )
+    return {(row['day'], *(row[key] for key in keys)): row for row in rows}
+
+
+def _distinct_days(queryset, field):
+    return set(
+        queryset.annotate(day=TruncDate(field)).order_by().values_list('day', flat=True).distinct()
+    )
+
+
+def _contiguous_ranges(dates):
+    """把日期集合合并为连续区间 [(start, end), ...]"""
+    ranges = []
+    for day in sorted(dates):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(item) for item in ranges]
+
+
+class Rollup:
+    """
+    日汇总基类
+
+    子类给出某个日期区间的汇总行（compute）和某时刻之后有变化的日期（touched_dates）；
+    重算按天整体替换汇总行，重复运行结果相同
+    """
+    name = None
+    model = None
+
+    def compute(self, start, end):
+        raise NotImplementedError
+
+    def touched_dates(self, since):
+        raise NotImplementedError
+
+    def earliest_date(self):
+        raise NotImplementedError
+
+    def rebuild(self, start, end):
+        """重算 [start, end]，返回写入的汇总行数"""
+        rows = self.compute(start, end)
+        with transaction.atomic():
+            self.model.objects.filter(date__gte=start, date__lte=end).delete()
+            self.model.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+    def rebuild_dates(self, dates):
+        return sum(self.rebuild(start, end) for start, end in _contiguous_ranges(dates))
+
+
+class OrderRollup(Rollup):
+    name = 'orders'
+    model = OrderDailyRollup
+
+    def compute(self, start, end):
+        keys = ('category_id',)
+        created = _group_by_day(Order.objects.all(), 'created_at', start, end, keys,
+                                count=Count('id'), amount=Sum('price'))
+        completed = _group_by_day(Order.objects.filter(status='completed'), 'completed_at', start, end, keys,
+                                  count=Count('id'), amount=Sum('price'))
+        cancelled = _group_by_day(Order.objects.filter(status='cancelled'), 'cancelled_at', start, end, keys,
+                                  count=Count('id'))
+
+        rows = []
+        for day, category_id in set(created) | set(completed) | set(cancelled):
+            key = (day, category_id)
+            rows.append(OrderDailyRollup(
+                date=day,
+                category_id=category_id,
+                created_count=created.get(key, {}).get('count', 0),
+                created_amount=created.get(key, {}).get('amount') or 0,
+                completed_count=completed.get(key, {}).get('count', 0),
+                completed_amount=completed.get(key, {}).get('amount') or 0,
+                cancelled_count=cancelled.get(key, {}).get('count', 0)
+            ))
+        return rows
+
+    def touched_dates(self, since):
+        dates = set()
+        for field in ('created_at', 'completed_at', 'cancelled_at'):
+            dates |= _distinct_days(Order.objects.filter(**{f'{field}__gte': since}), field)
+        return dates
+
+    def earliest_date(self):
+        return Order.objects.aggregate(earliest=Min('created_at'))['earliest']
+
+
+class RevenueRollup(Rollup):
+    name = 'revenue'
+    model = RevenueDailyRollup
+
+    def compute(self, start, end):
+        completed = Q(status='completed')
+        grouped = _group_by_day(
+            Transaction.objects.all(), 'created_at', start, end, ('transaction_type',),
+            count=Count('id'),
+            total_amount=Sum('amount'),
+            completed_count=Count('id', filter=completed),
+            completed_amount=Sum('amount', filter=completed)
+        )
+        return [
+            RevenueDailyRollup(
+                date=day,
+                transaction_type=transaction_type,
+                transaction_count=row['count'],
+                amount=row['total_amount'] or 0,
+                completed_count=row['completed_count'],
+                completed_amount=row['completed_amount'] or 0
+            )
+            for (day, transaction_type), row in sorted(grouped.items())
+        ]
+
+    def touched_dates(self, since):
+        # 交易按创建日期汇总，状态变化体现在 updated_at
+        return _distinct_days(Transaction.objects.filter(updated_at__gte=since), 'created_at')
+
+    def earliest_date(self):
+        return Transaction.objects.aggregate(earliest=Min('created_at'))['earliest']
+
+
+class RiderRollup(Rollup):
+    name = 'riders'
+    model = RiderDailyRollup
+
+    def compute(self, start, end):
+        keys = ('user_id',)
+        grabbed = _group_by_day(RiderGrabRecord.objects.all(), 'grabbed_at', start, end, keys,
+                                count=Count('id'))
+        completed = _group_by_day(RiderGrabRecord.objects.filter(completed=True), 'completed_at', start, end, keys,
+                                  count=Count('id'), amount=Sum('order__price'))
+
+        return [
+            RiderDailyRollup(
+                date=day,
+                rider_id=rider_id,
+                grabbed_count=grabbed.get((day, rider_id), {}).get('count', 0),
+                completed_count=completed.get((day, rider_id), {}).get('count', 0),
+                completed_amount=completed.get((day, rider_id), {}).get('amount') or 0
+            )
+            for day, rider_id in sorted(set(grabbed) | set(completed))
+        ]
+
+    def touched_dates(self, since):
+        return (
+            _distinct_days(RiderGrabRecord.objects.filter(grabbed_at__gte=since), 'grabbed_at') |
+            _distinct_days(RiderGrabRecord.objects.filter(completed_at__gte=since), 'completed_at')
+        )
+
+    def earliest_date(self):
+        return RiderGrabRecord.objects.aggregate(earliest=Min('grabbed_at'))['earliest']
+
+
+ROLLUPS = {rollup.name: rollup for rollup in (OrderRollup(), RevenueRollup(), RiderRollup())}
+
+
+def run_rollups(names=None, start=None, end=None):
+    """
+    运行汇总
+
+    Args:
+        names: 要运行的汇总名称，默认全部
+        start, end: 指定时重算该日期区间（回填），不移动水位；
+            否则按水位增量重算有变化的日期，首次运行时从最早的明细开始
+
+    Returns:
+        dict: {汇总名称: 写入的汇总行数}
+    """
+    result = {}
+    for name in names or ROLLUPS:
+        rollup = ROLLUPS[name]
+        if start is not None:
+            result[name] = rollup.rebuild(start, end or timezone.localdate())
+            continue
+
+        started_at = timezone.now()
+        watermark = RollupWatermark.objects.filter(name=name).first()
+        if watermark is not None:
+            result[name] = rollup.rebuild_dates(rollup.touched_dates(watermark.processed_until))
+        else:
+            earliest = rollup.earliest_date()
+            result[name] = rollup.rebuild(timezone.localtime(earliest).date(), timezone.localdate()) if earliest else 0
+        RollupWatermark.objects.update_or_create(
+            name=name,
+            defaults={'processed_until': started_at - WATERMARK_LAG}
+        )
+        logger.info(f'汇总 {name} 完成，写入 {result[name]} 行')
+    return result
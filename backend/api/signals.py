@@ -0,0 +1,102 @@
+# backend/api/signals.py
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from smart.models import Welcome
+from . import announcement_service, dashboard_stats, http_cache
+from .dispatch import get_dispatcher
+from .models import Announcement, Message, Notification, Order, OrderCategory, RiderGrabRecord, UserProfile
+from .order_feed import publish_order
+from .rider_quota import get_rider_quota
+from .user_counters import add_unread_messages, add_unread_notifications
+from .token_utils import token_cache
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_token_cache(sender, instance, **kwargs):
+    """用户变更后清除令牌缓存中的用户快照"""
+    token_cache.invalidate_user(instance.id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_token_cache(sender, instance, **kwargs):
+    """用户资料变更后清除令牌缓存中的用户快照"""
+    token_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Order)
+def enqueue_pending_order(sender, instance, created, **kwargs):
+    """新建的待接订单在事务提交后进入派发队列，并推送给订阅的骑手"""
+    if created and instance.status == 'pending':
+        transaction.on_commit(lambda: get_dispatcher().on_order_created(instance))
+        transaction.on_commit(lambda: publish_order(instance))
+
+
+@receiver(post_save, sender=RiderGrabRecord)
+def update_rider_quota(sender, instance, created, **kwargs):
+    """接单/完成事件在事务提交后更新骑手配额计数"""
+    quota = get_rider_quota()
+    if created:
+        transaction.on_commit(lambda: quota.record_grab(instance.user_id, instance.order_id, instance.grabbed_at))
+    if instance.completed:
+        transaction.on_commit(lambda: quota.record_complete(instance.user_id, instance.order_id, instance.grabbed_at))
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    """新的未读通知计入用户未读数（批量创建的调用方自行计数）"""
+    if created and not instance.is_read:
+        add_unread_notifications([instance.user_id])
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        add_unread_notifications([instance.user_id], -1)
+
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, **kwargs):
+    """新消息计入会话中其他参与者的未读数"""
+    if created and not instance.is_read:
+        recipient_ids = instance.conversation.participants.exclude(id=instance.sender_id).values_list('id', flat=True)
+        add_unread_messages(recipient_ids)
+
+
+def track_dashboard_stats_save(sender, instance, created, update_fields=None, **kwargs):
+    """用户、订单、反馈、审核、钱包变化后增量更新看板统计"""
+    dashboard_stats.track_save(sender, instance, created, update_fields)
+
+
+def track_dashboard_stats_delete(sender, instance, **kwargs):
+    dashboard_stats.track_delete(sender, instance)
+
+
+for _model in dashboard_stats.TRACKED:
+    post_save.connect(track_dashboard_stats_save, sender=_model)
+    post_delete.connect(track_dashboard_stats_delete, sender=_model)
+
+
+@receiver([post_save, post_delete], sender=Announcement)
+def invalidate_active_announcements(sender, instance, **kwargs):
+    """公告变更提交后重建生效公告集合"""
+    transaction.on_commit(announcement_service.invalidate)
+
+
+PUBLIC_CACHE_GROUPS = {
+    Announcement: http_cache.ANNOUNCEMENTS,
+    OrderCategory: http_cache.ORDER_CATEGORIES,
+    Welcome: http_cache.WELCOME,
+}
+
+
+def invalidate_public_cache(sender, instance, **kwargs):
+    """公告、订单分类、欢迎页变更提交后清除对应公开接口的缓存"""
+    group = PUBLIC_CACHE_GROUPS[sender]
+    transaction.on_commit(lambda: http_cache.invalidate(group))
+
+
+for _model in PUBLIC_CACHE_GROUPS:
+    post_save.connect(invalidate_public_cache, sender=_model)
+    post_delete.connect(invalidate_public_cache, sender=_model)
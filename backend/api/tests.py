@@ -1,3 +1,1263 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import post_init
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+
+from . import announcement_service, dashboard_stats, feed_views, notification_service, rider_quota, user_service
+from .dashboard_stats import build_dashboard_stats, get_dashboard_stats, recount_counters
+from .db_utils import bulk_upsert
+from .dispatch import OrderDispatcher, OrderQueue
+from .models import (
+    Announcement, Conversation, ConversationMember, Message, Notification, NotificationOutbox, Order, OrderCategory,
+    OrderDailyRollup, RevokedToken, RiderGrabRecord, RiderSettings, RollupWatermark, UserCounters, UserFeedback,
+    UserProfile, Wallet
+)
+from .notification_service import MAX_ATTEMPTS, notify_admins, process_outbox
+from .order_feed import InProcessBroker, category_channel
+from .responses import OrjsonEncoder, StdlibJSONEncoder, api_error, api_ok, orjson
+from .rider_quota import CacheRiderQuota, DatabaseRiderQuota, InMemoryRiderQuota
+from .rollups import run_rollups
+from .token_revocation import RevocationList, revocation_list
+from .token_utils import TokenCache, TokenManager, load_token_user, token_cache, verify_access_token
+from .user_counters import add_unread_notifications, get_user_counters
+from .wechat_client import CircuitOpenError, WechatClient, WechatClientError
+from .wechat_token import WechatAccessTokenProvider, WechatAPIError
+from smart_backend.cache import TwoTierCache
+
+
+class _StubWechatHandler(BaseHTTPRequestHandler):
+    """本地模拟微信 /cgi-bin/token 接口"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        body = json.dumps(server.payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_stub_server(testcase):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubWechatHandler)
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.delay = 0
+    server.statuses = []
+    server.payload = {'access_token': 'stub-token', 'expires_in': 7200}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    testcase.addCleanup(server.server_close)
+    testcase.addCleanup(server.shutdown)
+    return server
+
+
+class WechatClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = _start_stub_server(self)
+        self.client = WechatClient(f'http://127.0.0.1:{self.server.server_port}')
+        self.client.BACKOFF_BASE = 0
+
+    def test_server_errors_are_retried(self):
+        self.server.statuses = [502, 503]
+        data = self.client.fetch_access_token('wx-test', 'secret')
+        self.assertEqual(data['access_token'], 'stub-token')
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(self.client.metrics()['endpoints']['token']['errors'], 2)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.server.statuses = [500] * 100
+        for _ in range(self.client.breaker.failure_threshold):
+            with self.assertRaises(WechatClientError):
+                self.client.fetch_access_token('wx-test', 'secret')
+
+        hits = self.server.hits
+        with self.assertRaises(CircuitOpenError):
+            self.client.fetch_access_token('wx-test', 'secret')
+        self.assertEqual(self.server.hits, hits)
+
+
+class WechatAccessTokenProviderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = _start_stub_server(self)
+
+        cache = LocMemCache('wechat-token-tests', {})
+        cache.clear()
+        self.provider = WechatAccessTokenProvider(
+            'wx-test', 'secret',
+            base_url=f'http://127.0.0.1:{self.server.server_port}',
+            cache=cache
+        )
+
+    def test_token_is_cached(self):
+        self.assertEqual(self.provider.get_token(), 'stub-token')
+        self.assertEqual(self.provider.get_token(), 'stub-token')
+        self.assertEqual(self.server.hits, 1)
+
+    def test_concurrent_refresh_is_single_flight(self):
+        self.server.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.provider.get_token())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['stub-token'] * 8)
+        self.assertEqual(self.server.hits, 1)
+
+    def test_invalidate_forces_refresh(self):
+        self.provider.get_token()
+        self.provider.invalidate('stub-token')
+        self.provider.get_token()
+        self.assertEqual(self.server.hits, 2)
+
+    def test_error_is_raised_and_not_cached(self):
+        self.server.payload = {'errcode': 40013, 'errmsg': 'invalid appid'}
+        with self.assertRaises(WechatAPIError):
+            self.provider.get_token()
+        with self.assertRaises(WechatAPIError):
+            self.provider.get_token()
+        self.assertEqual(self.server.hits, 2)
+
+
+class ConversationListTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='conv-owner')
+        UserProfile.objects.create(user=self.user, openid='conv-owner')
+        self.others = [User.objects.create(username=f'conv-peer-{i}') for i in range(5)]
+        for other in self.others[:3]:
+            UserProfile.objects.create(user=other, openid=other.username)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(self.user.id)['access_token']}"}
+        revocation_list.rebuild()
+
+    def _create_conversations(self, count):
+        conversations = Conversation.objects.bulk_create([Conversation() for _ in range(count)])
+        Membership = Conversation.participants.through
+        Membership.objects.bulk_create(
+            [Membership(conversation=conv, user=self.user) for conv in conversations] +
+            [Membership(conversation=conv, user=self.others[i % len(self.others)])
+             for i, conv in enumerate(conversations)]
+        )
+
+    def _count_queries(self, **params):
+        # 预热：令牌校验和用户加载各请求只发生一次
+        self.client.get('/api/conversations/', params, **self.auth)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/conversations/', params, **self.auth)
+        return response.json(), len(ctx)
+
+    def test_query_count_is_constant(self):
+        self._create_conversations(1)
+        data, small = self._count_queries()
+        self.assertEqual(len(data['data']), 1)
+
+        self._create_conversations(499)
+        data, large = self._count_queries()
+        self.assertEqual(len(data['data']), 500)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 3)
+
+        peers = {p['username']: p for conv in data['data'] for p in conv['participants']}
+        self.assertEqual(set(peers), {other.username for other in self.others})
+        self.assertEqual(peers['conv-peer-4']['real_name'], '')
+
+    def test_cursor_pagination_walks_all_conversations(self):
+        self._create_conversations(45)
+        seen, cursor = [], ''
+        while True:
+            data = self.client.get('/api/conversations/', {'page_size': 20, 'cursor': cursor}, **self.auth).json()['data']
+            seen.extend(conv['id'] for conv in data['conversations'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len(set(seen)), 45)
+
+
+class NotificationCursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='notif-owner')
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(self.user.id)['access_token']}"}
+        revocation_list.rebuild()
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='system', title=f'n{i}', content='')
+            for i in range(45)
+        ])
+        # 相同创建时间，翻页依赖 id 区分先后
+        Notification.objects.update(created_at=Notification.objects.first().created_at)
+
+    def test_cursor_walks_all_notifications(self):
+        seen, cursor, params = [], '', {'page_size': 20, 'count': 'exact'}
+        while True:
+            data = self.client.get('/api/notifications/', {**params, 'cursor': cursor}, **self.auth).json()['data']
+            seen.extend(notif['id'] for notif in data['notifications'])
+            self.assertEqual(data['total'], 45)
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(set(seen)), 45)
+
+    def test_total_is_optional(self):
+        data = self.client.get('/api/notifications/', {'cursor': ''}, **self.auth).json()['data']
+        self.assertNotIn('total', data)
+        data = self.client.get('/api/notifications/', {'cursor': '', 'count': 'estimate'}, **self.auth).json()['data']
+        self.assertEqual(data['total'], 45)
+        self.assertFalse(data['total_is_estimate'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/notifications/', {'cursor': 'bogus'}, **self.auth)
+        self.assertEqual(response.json()['code'], 400)
+
+    def test_fields_projection(self):
+        data = self.client.get('/api/notifications/', {'fields': 'title,notification_type_display'}, **self.auth).json()
+        item = data['data']['notifications'][0]
+        self.assertEqual(set(item), {'id', 'title', 'notification_type_display'})
+        self.assertEqual(item['notification_type_display'], '系统通知')
+
+        data = self.client.get('/api/notifications/', {'cursor': '', 'fields': 'title'}, **self.auth).json()['data']
+        self.assertEqual(set(data['notifications'][0]), {'id', 'title'})
+        self.assertIsNotNone(data['next_cursor'])
+
+        response = self.client.get('/api/notifications/', {'fields': 'title,password'}, **self.auth)
+        self.assertEqual(response.json()['code'], 400)
+
+
+class DashboardStatsTests(TestCase):
+
+    def test_incremental_counters_match_recount(self):
+        recount_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='stats-user')
+            profile = UserProfile.objects.create(user=user, openid='stats-user', is_rider=True)
+            Wallet.objects.create(user=user, balance=Decimal('10.50'))
+            category = OrderCategory.objects.create(name='stats', code='stats')
+            orders = [
+                Order.objects.create(user=user, category=category, title='t', description='', price=1)
+                for _ in range(3)
+            ]
+        with self.captureOnCommitCallbacks(execute=True):
+            orders[0].status = 'completed'
+            orders[0].completed_at = timezone.now()
+            orders[0].save()
+            orders[1].delete()
+            profile.is_verified = True
+            profile.save(update_fields=['is_verified'])
+            wallet = Wallet.objects.get(user=user)
+            wallet.balance -= Decimal('2')
+            wallet.frozen_balance += Decimal('2')
+            wallet.save()
+            UserFeedback.objects.create(user=user, title='t', content='c')
+
+        incremental = build_dashboard_stats()
+        self.assertEqual(incremental['order_stats']['pending'], 1)
+        self.assertEqual(incremental['order_stats']['today_completed'], 1)
+        self.assertEqual(incremental['system_stats']['total_frozen'], 2.0)
+
+        recount_counters()
+        self.assertEqual(build_dashboard_stats(), incremental)
+
+    def test_save_does_not_reread_row(self):
+        recount_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='stats-reread')
+            category = OrderCategory.objects.create(name='reread', code='reread')
+            order = Order.objects.create(user=user, category=category, title='t', description='', price=1)
+        order = Order.objects.get(pk=order.pk)
+
+        order.status = 'completed'
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            order.save(update_fields=['status'])
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT')])
+        counters = build_dashboard_stats()['order_stats']
+        self.assertEqual((counters['pending'], counters['completed']), (0, 1))
+
+        # 未保存的字段不计入：只保存 title 时状态变化不生效
+        order.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save(update_fields=['title'])
+        self.assertEqual(build_dashboard_stats()['order_stats']['completed'], 1)
+
+    def test_loading_rows_runs_no_stats_hooks(self):
+        # 读出实例不触发看板统计的回调，变化量在保存时按 from_db 记下的列计算
+        for model in (UserProfile, Order, UserFeedback, Wallet):
+            self.assertFalse(post_init.has_listeners(model), model.__name__)
+
+        recount_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='stats-deferred')
+            category = OrderCategory.objects.create(name='deferred', code='deferred')
+            Order.objects.create(user=user, category=category, title='t', description='', price=1)
+        # 状态列被 defer 时不计入，由全量重算修正
+        order = Order.objects.defer('status').get(user=user)
+        order.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(build_dashboard_stats()['order_stats']['pending'], 1)
+
+    def test_dashboard_cache_refreshed_by_command(self):
+        cache.clear()
+        with mock.patch('api.dashboard_stats.build_dashboard_stats', return_value={'ok': 1}) as build:
+            self.assertEqual(get_dashboard_stats(), {'ok': 1})
+            self.assertEqual(get_dashboard_stats(), {'ok': 1})
+        self.assertEqual(build.call_count, 1)
+
+        # 过了新鲜期：其他请求正在重建时直接返回旧数据，否则由本请求重建
+        later = time.time() + dashboard_stats.FRESH_SECONDS + 1
+        with mock.patch('api.dashboard_stats.build_dashboard_stats', return_value={'ok': 2}) as build, \
+                mock.patch('api.dashboard_stats.time.time', return_value=later):
+            cache.add(dashboard_stats.REFRESH_LOCK_KEY, 1)
+            self.assertEqual(get_dashboard_stats(), {'ok': 1})
+            self.assertEqual(build.call_count, 0)
+            cache.delete(dashboard_stats.REFRESH_LOCK_KEY)
+            self.assertEqual(get_dashboard_stats(), {'ok': 2})
+            self.assertEqual(get_dashboard_stats(), {'ok': 2})
+        self.assertEqual(build.call_count, 1)
+
+        call_command('recount_stats', days=1, stdout=io.StringIO())
+        self.assertIn('order_stats', get_dashboard_stats())
+
+
+class UserListTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create(username='list-admin', is_staff=True)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(self.admin.id)['access_token']}"}
+        revocation_list.rebuild()
+        self.category = OrderCategory.objects.create(name='list', code='list')
+
+    def _create_users(self, count):
+        for _ in range(count):
+            index = User.objects.count()
+            user = User.objects.create(username=f'list-user-{index}')
+            UserProfile.objects.create(user=user, openid=f'list-user-{index}')
+            Order.objects.bulk_create([
+                Order(order_no=f'list-{index}-{i}', user=user, rider=self.admin, category=self.category,
+                      title='t', description='', price=1)
+                for i in range(index % 3)
+            ])
+
+    def _count_queries(self):
+        self.client.get('/api/user/list/', **self.auth)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/user/list/', {'page_size': 20}, **self.auth)
+        return response.json()['data'], len(ctx)
+
+    def test_query_count_is_constant(self):
+        self._create_users(2)
+        data, small = self._count_queries()
+        self.assertEqual(len(data['users']), 2)
+
+        self._create_users(30)
+        data, large = self._count_queries()
+        self.assertEqual(len(data['users']), 20)
+        self.assertEqual(data['total'], 32)
+        self.assertEqual(small, large)
+
+        for item in data['users']:
+            index = int(item['username'].rsplit('-', 1)[1])
+            self.assertEqual(item['order_count'], index % 3)
+            self.assertEqual(item['rider_order_count'], 0)
+
+
+class ApiResponseTests(SimpleTestCase):
+
+    def test_envelope_and_types(self):
+        created = datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        response = api_ok({'created_at': created, 'amount': Decimal('12.50'), 'read_at': None})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {
+            'code': 200, 'msg': '成功',
+            'data': {'created_at': created.strftime('%Y-%m-%d %H:%M:%S'), 'amount': '12.50', 'read_at': None}
+        })
+
+        response = api_error(403, '权限不足', status=403)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(json.loads(response.content), {'code': 403, 'msg': '权限不足', 'data': None})
+
+    def test_encoders_agree(self):
+        if orjson is None:
+            self.skipTest('未安装 orjson')
+        payload = {'list': [{'id': 1, 'at': datetime(2024, 5, 1, 8, 30), 'amount': Decimal('1.10'), 'tags': ('a',)}]}
+        self.assertEqual(OrjsonEncoder().dumps(payload), StdlibJSONEncoder().dumps(payload))
+
+
+class PublicResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Announcement.objects.create(title='a1', content='c')
+
+    def test_conditional_get_and_invalidation(self):
+        response = self.client.get('/api/announcements/')
+        etag = response['ETag']
+        self.assertEqual(len(response.json()['data']['announcements']), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/announcements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title='a2', content='c')
+        response = self.client.get('/api/announcements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['data']['announcements']), 2)
+
+    def test_server_errors_are_not_cached(self):
+        with mock.patch('api.views.announcement_service.get_active_announcements', side_effect=RuntimeError):
+            self.assertEqual(self.client.get('/api/announcements/').json()['code'], 500)
+        self.assertEqual(len(self.client.get('/api/announcements/').json()['data']['announcements']), 1)
+
+
+class ActiveAnnouncementTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        Announcement.objects.create(title='always', content='c', priority=1)
+        Announcement.objects.create(title='later', content='c', priority=5,
+                                    start_time=self.now + timedelta(hours=1))
+        Announcement.objects.create(title='ending', content='c', announcement_type='activity',
+                                    end_time=self.now + timedelta(minutes=30))
+        Announcement.objects.create(title='ended', content='c', end_time=self.now - timedelta(minutes=1))
+
+    def _titles(self, at, announcement_type=None):
+        with mock.patch('api.announcement_service.timezone.now', return_value=at):
+            return [row['title'] for row in announcement_service.get_active_announcements(announcement_type)]
+
+    def test_active_set_follows_time_window(self):
+        self.assertEqual(self._titles(self.now), ['always', 'ending'])
+        self.assertEqual(self._titles(self.now, 'activity'), ['ending'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._titles(self.now + timedelta(minutes=10))
+        self.assertEqual(len(ctx), 0)
+
+        self.assertEqual(self._titles(self.now + timedelta(minutes=45)), ['always'])
+        self.assertEqual(self._titles(self.now + timedelta(hours=2)), ['later', 'always'])
+
+    def test_list_endpoint_uses_active_set(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.filter(title='always').update(priority=9)
+            Announcement.objects.get(title='ending').save()
+        data = self.client.get('/api/announcements/', {'cursor': '', 'page_size': 1}).json()['data']
+        self.assertEqual([item['title'] for item in data['announcements']], ['always'])
+        data = self.client.get('/api/announcements/', {'cursor': data['next_cursor'], 'page_size': 1}).json()['data']
+        self.assertEqual([item['title'] for item in data['announcements']], ['ending'])
+        self.assertIsNone(data['next_cursor'])
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """两个实例共用一个文件缓存目录，模拟两个 worker 进程"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {
+            'L2_BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'L1_TIMEOUT': 60,
+            'L1_EXCLUDE': ['counter:'],
+        }}
+        self.worker1 = TwoTierCache(directory, params)
+        self.worker2 = TwoTierCache(directory, params)
+        self.addCleanup(self.worker1.clear)
+
+    def test_l1_in_front_of_shared_l2(self):
+        self.worker1.set('stats:a', {'n': 1})
+        self.assertEqual(self.worker2.get('stats:a'), {'n': 1})
+        self.assertEqual(self.worker2.get('stats:a'), {'n': 1})
+        self.assertIsNone(self.worker2.get('stats:missing'))
+
+        stats = self.worker2.stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (1, 1, 1))
+
+        # L1 中的值不受调用方修改影响
+        self.worker2.get('stats:a')['n'] = 2
+        self.assertEqual(self.worker2.get('stats:a'), {'n': 1})
+
+    def test_excluded_keys_always_read_l2(self):
+        self.worker1.set('counter:x', 1)
+        self.assertEqual(self.worker2.get('counter:x'), 1)
+        self.worker1.incr('counter:x')
+        self.assertEqual(self.worker2.get('counter:x'), 2)
+
+    def test_namespace_invalidation(self):
+        self.worker1.set_many({'page:1': 'a', 'page:2': 'b', 'other:1': 'c'})
+        self.worker1.invalidate_namespace('page')
+        self.assertEqual(self.worker1.get_many(['page:1', 'page:2', 'other:1']), {'other:1': 'c'})
+
+
+class UserCountersTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='counter-user')
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='system', title=f'n{i}', content='') for i in range(3)
+        ])
+
+    def test_first_read_initializes_from_rows(self):
+        self.assertFalse(UserCounters.objects.filter(user=self.user).exists())
+        self.assertEqual(get_user_counters(self.user.id).unread_notifications, 3)
+        self.assertTrue(UserCounters.objects.filter(user=self.user).exists())
+
+    def test_increment_decrement_and_clamp(self):
+        get_user_counters(self.user.id)
+        add_unread_notifications([self.user.id, self.user.id])
+        self.assertEqual(get_user_counters(self.user.id).unread_notifications, 5)
+        add_unread_notifications([self.user.id], -2)
+        self.assertEqual(get_user_counters(self.user.id).unread_notifications, 3)
+        add_unread_notifications([self.user.id], -10)
+        self.assertEqual(get_user_counters(self.user.id).unread_notifications, 0)
+
+    def test_signal_counts_new_notification(self):
+        get_user_counters(self.user.id)
+        Notification.objects.create(user=self.user, notification_type='system', title='x', content='')
+        self.assertEqual(get_user_counters(self.user.id).unread_notifications, 4)
+
+    def test_repair_command_restores_counts(self):
+        get_user_counters(self.user.id)
+        UserCounters.objects.filter(user=self.user).update(unread_notifications=42, unread_messages=7)
+        call_command('repair_user_counters', user_ids=[self.user.id], stdout=io.StringIO())
+        counters = get_user_counters(self.user.id)
+        self.assertEqual((counters.unread_notifications, counters.unread_messages), (3, 0))
+
+    def test_unknown_user_reads_zero(self):
+        counters = get_user_counters(999999)
+        self.assertEqual((counters.unread_notifications, counters.unread_messages), (0, 0))
+        self.assertFalse(UserCounters.objects.filter(user_id=999999).exists())
+
+    def test_upsert_omits_conflict_columns_on_mysql(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch.object(UserCounters.objects, 'bulk_create') as bulk_create:
+            bulk_upsert(UserCounters, [], unique_fields=['user'], update_fields=['unread_messages'])
+        self.assertIsNone(bulk_create.call_args.kwargs['unique_fields'])
+
+
+class TokenAuthTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.rebuild()
+        self.user = User.objects.create(username='token-user')
+        UserProfile.objects.create(user=self.user, openid='token-user')
+        self.token = TokenManager.generate_tokens(self.user.id)['access_token']
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+
+    def test_verify_decodes_once(self):
+        with mock.patch.object(TokenManager, 'verify_token', wraps=TokenManager.verify_token) as verify:
+            self.assertIsNotNone(verify_access_token(self.token))
+            self.assertIsNotNone(verify_access_token(self.token))
+        self.assertEqual(verify.call_count, 1)
+        self.assertIsNone(verify_access_token('not-a-token'))
+
+    def test_cache_entry_expires(self):
+        cache = TokenCache()
+        cache.set('a.b.c', {'user_id': 1, 'exp': time.time() + 60})
+        self.assertIsNotNone(cache.get('a.b.c'))
+        with mock.patch('api.token_utils.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get('a.b.c'))
+        self.assertIsNone(cache.set('x.y.z', {'user_id': 1, 'exp': time.time() - 1}))
+
+    def test_cached_user_is_rebuilt_from_snapshot(self):
+        entry = verify_access_token(self.token)
+        first = load_token_user(entry)
+        first.username = 'changed'
+        first.userprofile.real_name = 'changed'
+        with CaptureQueriesContext(connection) as ctx:
+            second = load_token_user(entry)
+            self.assertEqual((second.username, second.userprofile.real_name), ('token-user', ''))
+            self.assertIs(second.userprofile.user, second)
+        self.assertEqual(len(ctx), 0)
+
+        bare = User.objects.create(username='token-bare')
+        user = load_token_user(verify_access_token(TokenManager.generate_tokens(bare.id)['access_token']))
+        with self.assertNumQueries(0), self.assertRaises(UserProfile.DoesNotExist):
+            user.userprofile
+
+    def test_queryset_update_invalidates_cached_user(self):
+        entry = verify_access_token(self.token)
+        load_token_user(entry)
+        user_service.get_or_create_wechat_user('token-user', '13800000009', {})
+        self.assertEqual(load_token_user(verify_access_token(self.token)).userprofile.phone, '13800000009')
+
+    def test_inactive_or_deleted_user_gets_401(self):
+        self.assertEqual(self.client.get('/api/user-info/', **self.auth).json()['code'], 200)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/user-info/', **self.auth)
+        self.assertEqual((response.status_code, response.json()['code']), (401, 401))
+
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/user-info/', **self.auth).status_code, 401)
+
+
+class RiderQuotaTests(TestCase):
+
+    def setUp(self):
+        self.rider = User.objects.create(username='quota-rider')
+        owner = User.objects.create(username='quota-owner')
+        category = OrderCategory.objects.create(name='quota', code='quota')
+        self.orders = Order.objects.bulk_create([
+            Order(order_no=f'quota-{i}', user=owner, category=category, title='t', description='', price=1)
+            for i in range(4)
+        ])
+
+    def _grab(self, quota, order, completed=False):
+        record = RiderGrabRecord.objects.create(user=self.rider, order=order, completed=completed)
+        quota.record_grab(record.user_id, record.order_id, record.grabbed_at)
+        return record
+
+    def test_backends_agree_with_database(self):
+        self._grab(DatabaseRiderQuota(), self.orders[0], completed=True)
+        backends = [DatabaseRiderQuota(), InMemoryRiderQuota(), CacheRiderQuota(LocMemCache('quota-agree', {}))]
+        for quota in backends:
+            quota.usage(self.rider.id)
+        for order in self.orders[1:3]:
+            record = RiderGrabRecord.objects.create(user=self.rider, order=order)
+            for quota in backends:
+                quota.record_grab(record.user_id, record.order_id, record.grabbed_at)
+                # 重放不重复计数
+                quota.record_grab(record.user_id, record.order_id, record.grabbed_at)
+
+        expected = {'recent_grabs': 3, 'incomplete': 2, 'today_grabs': 3}
+        for quota in backends:
+            self.assertEqual(quota.usage(self.rider.id), expected, type(quota).__name__)
+
+    def test_reconcile_keeps_concurrent_grab(self):
+        quota = CacheRiderQuota(LocMemCache('quota-reconcile', {}))
+        self._grab(quota, self.orders[0])
+        load_records = quota._load_records
+
+        def grab_during_reconcile(user_id, now):
+            # 对账查询期间另一个进程提交了接单并计数
+            records = load_records(user_id, now)
+            self._grab(quota, self.orders[1])
+            return records
+
+        with mock.patch.object(quota, '_load_records', side_effect=grab_during_reconcile):
+            quota.reconcile(self.rider.id)
+        self.assertEqual(quota.usage(self.rider.id)['recent_grabs'], 2)
+
+        # 接单在对账查询之前提交、计数在对账之后到达：只计一次
+        quota.reconcile(self.rider.id)
+        record = RiderGrabRecord.objects.get(order=self.orders[1])
+        quota.record_grab(record.user_id, record.order_id, record.grabbed_at)
+        self.assertEqual(quota.usage(self.rider.id)['recent_grabs'], 2)
+
+    def test_reconcile_writes_once(self):
+        quota = CacheRiderQuota(LocMemCache('quota-write-once', {}))
+        for order in self.orders:
+            RiderGrabRecord.objects.create(user=self.rider, order=order, completed=order == self.orders[0])
+        with mock.patch.object(quota.cache, 'add') as add, \
+                mock.patch.object(quota.cache, 'set_many', wraps=quota.cache.set_many) as set_many:
+            quota.reconcile(self.rider.id)
+        add.assert_not_called()
+        set_many.assert_called_once()
+        self.assertEqual(quota.usage(self.rider.id), {'recent_grabs': 4, 'incomplete': 3, 'today_grabs': 4})
+
+    def test_default_backend_needs_shared_cache(self):
+        with mock.patch.object(rider_quota, '_quota', None), \
+                mock.patch.object(rider_quota, '_is_shared', return_value=False):
+            self.assertIsInstance(rider_quota.get_rider_quota(), DatabaseRiderQuota)
+        self.assertFalse(rider_quota._is_shared(LocMemCache('quota-local', {})))
+        with mock.patch.object(rider_quota, '_quota', None), \
+                mock.patch.object(rider_quota, '_is_shared', return_value=True):
+            self.assertIsInstance(rider_quota.get_rider_quota(), CacheRiderQuota)
+
+
+class AutoGrabOrderTests(TestCase):
+
+    def setUp(self):
+        revocation_list.rebuild()
+        self.rider = User.objects.create(username='grab-rider')
+        UserProfile.objects.create(user=self.rider, openid='grab-rider', is_rider=True)
+        owner = User.objects.create(username='grab-owner')
+        UserProfile.objects.create(user=owner, openid='grab-owner')
+        category = OrderCategory.objects.create(name='grab', code='grab')
+        self.settings = RiderSettings.objects.create(user=self.rider, auto_grab_enabled=True, max_orders_per_hour=3)
+        self.settings.categories.add(category)
+        self.orders = Order.objects.bulk_create([
+            Order(order_no=f'grab-{i}', user=owner, category=category, title='t', description='', price=1)
+            for i in range(5)
+        ])
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(self.rider.id)['access_token']}"}
+        patcher = mock.patch('api.views.get_dispatcher', return_value=OrderDispatcher())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _grab(self, body, content_type='application/json'):
+        return self.client.post('/api/rider/auto-grab/', body, content_type=content_type, **self.auth).json()
+
+    def test_batch_body_parsed_for_any_content_type(self):
+        data = self._grab('{"batch": true, "count": 2}', content_type='text/plain')
+        self.assertEqual((data['code'], data['data']['count']), (200, 2))
+        data = self._grab('')
+        self.assertEqual((data['code'], data['data']['order_no']), (200, 'grab-2'))
+
+    def test_malformed_body_is_rejected(self):
+        for body in ('{"batch": tru', '[1]', '{"batch": true, "count": "abc"}', '{"batch": true, "count": 0}'):
+            self.assertEqual(self._grab(body)['code'], 400, body)
+        self.assertFalse(RiderGrabRecord.objects.exists())
+
+    def test_hourly_cap_checked_under_lock_without_counting(self):
+        # 之前的接单由对账计入；之后每次接单只在锁内读写配额计数，不再 COUNT 接单记录
+        RiderGrabRecord.objects.bulk_create([RiderGrabRecord(user=self.rider, order=order) for order in self.orders[:2]])
+        Order.objects.filter(id__in=[order.id for order in self.orders[:2]]).update(status='accepted', rider=self.rider)
+        quota = CacheRiderQuota(LocMemCache('grab-quota', {}))
+        quota.usage(self.rider.id)
+        with mock.patch('api.views.get_rider_quota', return_value=quota):
+            with CaptureQueriesContext(connection) as ctx:
+                data = self._grab('{"batch": true}')
+            self.assertEqual((data['code'], data['data']['count']), (200, 1))
+            self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+            # 预占的计数不等提交回调，下一个请求立即可见
+            self.assertEqual(self._grab('{"batch": true}')['code'], 400)
+        self.assertEqual(RiderGrabRecord.objects.filter(user=self.rider).count(), 3)
+
+
+class OrderDispatchTests(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create(username='dispatch-owner')
+        self.riders = [User.objects.create(username=f'dispatch-rider-{i}') for i in range(2)]
+        self.category = OrderCategory.objects.create(name='dispatch', code='dispatch')
+        self.orders = Order.objects.bulk_create([
+            Order(order_no=f'dispatch-{i}', user=owner, category=self.category, title='t', description='', price=1)
+            for i in range(6)
+        ])
+
+    def _claim(self, dispatcher, rider, count):
+        with transaction.atomic():
+            return [order.id for order in dispatcher.claim(rider, [self.category.id], count=count)]
+
+    def test_contended_claims_never_overlap(self):
+        for skip_locked in (True, False):
+            with self.subTest(skip_locked=skip_locked), \
+                    mock.patch.object(connection.features, 'has_select_for_update_skip_locked', skip_locked):
+                Order.objects.update(status='pending', rider=None)
+                # 两个进程各自的队列都以同样的候选开始
+                first, second = OrderDispatcher(), OrderDispatcher()
+                first._refill([self.category.id])
+                second._refill([self.category.id])
+
+                a = self._claim(first, self.riders[0], 2)
+                b = self._claim(second, self.riders[1], 3)
+                self.assertEqual(len(a), 2)
+                self.assertEqual(len(b), 3)
+                self.assertFalse(set(a) & set(b))
+                self.assertEqual(Order.objects.filter(rider=self.riders[1]).count(), 3)
+                # 第二个进程跳过已被接走的候选后，剩下的订单仍留在队列里
+                self.assertEqual(self._claim(first, self.riders[0], 5), [self.orders[5].id])
+
+    def test_rolled_back_claim_is_requeued(self):
+        dispatcher = OrderDispatcher()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                claimed = dispatcher.claim(self.riders[0], [self.category.id], count=2)
+                raise RuntimeError
+        dispatcher.requeue(claimed)
+        self.assertEqual(self._claim(dispatcher, self.riders[0], 2), [order.id for order in self.orders[:2]])
+
+    def test_failed_grab_returns_orders_to_queue(self):
+        revocation_list.rebuild()
+        rider = self.riders[0]
+        UserProfile.objects.create(user=rider, openid='dispatch-rider', is_rider=True)
+        RiderSettings.objects.create(user=rider, auto_grab_enabled=True).categories.add(self.category)
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(rider.id)['access_token']}"}
+        dispatcher = OrderDispatcher()
+
+        with mock.patch('api.views.get_dispatcher', return_value=dispatcher):
+            with mock.patch('api.views.Notification.objects.bulk_create', side_effect=RuntimeError('db error')):
+                self.assertEqual(self.client.post('/api/rider/auto-grab/', **auth).json()['code'], 500)
+            self.assertEqual(Order.objects.get(id=self.orders[0].id).status, 'pending')
+            data = self.client.post('/api/rider/auto-grab/', **auth).json()
+        self.assertEqual(data['data']['order_no'], 'dispatch-0')
+
+    def test_refill_skips_in_flight_candidates(self):
+        queue = OrderQueue()
+        entries = [(order.created_at, order.id) for order in self.orders[:3]]
+        queue.refill(self.category.id, entries)
+        popped = queue.pop([self.category.id], 2)
+
+        queue.refill(self.category.id, entries)
+        self.assertEqual(len(queue), 1)
+
+        # 认领事务回滚且没有放回：超时后补充时重新入队
+        with mock.patch('api.dispatch.time.monotonic', return_value=time.monotonic() + OrderQueue.CLAIM_TIMEOUT):
+            queue.refill(self.category.id, entries)
+        self.assertEqual(len(queue), 3)
+
+        queue.settle([order_id for _, order_id, _ in popped])
+        self.assertEqual(queue.pop([self.category.id], 3)[0][1], self.orders[0].id)
+
+
+class TokenRevocationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        revocation_list.rebuild()
+        self.user = User.objects.create(username='revoke-user')
+        UserProfile.objects.create(user=self.user, openid='revoke-user')
+        self.tokens = TokenManager.generate_tokens(self.user.id)
+
+    def _refresh(self, refresh_token):
+        return self.client.post('/api/auth/refresh-token/', {'refresh_token': refresh_token},
+                                content_type='application/json').json()
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {self.tokens['access_token']}"}
+        self.assertEqual(self.client.get('/api/user-info/', **auth).json()['code'], 200)
+        response = self.client.post('/api/user/logout/', {'refresh_token': self.tokens['refresh_token']},
+                                    content_type='application/json', **auth)
+        self.assertEqual(response.json()['code'], 200)
+
+        self.assertEqual(self.client.get('/api/user-info/', **auth).status_code, 401)
+        self.assertEqual(self._refresh(self.tokens['refresh_token'])['code'], 401)
+        self.assertEqual(RevokedToken.objects.filter(user_id=self.user.id).count(), 2)
+
+    def test_refresh_token_is_rotated(self):
+        data = self._refresh(self.tokens['refresh_token'])
+        self.assertEqual(data['code'], 200)
+        self.assertNotEqual(data['data']['refresh_token'], self.tokens['refresh_token'])
+        # 旧刷新令牌只能用一次，新令牌可以继续刷新
+        self.assertEqual(self._refresh(self.tokens['refresh_token'])['code'], 401)
+        self.assertEqual(self._refresh(data['data']['refresh_token'])['code'], 200)
+
+    def test_revocation_reaches_other_processes(self):
+        other = RevocationList()
+        other.rebuild()
+        payload = TokenManager.verify_token(self.tokens['access_token'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(revocation_list.revoke(payload))
+        self.assertTrue(revocation_list.is_revoked(payload['jti']))
+
+        # 另一个进程在下一次检查版本号时重建，而不是等到 REBUILD_INTERVAL
+        later = time.monotonic() + RevocationList.VERSION_CHECK_INTERVAL
+        with mock.patch('api.token_revocation.time.monotonic', return_value=later):
+            self.assertTrue(other.is_revoked(payload['jti']))
+
+    def test_stale_filter_rebuilt_by_one_thread(self):
+        revocations = RevocationList()
+        revocations.rebuild()
+        revocations._built_at -= RevocationList.REBUILD_INTERVAL
+
+        def slow_rebuild():
+            time.sleep(0.05)
+            revocations._built_at = revocations._checked_at = time.monotonic()
+
+        with mock.patch.object(revocations, 'rebuild', side_effect=slow_rebuild) as rebuild:
+            threads = [threading.Thread(target=revocations._ensure_fresh) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(rebuild.call_count, 1)
+
+    def test_expired_rows_purged_by_command(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti='expired', user_id=self.user.id, expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', user_id=self.user.id, expires_at=now + timedelta(minutes=1))
+        call_command('purge_revoked_tokens', stdout=io.StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+class PhoneLoginTests(TestCase):
+
+    def _login(self, phone):
+        return self.client.post('/smart/login/', {'login_type': 'wechat', 'dev_phone': phone},
+                                content_type='application/json').json()
+
+    def test_duplicate_first_logins_share_one_user(self):
+        first, second = self._login('13800000001'), self._login('13800000001')
+        self.assertEqual((first['code'], second['code']), (200, 200))
+        self.assertEqual(first['data']['user']['id'], second['data']['user']['id'])
+        self.assertEqual(UserProfile.objects.filter(phone='13800000001').count(), 1)
+
+    def test_login_paths_issue_verifiable_tokens(self):
+        revocation_list.rebuild()
+        token = self._login('13800000003')['data']['access_token']
+        self.assertEqual(self.client.get('/api/user-info/', HTTP_AUTHORIZATION=f'Bearer {token}').json()['code'], 200)
+
+        # 不再返回固定的测试令牌
+        for url in ('/smart/login/', '/api/login/'):
+            data = self.client.post(url, {'username': 'someone'}, content_type='application/json').json()
+            self.assertEqual(data['code'], 400, url)
+            self.assertIsNone(data['data'])
+        self.assertEqual(self.client.get('/api/simple_login/').json()['code'], 400)
+
+    def test_concurrent_first_login_reuses_winner(self):
+        winner, created = user_service.get_or_create_phone_user('13800000002', 'wx_13800000002', '微信用户')
+        self.assertTrue(created)
+
+        # 模拟并发：查询时对方尚未提交，插入时 username 冲突，回查得到对方创建的用户
+        select = user_service._select_profile_by_phone
+        with mock.patch.object(user_service, '_select_profile_by_phone', side_effect=[None, select('13800000002')]):
+            profile, created = user_service.get_or_create_phone_user('13800000002', 'wx_13800000002', '微信用户')
+        self.assertFalse(created)
+        self.assertEqual(profile.user_id, winner.user_id)
+        self.assertEqual(User.objects.filter(username='wx_13800000002').count(), 1)
+
+
+class _SlowWechatClient:
+    """jscode2session 等待手机号请求开始：两者没有并发时超时，返回无 openid"""
+
+    def __init__(self):
+        self.phone_started = threading.Event()
+
+    def jscode2session(self, appid, secret, code):
+        if not self.phone_started.wait(2):
+            return {'errcode': -1, 'errmsg': 'not concurrent'}
+        return {'openid': 'async-openid', 'session_key': 'k'}
+
+    def get_user_phone_number(self, access_token, phone_code):
+        self.phone_started.set()
+        time.sleep(0.05)
+        return {'errcode': 0, 'phone_info': {'purePhoneNumber': '13900000000', 'countryCode': '86'}}
+
+
+@override_settings(WECHAT_MINIPROGRAM={'APPID': 'wx-test', 'APPSECRET': 'secret'})
+class AsyncLoginTests(TestCase):
+
+    async def test_code_exchange_and_phone_fetch_run_concurrently(self):
+        client = _SlowWechatClient()
+        provider = mock.Mock()
+        provider.get_token.return_value = 'access-token'
+        with mock.patch('api.login_views.get_wechat_client', return_value=client), \
+                mock.patch('api.login_views.get_access_token_provider', return_value=provider):
+            response = await self.async_client.post(
+                '/api/login/', {'login_type': 'wechat', 'code': 'c', 'phone_code': 'p'},
+                content_type='application/json'
+            )
+        data = response.json()
+        self.assertEqual(data['code'], 200, data)
+        self.assertEqual(data['data']['openid'], 'async-openid')
+        self.assertEqual(data['data']['user']['phone'], '13900000000')
+        profile = await UserProfile.objects.select_related('user').aget(openid='async-openid')
+        self.assertEqual(profile.phone, '13900000000')
+
+
+class OrderFeedTests(TestCase):
+
+    def setUp(self):
+        revocation_list.rebuild()
+        token_cache.clear()
+        rider = User.objects.create(username='feed-rider')
+        UserProfile.objects.create(user=rider, openid='feed-rider', is_rider=True)
+        self.category = OrderCategory.objects.create(name='feed', code='feed')
+        RiderSettings.objects.create(user=rider).categories.add(self.category)
+        self.headers = {'Authorization': f"Bearer {TokenManager.generate_tokens(rider.id)['access_token']}"}
+        self.broker = InProcessBroker()
+        patcher = mock.patch('api.feed_views.get_order_feed_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_publish_reaches_subscribers_of_the_channel(self):
+        subscription = self.broker.subscribe([category_channel(1)])
+        other = self.broker.subscribe([category_channel(2)])
+        # 发布方可以是其他线程
+        thread = threading.Thread(target=self.broker.publish, args=(category_channel(1), {'order_id': 7}))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await subscription.get(1), {'order_id': 7})
+        self.assertIsNone(await other.get(0.01))
+        subscription.close()
+        other.close()
+        self.assertEqual(self.broker.publish(category_channel(1), {'order_id': 8}), 0)
+
+    async def test_sse_encodes_order_datetimes(self):
+        created = timezone.now()
+        stream = feed_views._event_stream(self.broker.subscribe([]), [{'order_id': 1, 'created_at': created}])
+        chunk = await anext(stream)
+        await stream.aclose()
+        self.assertIn('"created_at":"%s"' % created.strftime('%Y-%m-%d %H:%M:%S'), chunk)
+
+    @override_settings(ORDER_FEED_SINGLE_PROCESS=True)
+    async def test_long_poll_returns_published_order_or_times_out(self):
+        started = time.monotonic()
+        response = await self.async_client.get('/api/rider/order-feed/', {'timeout': 0}, headers=self.headers)
+        self.assertEqual(response.json()['data'], {'orders': [], 'last_id': 0})
+        self.assertLess(time.monotonic() - started, 1)
+
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, self.broker.publish, category_channel(self.category.id), {'order_id': 42})
+        response = await self.async_client.get('/api/rider/order-feed/', {'timeout': 5}, headers=self.headers)
+        self.assertEqual(response.json()['data']['last_id'], 42)
+
+    async def test_refused_without_asgi_or_shared_broker(self):
+        # 多 worker 时进程内 broker 收不到其他进程的订单
+        response = await self.async_client.get('/api/rider/order-feed/', {'timeout': 0}, headers=self.headers)
+        self.assertEqual(response.status_code, 503)
+
+        with override_settings(ORDER_FEED_SINGLE_PROCESS=True):
+            # WSGI 下长轮询会占用工作线程
+            response = await sync_to_async(self.client.get)('/api/rider/order-feed/', headers=self.headers)
+        self.assertEqual(response.status_code, 503)
+
+
+class MessageReadWatermarkTests(TestCase):
+
+    def setUp(self):
+        revocation_list.rebuild()
+        self.user = User.objects.create(username='chat-reader')
+        self.peer = User.objects.create(username='chat-peer')
+        self.conversation = Conversation.objects.create()
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=self.conversation, user=user) for user in (self.user, self.peer)
+        ])
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {TokenManager.generate_tokens(self.user.id)['access_token']}"}
+
+    def _send(self, sender, content):
+        message = Message.objects.create(conversation=self.conversation, sender=sender, content=content)
+        self.conversation.update_last_message(content, sender)
+        return message
+
+    def _member(self, user):
+        return ConversationMember.objects.get(conversation=self.conversation, user=user)
+
+    def test_unread_count_incremented_with_f_and_reset_on_read(self):
+        # 两个请求各自持有会话实例：F() 在数据库中累加，互不覆盖
+        stale = Conversation.objects.get(pk=self.conversation.pk)
+        Message.objects.create(conversation=self.conversation, sender=self.peer, content='a')
+        self.conversation.update_last_message('a', self.peer)
+        Message.objects.create(conversation=stale, sender=self.peer, content='b')
+        stale.update_last_message('b', self.peer)
+        self._send(self.user, 'c')
+        self.assertEqual(self._member(self.user).unread_count, 2)
+        self.assertEqual(self._member(self.peer).unread_count, 1)
+        self.assertEqual(get_user_counters(self.user.id).unread_messages, 2)
+
+        self.client.get(f'/api/conversations/{self.conversation.id}/messages/', **self.auth)
+        self.assertEqual(self._member(self.user).unread_count, 0)
+        self.assertEqual(get_user_counters(self.user.id).unread_messages, 0)
+        conversations = self.client.get('/api/conversations/', **self.auth).json()['data']
+        self.assertEqual(conversations[0]['unread_count'], 0)
+
+    def test_send_during_read_is_kept_in_counters(self):
+        self._send(self.peer, 'a')
+        get_user_counters(self.user.id)
+        original = ConversationMember.objects.select_for_update
+
+        def send_then_lock(*args, **kwargs):
+            # 列表页已读到成员行之后、加锁之前，对方又发了一条消息
+            self._send(self.peer, 'b')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(ConversationMember.objects, 'select_for_update', side_effect=send_then_lock):
+            self.client.get(f'/api/conversations/{self.conversation.id}/messages/', **self.auth)
+        self.assertEqual(self._member(self.user).unread_count, 1)
+        self.assertEqual(get_user_counters(self.user.id).unread_messages, 1)
+
+    def test_reading_advances_watermark_without_touching_messages(self):
+        first = self._send(self.peer, 'a')
+        second = self._send(self.peer, 'b')
+        data = self.client.get(f'/api/conversations/{self.conversation.id}/messages/', **self.auth).json()['data']
+        self.assertEqual([m['is_read'] for m in data['messages']], [True, True])
+        self.assertEqual(self._member(self.user).last_read_message_id, second.id)
+        # 已读只推进水位，不逐条更新消息
+        self.assertFalse(Message.objects.filter(id__in=[first.id, second.id], is_read=True).exists())
+
+    def test_own_messages_read_by_peer_watermark(self):
+        mine = self._send(self.user, 'hello')
+        ConversationMember.objects.filter(conversation=self.conversation, user=self.peer).update(
+            last_read_message_id=mine.id
+        )
+        data = self.client.get(f'/api/conversations/{self.conversation.id}/messages/', **self.auth).json()['data']
+        self.assertTrue(data['messages'][0]['is_read'])
+
+
+class ConversationMemberMigrationTests(TransactionTestCase):
+    """0005 把参与者复制为会话成员并按 is_read 设置水位，0006 按水位计算未读数"""
+
+    migrate_from = [('api', '0004_usercounters')]
+    migrate_to = [('api', '0006_conversationmember_unread_count')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self._migrate(executor.loader.graph.leaf_nodes())
+
+    def test_participants_copied_with_watermarks(self):
+        apps = self._migrate(self.migrate_from)
+        OldUser = apps.get_model('auth', 'User')
+        OldConversation = apps.get_model('api', 'Conversation')
+        OldMessage = apps.get_model('api', 'Message')
+        alice = OldUser.objects.create(username='alice')
+        bob = OldUser.objects.create(username='bob')
+        conversation = OldConversation.objects.create()
+        conversation.participants.add(alice, bob)
+        read = OldMessage.objects.create(conversation=conversation, sender=bob, content='1', is_read=True)
+        OldMessage.objects.create(conversation=conversation, sender=bob, content='2')
+        OldMessage.objects.create(conversation=conversation, sender=bob, content='3')
+        last = OldMessage.objects.create(conversation=conversation, sender=alice, content='4', is_read=True)
+
+        apps = self._migrate(self.migrate_to)
+        Member = apps.get_model('api', 'ConversationMember')
+        members = {
+            member.user_id: (member.last_read_message_id, member.unread_count)
+            for member in Member.objects.filter(conversation_id=conversation.id)
+        }
+        # alice 停在第一条未读的他人消息之前；bob 没有未读，水位为最后一条消息
+        self.assertEqual(members, {alice.id: (read.id, 2), bob.id: (last.id, 0)})
+
+
+class NotificationOutboxTests(TestCase):
+
+    def setUp(self):
+        self.admins = [User.objects.create(username=f'outbox-admin-{i}', is_staff=True) for i in range(3)]
+        User.objects.create(username='outbox-user')
+
+    def test_enqueued_with_business_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                notify_admins('system', 'rolled back', '')
+                raise RuntimeError
+        with transaction.atomic():
+            notify_admins('system', 'committed', '')
+        self.assertEqual(list(NotificationOutbox.objects.values_list('title', flat=True)), ['committed'])
+        # 展开由后台命令完成，请求内不写 Notification
+        self.assertFalse(Notification.objects.exists())
+
+    def test_command_expands_to_staff_and_counts_unread(self):
+        entry = notify_admins('system', 'hello', 'world')
+        call_command('process_notification_outbox', batch_size=2, stdout=io.StringIO())
+
+        entry.refresh_from_db()
+        self.assertIsNotNone(entry.processed_at)
+        self.assertEqual((entry.recipient_count, entry.attempts), (3, 1))
+        self.assertEqual(set(Notification.objects.values_list('user_id', flat=True)), {a.id for a in self.admins})
+        self.assertEqual(get_user_counters(self.admins[0].id).unread_notifications, 1)
+        # 已处理的记录不会再次领取
+        self.assertEqual(process_outbox(), 0)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_failed_entry_retried_until_max_attempts(self):
+        broken = notify_admins('system', 'broken', '')
+        healthy = notify_admins('system', 'healthy', '')
+        original = notification_service._expand
+
+        def expand(entry, batch_size):
+            if entry.id == broken.id:
+                raise RuntimeError('boom')
+            return original(entry, batch_size)
+
+        with mock.patch('api.notification_service._expand', side_effect=expand):
+            # 失败的记录回滚并记录错误，本轮跳过，不阻塞后面的记录
+            self.assertEqual(process_outbox(), 1)
+            broken.refresh_from_db()
+            self.assertEqual((broken.attempts, broken.last_error, broken.processed_at), (1, 'boom', None))
+            self.assertFalse(Notification.objects.filter(title='broken').exists())
+
+            for _ in range(MAX_ATTEMPTS + 1):
+                process_outbox()
+        broken.refresh_from_db()
+        self.assertEqual(broken.attempts, MAX_ATTEMPTS)
+        self.assertIsNone(broken.processed_at)
+        healthy.refresh_from_db()
+        self.assertEqual(healthy.attempts, 1)
+
+    def test_claim_skips_locked_entries(self):
+        notify_admins('system', 'a', '')
+        notify_admins('system', 'b', '')
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True):
+            self.assertEqual(process_outbox(limit=1), 1)
+            self.assertEqual(NotificationOutbox.objects.filter(processed_at__isnull=True).count(), 1)
+            self.assertEqual(process_outbox(), 1)
+        self.assertEqual(Notification.objects.count(), 6)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.days = [self.today - timedelta(days=2), self.today - timedelta(days=1), self.today]
+        user = User.objects.create(username='rollup-user')
+        self.category = OrderCategory.objects.create(name='rollup', code='rollup')
+        self.orders = []
+        for day in self.days:
+            order = Order.objects.create(user=user, category=self.category, title='t', description='', price=2)
+            if day != self.today:
+                Order.objects.filter(pk=order.pk).update(created_at=self._noon(day))
+            self.orders.append(order)
+
+    def _noon(self, day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+
+    def _snapshot(self):
+        return list(OrderDailyRollup.objects.order_by('date').values_list(
+            'date', 'category_id', 'created_count', 'created_amount', 'completed_count', 'cancelled_count'
+        ))
+
+    def test_rerun_is_idempotent(self):
+        self.assertEqual(run_rollups(['orders']), {'orders': 3})
+        first = self._snapshot()
+        self.assertEqual([row[0] for row in first], self.days)
+        self.assertTrue(all(row[2:4] == (1, Decimal('2')) for row in first))
+
+        run_rollups(['orders'])
+        self.assertEqual(self._snapshot(), first)
+        run_rollups(['orders'], self.days[0], self.today)
+        self.assertEqual(self._snapshot(), first)
+
+    def test_incremental_run_rebuilds_touched_days_only(self):
+        run_rollups(['orders'])
+        watermark = RollupWatermark.objects.get(name='orders').processed_until
+        # 篡改未变化日期的汇总行：增量运行不应重算它
+        OrderDailyRollup.objects.filter(date=self.days[0]).update(created_count=99)
+        Order.objects.filter(pk=self.orders[0].pk).update(status='completed', completed_at=timezone.now())
+
+        self.assertEqual(run_rollups(['orders']), {'orders': 1})
+        rows = {row[0]: row for row in self._snapshot()}
+        self.assertEqual(rows[self.days[0]][2], 99)
+        self.assertEqual(rows[self.today][2:5], (1, Decimal('2'), 1))
+        self.assertGreater(RollupWatermark.objects.get(name='orders').processed_until, watermark)
+
+    def test_since_backfill_rebuilds_requested_range(self):
+        run_rollups(['orders'])
+        OrderDailyRollup.objects.update(created_count=99)
+        watermark = RollupWatermark.objects.get(name='orders').processed_until
+
+        out = io.StringIO()
+        call_command('run_rollups', only=['orders'], since=self.days[0].isoformat(),
+                     until=self.days[1].isoformat(), stdout=out)
+        self.assertIn('orders: 写入 2 行', out.getvalue())
+        rows = {row[0]: row for row in self._snapshot()}
+        self.assertEqual((rows[self.days[0]][2], rows[self.days[1]][2], rows[self.today][2]), (1, 1, 99))
+        # 回填不移动水位
+        self.assertEqual(RollupWatermark.objects.get(name='orders').processed_until, watermark)
@@ -0,0 +1,176 @@
+# backend/api/token_revocation.py
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    布隆过滤器 - 紧凑的集合成员判断
+    只会误报（可能存在），不会漏报（一定不存在）
+    """
+
+    def __init__(self, capacity=10000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # 双重哈希：由一次blake2b摘要派生k个位置
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    令牌吊销列表
+
+    内存中维护一个由RevokedToken表重建的布隆过滤器：
+    - 未吊销的令牌（绝大多数请求）只做内存判断，不访问数据库
+    - 过滤器命中时再查表确认，排除误报
+    - 吊销后（事务提交时）在共享缓存中更新版本号，各进程每 VERSION_CHECK_INTERVAL 秒
+      最多读一次版本号，变化时重建，其他 worker 最多滞后约 1 秒（需配置共享缓存，
+      见 README；进程内缓存时退化为按 REBUILD_INTERVAL 定期重建，最多滞后 60 秒）
+    - 同一进程内只有一个线程重建，其他线程继续使用旧过滤器
+    """
+
+    REBUILD_INTERVAL = 60  # 重建间隔（秒）
+    VERSION_CHECK_INTERVAL = 1  # 检查吊销版本号的间隔（秒）
+    VERSION_KEY = 'token_revocation:version'
+    CAPACITY = 10000  # 过滤器预期容量，超出后按实际数量扩容
+    ERROR_RATE = 0.001  # 误报率
+
+    def __init__(self):
+        self._filter = BloomFilter(self.CAPACITY, self.ERROR_RATE)
+        self._built_at = self._checked_at = -math.inf
+        self._version = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def rebuild(self):
+        """从RevokedToken表重建过滤器（只加载未过期的记录）"""
+        from django.core.cache import cache
+        from django.utils import timezone
+        from .models import RevokedToken
+
+        # 先读版本号再查表：查询之后的吊销会更新版本号，下次检查时再重建
+        version = cache.get(self.VERSION_KEY)
+        jtis = list(
+            RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', flat=True)
+        )
+        bloom = BloomFilter(max(self.CAPACITY, len(jtis) * 2), self.ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+
+        with self._lock:
+            self._filter = bloom
+            self._version = version
+            self._built_at = self._checked_at = time.monotonic()
+
+        logger.info(f"令牌吊销过滤器已重建，共 {len(jtis)} 条")
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.VERSION_CHECK_INTERVAL and now - self._built_at < self.REBUILD_INTERVAL:
+            return
+
+        # 从未构建时必须等待，否则只让一个线程检查/重建
+        if not self._rebuild_lock.acquire(blocking=math.isinf(self._built_at)):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._checked_at < self.VERSION_CHECK_INTERVAL and now - self._built_at < self.REBUILD_INTERVAL:
+                return
+            from django.core.cache import cache
+            if now - self._built_at < self.REBUILD_INTERVAL and cache.get(self.VERSION_KEY) == self._version:
+                self._checked_at = now
+                return
+            self.rebuild()
+        except Exception as e:
+            # 数据库或缓存不可用时沿用旧过滤器
+            logger.error(f"重建令牌吊销过滤器失败: {e}")
+            self._built_at = self._checked_at = time.monotonic()
+        finally:
+            self._rebuild_lock.release()
+
+    def is_revoked(self, jti):
+        """
+        判断令牌是否已吊销
+
+        Args:
+            jti: 令牌ID
+
+        Returns:
+            bool: 是否已吊销
+        """
+        if not jti:
+            return False
+
+        self._ensure_fresh()
+        if jti not in self._filter:
+            return False
+
+        # 过滤器命中，查表排除误报
+        from .models import RevokedToken
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, payload):
+        """
+        吊销令牌（过期记录由 purge_revoked_tokens 命令定期清理）
+
+        Args:
+            payload: 已验证的令牌数据（需包含jti和exp）
+
+        Returns:
+            bool: 是否由本次调用吊销（已吊销过时为 False）
+        """
+        from django.core.cache import cache
+        from django.db import transaction
+        from .models import RevokedToken
+
+        jti = payload.get('jti')
+        if not jti:
+            return False
+
+        expires_at = datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)
+        _, created = RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'user_id': payload.get('user_id'), 'expires_at': expires_at}
+        )
+
+        with self._lock:
+            self._filter.add(jti)
+        if created:
+            # 通知其他进程重建过滤器
+            transaction.on_commit(lambda: cache.set(self.VERSION_KEY, time.time_ns(), None))
+        return created
+
+    def purge_expired(self):
+        """删除已过期的吊销记录，返回删除条数"""
+        from django.utils import timezone
+        from .models import RevokedToken
+
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+revocation_list = RevocationList()
@@ -2,8 +2,13 @@
 import jwt
 import hashlib
 import time
+import uuid
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from django.conf import settings
+from django.db import router
+from .token_revocation import revocation_list
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,6 +45,7 @@ class TokenManager:
         access_payload = {
             'user_id': user_id,
             'type': 'access',
+            'jti': uuid.uuid4().hex,
             'exp': now + timedelta(minutes=cls.ACCESS_TOKEN_EXPIRE_MINUTES),
             'iat': now,
             'data': user_data or {}
@@ -55,6 +61,7 @@ class TokenManager:
         refresh_payload = {
             'user_id': user_id,
             'type': 'refresh',
+            'jti': uuid.uuid4().hex,
             'exp': now + timedelta(days=cls.REFRESH_TOKEN_EXPIRE_DAYS),
             'iat': now
         }
@@ -109,7 +116,7 @@ class TokenManager:
     @classmethod
     def refresh_access_token(cls, refresh_token):
         """
-        使用刷新令牌获取新的访问令牌
+        使用刷新令牌获取新的访问令牌和刷新令牌（轮换，旧刷新令牌随即吊销）
 
         Args:
             refresh_token: 刷新令牌
@@ -121,6 +128,15 @@ class TokenManager:
         if not payload:
             return None
 
+        if revocation_list.is_revoked(payload.get('jti')):
+            logger.warning("刷新令牌已吊销")
+            return None
+
+        # 刷新令牌只能使用一次：吊销旧令牌，并发刷新时只有一个请求成功
+        if not revocation_list.revoke(payload):
+            logger.warning("刷新令牌已被使用")
+            return None
+
         user_id = payload['user_id']
 
         # 生成新的访问令牌
@@ -140,4 +156,181 @@ class TokenManager:
             str: MD5哈希token
         """
         token_str = f"{user_id}_{int(time.time())}_{phone}"
-        return hashlib.md5(token_str.encode()).hexdigest()
\ No newline at end of file
+        return hashlib.md5(token_str.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    进程内令牌缓存 - 有界LRU
+
+    以JWT签名段为键，缓存解码后的claims以及按需加载的用户列值快照，
+    条目在令牌剩余有效期（exp）到达时失效
+    """
+
+    MAX_ENTRIES = 4096  # 最大缓存条目数
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._user_keys = {}  # user_id -> {key}，用于按用户失效
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(token):
+        """JWT签名段对同一令牌唯一，作为缓存键"""
+        return token.rsplit('.', 1)[-1]
+
+    def get(self, token):
+        """
+        获取缓存的令牌条目
+
+        Returns:
+            dict: {'payload', 'expires_at', 'user'} 或 None
+        """
+        key = self.make_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, token, payload):
+        """缓存已验证的claims，TTL为令牌剩余有效期"""
+        expires_at = payload.get('exp')
+        if not expires_at or expires_at <= time.time():
+            return None
+
+        key = self.make_key(token)
+        entry = {'payload': payload, 'expires_at': expires_at, 'user': None}
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._user_keys.setdefault(payload.get('user_id'), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+        return entry
+
+    def invalidate_user(self, user_id):
+        """用户或资料变更时，清除该用户的所有缓存条目"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def discard(self, token):
+        """移除单个令牌的缓存条目"""
+        with self._lock:
+            self._remove(self.make_key(token))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry['payload'].get('user_id')
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def verify_access_token(token):
+    """
+    验证访问令牌（带进程内缓存）
+
+    同一令牌只解码一次，后续请求直接命中缓存
+
+    Returns:
+        dict: 缓存条目或None
+    """
+    entry = token_cache.get(token)
+    if entry is None:
+        payload = TokenManager.verify_token(token, 'access')
+        if not payload:
+            return None
+        entry = token_cache.set(token, payload)
+        if entry is None:
+            return None
+
+    # 吊销检查只查内存中的布隆过滤器
+    if revocation_list.is_revoked(entry['payload'].get('jti')):
+        return None
+
+    return entry
+
+
+def revoke_token(token, token_type='access'):
+    """
+    吊销令牌（退出登录时调用）
+
+    Returns:
+        bool: 是否吊销成功
+    """
+    payload = TokenManager.verify_token(token, token_type)
+    if not payload:
+        return False
+
+    revocation_list.revoke(payload)
+    token_cache.discard(token)
+    return True
+
+
+def _snapshot(instance):
+    """模型实例的列值元组（均为不可变值，可在请求、线程间共享）"""
+    return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+
+def _from_snapshot(model, values):
+    return model.from_db(router.db_for_read(model), [field.attname for field in model._meta.concrete_fields], values)
+
+
+def load_token_user(entry):
+    """
+    加载令牌对应的有效用户（连同用户资料一并查询）
+
+    条目中只缓存用户和资料的列值快照，每次按快照构建新的实例交给视图（构建不查库，
+    比深拷贝缓存的实例便宜）。用户或资料通过 save()/delete() 变更时由 signals.py 清除缓存；
+    queryset.update() 不触发信号，调用方须自行调用 token_cache.invalidate_user()
+
+    Returns:
+        User 或 None（用户已删除或已停用）
+    """
+    from django.contrib.auth.models import User
+    from .models import UserProfile
+
+    snapshot = entry['user']
+    if snapshot is None:
+        user = User.objects.select_related('userprofile').filter(
+            id=entry['payload'].get('user_id'),
+            is_active=True
+        ).first()
+        if user is None:
+            return None
+        profile = getattr(user, 'userprofile', None)
+        snapshot = (_snapshot(user), _snapshot(profile) if profile is not None else None)
+        entry['user'] = snapshot
+
+    user_values, profile_values = snapshot
+    user = _from_snapshot(User, user_values)
+    profile = _from_snapshot(UserProfile, profile_values) if profile_values is not None else None
+    # 与 select_related 的结果一致：没有资料时访问 user.userprofile 抛出 DoesNotExist
+    User.userprofile.related.set_cached_value(user, profile)
+    if profile is not None:
+        UserProfile.user.field.set_cached_value(profile, user)
+    return user
@@ -2,6 +2,9 @@
 from django.urls import path
 from . import views
 from . import payment_views
+from . import login_views
+from . import feed_views
+from . import report_views
 
 urlpatterns = [
     # 用户管理
@@ -13,7 +16,8 @@ urlpatterns = [
     path('upload/image/', views.upload_image),
 
     # 基础认证功能
-    path('login/', views.login, name='api_login'),
+    path('login/', login_views.login, name='api_login'),
+    path('auth/refresh-token/', views.refresh_token, name='refresh_token'),
     path('user-info/', views.get_user_info, name='get_user_info'),
     path('user/<int:user_id>/', views.user_profile_detail, name='user_profile'),
     path('auth/real-name/', views.submit_real_name_auth, name='submit_real_name_auth'),
@@ -51,8 +55,18 @@ urlpatterns = [
     path('rider/settings/', views.rider_settings, name='rider_settings'),
     path('rider/auto-grab/', views.auto_grab_order, name='auto_grab_order'),
     path('rider/stats/', views.rider_grab_stats, name='rider_grab_stats'),
+    path('rider/order-feed/', feed_views.rider_order_feed, name='rider_order_feed'),
     path('order-categories/', views.order_categories, name='order_categories'),
 
+    # 系统监控
+    path('system/wechat-metrics/', views.wechat_client_metrics, name='wechat_client_metrics'),
+    path('system/cache-metrics/', views.cache_metrics, name='cache_metrics'),
+
+    # 趋势报表（日汇总）
+    path('reports/orders/', report_views.order_rollup_report, name='order_rollup_report'),
+    path('reports/revenue/', report_views.revenue_rollup_report, name='revenue_rollup_report'),
+    path('reports/riders/', report_views.rider_rollup_report, name='rider_rollup_report'),
+
     # 支付相关
     path('payment/notify/', payment_views.payment_notify, name='payment_notify'),
 ]
\ No newline at end of file
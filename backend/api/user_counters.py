@@ -0,0 +1,94 @@
+# backend/api/user_counters.py
+import logging
+from collections import Counter, defaultdict
+from django.contrib.auth.models import User
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .db_utils import bulk_upsert
+from .models import ConversationMember, Notification, UserCounters
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('unread_notifications', 'unread_messages')
+
+
+def _count_subquery(queryset):
+    """按外层用户统计行数的相关子查询（无记录时为0）"""
+    return Coalesce(Subquery(
+        queryset.order_by().values('user').annotate(total=Count('id')).values('total')[:1]
+    ), 0)
+
+
+def recompute_user_counters(user_ids):
+    """
+    按明细表重算用户计数并写入（存在则覆盖）
+
+    Returns:
+        list[UserCounters]
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    rows = User.objects.filter(id__in=user_ids).annotate(
+        notifications=_count_subquery(
+            Notification.objects.filter(user=OuterRef('pk'), is_read=False)
+        ),
+        # 各会话成员未读数之和
+        messages=Coalesce(Subquery(
+            ConversationMember.objects.filter(user=OuterRef('pk')).order_by().values('user')
+            .annotate(total=Sum('unread_count')).values('total')[:1]
+        ), 0)
+    ).values_list('id', 'notifications', 'messages')
+    totals = {user_id: (notifications, messages) for user_id, notifications, messages in rows}
+
+    now = timezone.now()
+    counters = [
+        UserCounters(
+            user_id=user_id,
+            unread_notifications=totals[user_id][0],
+            unread_messages=totals[user_id][1],
+            updated_at=now
+        )
+        for user_id in user_ids if user_id in totals
+    ]
+    bulk_upsert(UserCounters, counters, unique_fields=['user'], update_fields=list(COUNTER_FIELDS) + ['updated_at'])
+    return counters
+
+
+def get_user_counters(user_id):
+    """读取用户计数，首次读取时按明细表初始化；用户不存在时返回全0（不写入）"""
+    counters = UserCounters.objects.filter(user_id=user_id).first()
+    if counters is None:
+        recomputed = recompute_user_counters([user_id])
+        counters = recomputed[0] if recomputed else UserCounters(user_id=user_id)
+    return counters
+
+
+def _adjust(field, user_ids, delta):
+    """
+    原子增减计数，不低于0；尚未初始化的用户在首次读取时重算
+
+    user_ids 中重复出现的用户按出现次数累计
+    """
+    if not delta:
+        return
+    by_times = defaultdict(list)
+    for user_id, times in Counter(user_ids).items():
+        by_times[times].append(user_id)
+
+    now = timezone.now()
+    for times, ids in by_times.items():
+        UserCounters.objects.filter(user_id__in=ids).update(**{
+            field: Greatest(F(field) + delta * times, 0),
+            'updated_at': now
+        })
+
+
+def add_unread_notifications(user_ids, delta=1):
+    _adjust('unread_notifications', user_ids, delta)
+
+
+def add_unread_messages(user_ids, delta=1):
+    _adjust('unread_messages', user_ids, delta)
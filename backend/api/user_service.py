@@ -0,0 +1,190 @@
+# backend/api/user_service.py
+import logging
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from .models import UserProfile
+from .token_utils import token_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _select_profile(openid):
+    """按 openid 查询用户资料，连同 User 一次取回"""
+    return UserProfile.objects.select_related('user').filter(openid=openid).first()
+
+
+def _insert_values(obj):
+    """按 Django 字段默认值/auto_now 规则计算插入的列和值"""
+    columns, values = [], []
+    for field in obj._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        value = field.pre_save(obj, add=True)
+        columns.append(connection.ops.quote_name(field.column))
+        values.append(field.get_db_prep_save(value, connection))
+    return columns, values
+
+
+def _upsert_postgresql(user, profile):
+    """
+    PostgreSQL：一条语句完成 User + UserProfile 的插入
+
+    username/openid 冲突时 DO NOTHING，不返回行，由调用方回查已存在的记录
+    """
+    user_columns, user_values = _insert_values(user)
+    profile.user_id = 0  # 占位，实际取自 new_user.id
+    profile_columns, profile_values = _insert_values(profile)
+    user_id_column = connection.ops.quote_name(UserProfile._meta.get_field('user').column)
+    user_id_index = profile_columns.index(user_id_column)
+    profile_select = ['%s'] * len(profile_columns)
+    profile_select[user_id_index] = 'new_user.id'
+    del profile_values[user_id_index]
+
+    quote = connection.ops.quote_name
+    sql = (
+        f"WITH new_user AS ("
+        f"INSERT INTO {quote(User._meta.db_table)} ({', '.join(user_columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(user_values))}) "
+        f"ON CONFLICT ({quote('username')}) DO NOTHING RETURNING id) "
+        f"INSERT INTO {quote(UserProfile._meta.db_table)} ({', '.join(profile_columns)}) "
+        f"SELECT {', '.join(profile_select)} FROM new_user "
+        f"ON CONFLICT ({quote('openid')}) DO NOTHING "
+        f"RETURNING id, {user_id_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, user_values + profile_values)
+        row = cursor.fetchone()
+
+    if row is None:
+        return False
+    profile.id, user.id = row
+    profile.user = user
+    for obj in (user, profile):
+        obj._state.adding = False
+        obj._state.db = connection.alias
+    return True
+
+
+def _upsert_generic(user, profile):
+    """其他数据库：同一事务内两次插入，唯一约束冲突时回滚"""
+    try:
+        with transaction.atomic():
+            user.save(force_insert=True)
+            profile.user = user
+            profile.save(force_insert=True)
+    except IntegrityError:
+        user.pk = None
+        return False
+    return True
+
+
+def _insert_user(user, profile):
+    """插入 User + UserProfile，username 或 openid 冲突时不插入并返回 False"""
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            created = _upsert_postgresql(user, profile)
+            if not created:
+                # 仅 openid 冲突时 User 已插入，回滚避免遗留孤立用户
+                transaction.set_rollback(True)
+    else:
+        created = _upsert_generic(user, profile)
+
+    if created:
+        # 原生SQL不会触发模型信号，手动补发
+        if connection.vendor == 'postgresql':
+            post_save.send(sender=User, instance=user, created=True)
+            post_save.send(sender=UserProfile, instance=profile, created=True)
+        logger.info(f'创建新用户: {user.id}')
+    return created
+
+
+def get_or_create_wechat_user(openid, phone='', user_info=None, username=None):
+    """
+    按 openid 查找或创建微信用户
+
+    - 老用户：一次查询（select_related 取回 User）
+    - 新用户：在一个事务中插入 User 和 UserProfile；PostgreSQL 使用
+      INSERT ... ON CONFLICT DO NOTHING 单条语句完成，其他数据库回退为
+      事务内插入 + 捕获唯一约束冲突
+    - 并发首次登录时，冲突的一方回查胜出方创建的记录
+
+    Args:
+        openid: 微信OpenID
+        phone: 手机号（可选，已有用户未绑定时补充）
+        user_info: 微信用户信息 {'nickName', 'avatarUrl'}
+        username: 新用户的用户名，默认 wx_{openid}
+
+    Returns:
+        tuple: (UserProfile, 是否新建)，profile.user 已加载
+    """
+    user_info = user_info or {}
+
+    profile_obj = _select_profile(openid)
+    if profile_obj is None:
+        user = User(username=username or f"wx_{openid}")
+        user.set_unusable_password()
+        profile_obj = UserProfile(
+            openid=openid,
+            phone=phone or '',
+            real_name=user_info.get('nickName', '微信用户'),
+            avatar_url=user_info.get('avatarUrl', '/media/default-avatar.png')
+        )
+
+        if _insert_user(user, profile_obj):
+            return profile_obj, True
+
+        # 并发登录冲突，使用已创建的记录
+        profile_obj = _select_profile(openid)
+        if profile_obj is None:
+            raise IntegrityError(f'用户名已被占用: {user.username}')
+
+    # 更新手机号（如果之前没有绑定）
+    if phone and not profile_obj.phone:
+        UserProfile.objects.filter(pk=profile_obj.pk, phone='').update(phone=phone, updated_at=timezone.now())
+        # update() 不触发 post_save，令牌缓存中的资料快照需要手动清除
+        token_cache.invalidate_user(profile_obj.user_id)
+        profile_obj.phone = phone
+
+    logger.info(f'用户已存在，登录: {profile_obj.user_id}')
+    return profile_obj, False
+
+
+def _select_profile_by_phone(phone):
+    return UserProfile.objects.select_related('user').filter(phone=phone).order_by('id').first()
+
+
+def get_or_create_phone_user(phone, username, real_name):
+    """
+    按手机号查找或创建用户（手机号授权登录，没有 openid）
+
+    与 get_or_create_wechat_user 相同：新用户在一个事务中插入，并发首次登录时
+    username 冲突的一方回查胜出方创建的记录，不会出现重复用户或 500
+
+    Args:
+        phone: 手机号
+        username: 用户名（如 wx_{phone}），已有用户不同时更新
+        real_name: 新用户的昵称
+
+    Returns:
+        tuple: (UserProfile, 是否新建)，profile.user 已加载
+    """
+    profile_obj = _select_profile_by_phone(phone)
+    if profile_obj is None:
+        user = User(username=username)
+        user.set_unusable_password()
+        profile_obj = UserProfile(phone=phone, real_name=real_name, student_id='', is_verified=False)
+        if _insert_user(user, profile_obj):
+            return profile_obj, True
+
+        profile_obj = _select_profile_by_phone(phone)
+        if profile_obj is None:
+            raise IntegrityError(f'用户名已被占用: {username}')
+
+    user = profile_obj.user
+    if user.username != username:
+        user.username = username
+        user.save(update_fields=['username'])
+    logger.info(f'用户已存在，登录: {user.id}')
+    return profile_obj, False
@@ -1,14 +1,30 @@
 # backend/api/views.py
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q , Sum
-from datetime import datetime, timedelta
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from datetime import timedelta
+from . import announcement_service
+from .dashboard_stats import get_dashboard_stats
 from .decorators import api_login_required
+from .dispatch import get_dispatcher
+from .http_cache import ANNOUNCEMENTS, ORDER_CATEGORIES, cache_public_response
+from .notification_service import notify_admins
+from .pagination import CursorPaginator, paginate_by_cursor, paginate_list_by_cursor, wants_cursor
+from .projections import (
+    AnnouncementProjection, AuditApplicationProjection, FeedbackProjection, NotificationProjection,
+    TransactionProjection
+)
+from .responses import api_error, api_json, api_ok
+from .rider_quota import get_rider_quota
+from .token_utils import TokenManager, revoke_token
+from .user_counters import add_unread_messages, add_unread_notifications, get_user_counters
+from .wechat_client import get_wechat_client
 from .models import (
     UserProfile,
     BlacklistRecord,
@@ -17,6 +33,7 @@ from .models import (
     Transaction,
     Notification,
     Conversation,
+    ConversationMember,
     Message,
     Announcement,
     UserFeedback,
@@ -29,10 +46,7 @@ import json
 import sys
 import io
 import logging
-import random
 import time
-import hashlib
-import requests
 import os
 import uuid
 
@@ -43,235 +57,6 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 logger = logging.getLogger(__name__)
 
 
-@csrf_exempt
-def login(request):
-    """登录接口 - 使用正确的微信登录流程"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            login_type = data.get('login_type', 'normal')
-
-            if login_type == 'wechat':
-                # 微信一键登录
-                wx_code = data.get('code')  # wx.login() 获取的code
-                phone_code = data.get('phone_code')  # 手机号授权码
-                user_info = data.get('userInfo', {})
-
-                # 开发环境：模拟登录
-                dev_phone = data.get('dev_phone')
-                if dev_phone:
-                    logger.info(f'开发环境模拟登录，手机号: {dev_phone}')
-
-                    # 模拟 openid
-                    mock_openid = f"dev_openid_{dev_phone}_{int(time.time())}"
-
-                    try:
-                        profile_obj = UserProfile.objects.get(openid=mock_openid)
-                        user = profile_obj.user
-                        logger.info(f'用户已存在: {user.id}')
-                    except UserProfile.DoesNotExist:
-                        user = User.objects.create_user(
-                            username=f"dev_{dev_phone}",
-                            password=None
-                        )
-                        profile_obj = UserProfile.objects.create(
-                            user=user,
-                            openid=mock_openid,  # 保存 openid
-                            phone=dev_phone,
-                            real_name=user_info.get('nickName', '开发用户'),
-                            avatar_url=user_info.get('avatarUrl', '/media/default-avatar.png')
-                        )
-                        logger.info(f'创建新用户: {user.id}')
-
-                    token_str = f"{user.id}_{int(time.time())}_{mock_openid}"
-                    token = hashlib.md5(token_str.encode()).hexdigest()
-
-                    return JsonResponse({
-                        'code': 200,
-                        'msg': '登录成功',
-                        'data': {
-                            'user': {
-                                'id': user.id,
-                                'username': user.username,
-                                'nickname': profile_obj.real_name,
-                                'phone': profile_obj.phone or '',
-                                'avatar_url': profile_obj.avatar_url,
-                                'country_code': '86'
-                            },
-                            'token': token,
-                            'openid': mock_openid
-                        }
-                    })
-
-                # 真机环境：使用微信 code 换取 openid
-                if not wx_code:
-                    return JsonResponse({
-                        'code': 400,
-                        'msg': '缺少微信登录凭证',
-                        'data': None
-                    })
-
-                # 获取微信配置
-                wechat_config = getattr(settings, 'WECHAT_MINIPROGRAM', {})
-                appid = wechat_config.get('APPID', '')
-                appsecret = wechat_config.get('APPSECRET', '')
-
-                if not appid or not appsecret:
-                    logger.error('微信小程序配置缺失')
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': '微信小程序配置缺失',
-                        'data': None
-                    })
-
-                # 1. 使用 wx.code 换取 openid（这才是正确的微信登录）
-                jscode2session_url = f"https://api.weixin.qq.com/sns/jscode2session?appid={appid}&secret={appsecret}&js_code={wx_code}&grant_type=authorization_code"
-
-                try:
-                    code_response = requests.get(jscode2session_url, timeout=10)
-                    code_data = code_response.json()
-
-                    if 'errcode' in code_data:
-                        logger.error(f"获取openid失败: {code_data}")
-                        return JsonResponse({
-                            'code': 500,
-                            'msg': f'获取openid失败: {code_data.get("errmsg")}',
-                            'data': None
-                        })
-
-                    openid = code_data.get('openid')
-                    session_key = code_data.get('session_key')
-
-                    if not openid:
-                        logger.error('无法获取openid')
-                        return JsonResponse({
-                            'code': 500,
-                            'msg': '无法获取openid',
-                            'data': None
-                        })
-
-                    logger.info(f'获取openid成功: {openid[:10]}...')
-
-                except Exception as e:
-                    logger.error(f"请求微信接口失败: {str(e)}")
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': f'请求微信接口失败: {str(e)}',
-                        'data': None
-                    })
-
-                # 2. 获取手机号（如果需要）
-                pure_phone = ''
-                country_code = '86'
-
-                if phone_code:
-                    # 获取 access_token
-                    token_url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={appid}&secret={appsecret}"
-                    token_response = requests.get(token_url, timeout=10)
-                    token_data = token_response.json()
-
-                    if 'errcode' not in token_data:
-                        access_token = token_data.get('access_token')
-
-                        # 使用 access_token 获取手机号
-                        phone_url = f"https://api.weixin.qq.com/wxa/business/getuserphonenumber?access_token={access_token}"
-                        phone_response = requests.post(phone_url, json={'code': phone_code}, timeout=10)
-                        phone_data = phone_response.json()
-
-                        if phone_data.get('errcode') == 0:
-                            phone_info = phone_data.get('phone_info', {})
-                            pure_phone = phone_info.get('purePhoneNumber', '')
-                            country_code = phone_info.get('countryCode', '86')
-                            logger.info(f'获取手机号成功: {pure_phone}')
-
-                # 3. 使用 openid 查找或创建用户
-                try:
-                    profile_obj = UserProfile.objects.get(openid=openid)
-                    user = profile_obj.user
-
-                    # 更新手机号（如果之前没有绑定）
-                    if pure_phone and not profile_obj.phone:
-                        profile_obj.phone = pure_phone
-                        profile_obj.save()
-
-                    logger.info(f'用户已存在，登录: {user.id}')
-                except UserProfile.DoesNotExist:
-                    # 创建新用户（使用 openid 作为唯一标识）
-                    user = User.objects.create_user(
-                        username=f"wx_{openid[:10]}",
-                        password=None
-                    )
-                    logger.info(f'创建新User: {user.id}')
-
-                    profile_obj = UserProfile.objects.create(
-                        user=user,
-                        openid=openid,  # 保存 openid
-                        phone=pure_phone,
-                        real_name=user_info.get('nickName', '微信用户'),
-                        avatar_url=user_info.get('avatarUrl', '/media/default-avatar.png')
-                    )
-                    logger.info(f'创建新UserProfile: {profile_obj.id}')
-
-                # 4. 生成 token
-                token_str = f"{user.id}_{int(time.time())}_{openid}"
-                token = hashlib.md5(token_str.encode()).hexdigest()
-
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '登录成功',
-                    'data': {
-                        'user': {
-                            'id': user.id,
-                            'username': user.username,
-                            'nickname': profile_obj.real_name,
-                            'phone': profile_obj.phone or '',
-                            'avatar_url': profile_obj.avatar_url,
-                            'country_code': country_code
-                        },
-                        'token': token,
-                        'openid': openid
-                    }
-                })
-
-            else:
-                # 普通登录（向后兼容）
-                username = data.get('username', 'test')
-
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '登录成功',
-                    'data': {
-                        'user': {
-                            'id': 1,
-                            'username': username,
-                            'nickname': '测试用户'
-                        },
-                        'token': 'test_token_123456'
-                    }
-                })
-
-        except json.JSONDecodeError as e:
-            logger.error(f'请求数据格式错误: {str(e)}')
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
-        except Exception as e:
-            logger.error(f'登录错误: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
-
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
-
-
 @csrf_exempt
 def upload_image(request):
     """图片上传接口"""
@@ -281,29 +66,17 @@ def upload_image(request):
             image_file = request.FILES.get('image')
 
             if not image_file:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '请选择要上传的图片',
-                    'data': None
-                })
+                return api_error(400, '请选择要上传的图片')
 
             # 验证文件类型
             allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
             if image_file.content_type not in allowed_types:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '只支持 JPG、PNG、GIF、WEBP 格式的图片',
-                    'data': None
-                })
+                return api_error(400, '只支持 JPG、PNG、GIF、WEBP 格式的图片')
 
             # 验证文件大小（最大 5MB）
             max_size = 5 * 1024 * 1024
             if image_file.size > max_size:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '图片大小不能超过 5MB',
-                    'data': None
-                })
+                return api_error(400, '图片大小不能超过 5MB')
 
             # 生成文件名
             ext = os.path.splitext(image_file.name)[1]
@@ -324,28 +97,16 @@ def upload_image(request):
 
             logger.info(f'图片上传成功: {file_url}')
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '上传成功',
-                'data': {
-                    'url': file_url,
-                    'filename': filename
-                }
-            })
+            return api_ok({
+                'url': file_url,
+                'filename': filename
+            }, '上传成功')
 
         except Exception as e:
             logger.error(f'图片上传失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'上传失败: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'上传失败: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用 POST 请求',
-        'data': None
-    })
+    return api_error(400, '请使用 POST 请求')
 
 
 @csrf_exempt
@@ -365,11 +126,7 @@ def get_user_info(request):
 
                 # 检查权限：只能查看自己的信息或管理员可以查看所有
                 if user.id != request.user.id and not request.user.is_staff:
-                    return JsonResponse({
-                        'code': 403,
-                        'msg': '权限不足',
-                        'data': None
-                    }, status=403)
+                    return api_error(403, '权限不足', status=403)
 
             # 获取用户资料
             try:
@@ -382,7 +139,7 @@ def get_user_info(request):
                 'id': user.id,
                 'username': user.username,
                 'email': user.email,
-                'date_joined': user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else ''
+                'date_joined': user.date_joined or ''
             }
 
             if profile:
@@ -394,8 +151,7 @@ def get_user_info(request):
                     'credit_score': profile.credit_score,
                     'is_blacklisted': profile.is_blacklisted,
                     'blacklist_reason': profile.blacklist_reason,
-                    'last_login_time': profile.last_login_time.strftime(
-                        '%Y-%m-%d %H:%M:%S') if profile.last_login_time else '',
+                    'last_login_time': profile.last_login_time or '',
                     'avatar_url': profile.avatar_url,
                     'gender': profile.gender,
                     'school': profile.school,
@@ -403,31 +159,15 @@ def get_user_info(request):
                     'major': profile.major
                 })
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': user_data
-            })
+            return api_ok(user_data, '获取成功')
 
         except User.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '用户不存在',
-                'data': None
-            })
+            return api_error(404, '用户不存在')
         except Exception as e:
             logger.error(f'获取用户信息失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用GET请求',
-        'data': None
-    })
+    return api_error(400, '请使用GET请求')
 
 
 @csrf_exempt
@@ -440,11 +180,7 @@ def update_user_info(request, user_id=None):
             if user_id:
                 target_user = User.objects.get(id=user_id)
                 if target_user.id != request.user.id and not request.user.is_staff:
-                    return JsonResponse({
-                        'code': 403,
-                        'msg': '权限不足',
-                        'data': None
-                    }, status=403)
+                    return api_error(403, '权限不足', status=403)
                 user = target_user
             else:
                 user = request.user
@@ -478,47 +214,27 @@ def update_user_info(request, user_id=None):
 
             logger.info(f'用户信息更新成功: user_id={user.id}')
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '更新成功',
-                'data': {
-                    'id': user.id,
-                    'avatar_url': profile_obj.avatar_url,
-                    'real_name': profile_obj.real_name,
-                    'phone': profile_obj.phone,
-                    'gender': profile_obj.gender,
-                    'school': profile_obj.school,
-                    'college': profile_obj.college,
-                    'major': profile_obj.major,
-                    'student_id': profile_obj.student_id
-                }
-            })
+            return api_ok({
+                'id': user.id,
+                'avatar_url': profile_obj.avatar_url,
+                'real_name': profile_obj.real_name,
+                'phone': profile_obj.phone,
+                'gender': profile_obj.gender,
+                'school': profile_obj.school,
+                'college': profile_obj.college,
+                'major': profile_obj.major,
+                'student_id': profile_obj.student_id
+            }, '更新成功')
 
         except User.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '用户不存在',
-                'data': None
-            })
+            return api_error(404, '用户不存在')
         except json.JSONDecodeError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
             logger.error(f'更新用户信息失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'更新失败: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'更新失败: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用PUT请求',
-        'data': None
-    })
+    return api_error(400, '请使用PUT请求')
 
 
 @csrf_exempt
@@ -528,11 +244,7 @@ def blacklist_users(request):
     """黑名单用户管理 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     if request.method == 'GET':
         try:
@@ -546,22 +258,13 @@ def blacklist_users(request):
                     'real_name': profile.real_name,
                     'phone': profile.phone,
                     'reason': profile.blacklist_reason,
-                    'blacklist_until': profile.blacklist_until.strftime(
-                        '%Y-%m-%d %H:%M:%S') if profile.blacklist_until else None,
-                    'added_at': profile.blacklisted_at.strftime('%Y-%m-%d %H:%M:%S') if profile.blacklisted_at else None
+                    'blacklist_until': profile.blacklist_until,
+                    'added_at': profile.blacklisted_at
                 })
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': users_data
-            })
+            return api_ok(users_data, '获取成功')
         except Exception as e:
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
     elif request.method == 'POST':
         try:
@@ -571,11 +274,7 @@ def blacklist_users(request):
             days = data.get('days', 30)  # 默认封禁30天
 
             if not user_id:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '缺少用户ID',
-                    'data': None
-                })
+                return api_error(400, '缺少用户ID')
 
             user = User.objects.get(id=user_id)
             profile, created = UserProfile.objects.get_or_create(user=user)
@@ -593,35 +292,15 @@ def blacklist_users(request):
                 status='active'
             )
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '用户已加入黑名单',
-                'data': None
-            })
+            return api_ok(msg='用户已加入黑名单')
         except User.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '用户不存在',
-                'data': None
-            })
+            return api_error(404, '用户不存在')
         except json.JSONDecodeError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '不支持的请求方法',
-        'data': None
-    })
+    return api_error(400, '不支持的请求方法')
 
 
 @csrf_exempt
@@ -631,50 +310,26 @@ def audit_applications(request):
     """审核申请管理 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     if request.method == 'GET':
         try:
             status = request.GET.get('status', 'pending')
+            fields = AuditApplicationProjection.parse_fields(request)
             if status == 'all':
                 applications = AuditApplication.objects.all().order_by('-created_at')
             else:
                 applications = AuditApplication.objects.filter(status=status).order_by('-created_at')
 
-            applications_data = []
-
-            for app in applications:
-                applications_data.append({
-                    'id': app.id,
-                    'user_id': app.user.id,
-                    'username': app.user.username,
-                    'real_name': app.user.userprofile.real_name if hasattr(app.user, 'userprofile') else '',
-                    'audit_type': app.audit_type,
-                    'audit_type_display': app.get_audit_type_display(),
-                    'application_data': app.application_data,
-                    'status': app.status,
-                    'status_display': app.get_status_display(),
-                    'reject_reason': app.reject_reason,
-                    'created_at': app.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'reviewed_at': app.reviewed_at.strftime('%Y-%m-%d %H:%M:%S') if app.reviewed_at else None,
-                    'reviewer': app.reviewer.username if app.reviewer else None
-                })
+            applications_data = AuditApplicationProjection.render(
+                AuditApplicationProjection.project(applications, fields), fields
+            )
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': applications_data
-            })
+            return api_ok(applications_data, '获取成功')
+        except ValueError as e:
+            return api_error(400, str(e))
         except Exception as e:
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
     elif request.method == 'POST':
         try:
@@ -684,11 +339,7 @@ def audit_applications(request):
             application_data = data.get('application_data', {})
 
             if not user_id:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '缺少用户ID',
-                    'data': None
-                })
+                return api_error(400, '缺少用户ID')
 
             user = User.objects.get(id=user_id)
 
@@ -700,11 +351,7 @@ def audit_applications(request):
             ).first()
 
             if existing_application:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '您已提交过该类型的申请，请等待审核结果',
-                    'data': None
-                })
+                return api_error(400, '您已提交过该类型的申请，请等待审核结果')
 
             application = AuditApplication.objects.create(
                 user=user,
@@ -712,35 +359,15 @@ def audit_applications(request):
                 application_data=application_data
             )
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '申请提交成功',
-                'data': {'application_id': application.id}
-            })
+            return api_ok({'application_id': application.id}, '申请提交成功')
         except User.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '用户不存在',
-                'data': None
-            })
+            return api_error(404, '用户不存在')
         except json.JSONDecodeError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '不支持的请求方法',
-        'data': None
-    })
+    return api_error(400, '不支持的请求方法')
 
 
 @csrf_exempt
@@ -750,21 +377,13 @@ def approve_application(request, application_id):
     """审核通过 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     try:
         application = AuditApplication.objects.get(id=application_id)
 
         if application.status != 'pending':
-            return JsonResponse({
-                'code': 400,
-                'msg': '该申请已被处理',
-                'data': None
-            })
+            return api_error(400, '该申请已被处理')
 
         application.status = 'approved'
         application.reviewed_at = timezone.now()
@@ -799,23 +418,11 @@ def approve_application(request, application_id):
                 content='恭喜！您的骑手认证申请已通过审核，现在可以接单了。'
             )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '审核通过',
-            'data': None
-        })
+        return api_ok(msg='审核通过')
     except AuditApplication.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '申请不存在',
-            'data': None
-        })
+        return api_error(404, '申请不存在')
     except Exception as e:
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
@@ -825,11 +432,7 @@ def reject_application(request, application_id):
     """审核拒绝 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     try:
         data = json.loads(request.body)
@@ -838,11 +441,7 @@ def reject_application(request, application_id):
         application = AuditApplication.objects.get(id=application_id)
 
         if application.status != 'pending':
-            return JsonResponse({
-                'code': 400,
-                'msg': '该申请已被处理',
-                'data': None
-            })
+            return api_error(400, '该申请已被处理')
 
         application.status = 'rejected'
         application.reject_reason = reject_reason
@@ -858,29 +457,13 @@ def reject_application(request, application_id):
             content=f'您的{application.get_audit_type_display()}申请未通过审核。原因：{reject_reason}'
         )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '已拒绝申请',
-            'data': None
-        })
+        return api_ok(msg='已拒绝申请')
     except AuditApplication.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '申请不存在',
-            'data': None
-        })
+        return api_error(404, '申请不存在')
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 # 获取/保存骑手设置
@@ -891,19 +474,11 @@ def rider_settings(request):
     """骑手自动接单设置 - 需要登录"""
     # 检查用户是否是骑手
     try:
-        profile = UserProfile.objects.get(user=request.user)
+        profile = request.user.userprofile
         if not profile.is_rider:
-            return JsonResponse({
-                'code': 403,
-                'msg': '您还不是骑手，请先申请骑手认证',
-                'data': None
-            }, status=403)
+            return api_error(403, '您还不是骑手，请先申请骑手认证', status=403)
     except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户资料不存在',
-            'data': None
-        })
+        return api_error(404, '用户资料不存在')
 
     rider_setting, created = RiderSettings.objects.get_or_create(user=request.user)
 
@@ -962,19 +537,74 @@ def rider_settings(request):
             }
         }
 
-    return JsonResponse(response)
+    return api_json(response)
 
 
 # 获取订单分类列表
 @csrf_exempt
+@cache_public_response(ORDER_CATEGORIES)
 def order_categories(request):
     """获取订单分类列表"""
     categories = OrderCategory.objects.filter(is_active=True).values('id', 'name', 'code', 'description')
-    return JsonResponse({
-        'code': 200,
-        'msg': '成功',
-        'data': list(categories)
-    })
+    return api_ok(list(categories))
+
+
+def _grabbed_order_data(order):
+    """接单成功返回的订单信息"""
+    customer = order.user
+    return {
+        'order_id': order.id,
+        'order_no': order.order_no,
+        'category': order.category.name,
+        'price': float(order.price),
+        'customer': {
+            'id': customer.id,
+            'username': customer.username,
+            'phone': customer.userprofile.phone if hasattr(customer, 'userprofile') else ''
+        }
+    }
+
+
+def _parse_grab_options(request):
+    """
+    解析自动接单的请求体：表单按表单读取，其余按 JSON 解析（不论 Content-Type），
+    空请求体为单个接单
+
+    Returns:
+        tuple: (是否批量, 批量最多认领数，未指定时为 None)
+
+    Raises:
+        ValueError: 请求体不是 JSON 对象，或 count 不是正整数
+    """
+    if request.content_type in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        batch = request.POST.get('batch', '').lower() in ('1', 'true', 'on')
+        count = request.POST.get('count')
+    elif not request.body.strip():
+        return False, None
+    else:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('请求体必须是 JSON 对象')
+        batch = bool(data.get('batch'))
+        count = data.get('count')
+
+    if count in (None, ''):
+        return batch, None
+    if isinstance(count, bool) or isinstance(count, float) and not count.is_integer():
+        raise ValueError('count 必须是正整数')
+    try:
+        count = int(count)
+    except (TypeError, ValueError):
+        raise ValueError('count 必须是正整数')
+    if count < 1:
+        raise ValueError('count 必须是正整数')
+    return batch, count
+
+
+def _record_grabs(quota, records):
+    """把接单记录计入骑手配额（按订单去重，重复调用不重复计数）"""
+    for record in records:
+        quota.record_grab(record.user_id, record.order_id, record.grabbed_at)
 
 
 # 自动接单接口
@@ -982,22 +612,19 @@ def order_categories(request):
 @api_login_required
 @require_http_methods(["POST"])
 def auto_grab_order(request):
-    """骑手自动接单 - 需要登录"""
+    """
+    骑手自动接单 - 需要登录
+
+    请求体可选 {"batch": true, "count": N}：批量模式在一个事务中认领
+    剩余配额（每小时上限 - 1小时内已接）内的订单，最多 N 单
+    """
     # 检查用户是否是骑手
     try:
-        profile = UserProfile.objects.get(user=request.user)
+        profile = request.user.userprofile
         if not profile.is_rider:
-            return JsonResponse({
-                'code': 403,
-                'msg': '您还不是骑手，请先申请骑手认证',
-                'data': None
-            }, status=403)
+            return api_error(403, '您还不是骑手，请先申请骑手认证', status=403)
     except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户资料不存在',
-            'data': None
-        })
+        return api_error(404, '用户资料不存在')
 
     try:
         # 获取骑手设置
@@ -1005,106 +632,91 @@ def auto_grab_order(request):
 
         # 检查是否启用自动接单
         if not rider_setting.auto_grab_enabled:
-            return JsonResponse({'code': 400, 'msg': '未启用自动接单功能'})
+            return api_error(400, '未启用自动接单功能')
 
         # 检查是否设置了分类
         if not rider_setting.categories.exists():
-            return JsonResponse({'code': 400, 'msg': '请先设置可接订单分类'})
-
-        # 检查1小时内的接单数
-        one_hour_ago = datetime.now() - timedelta(hours=1)
-        recent_grabs = RiderGrabRecord.objects.filter(
-            user=request.user,
-            grabbed_at__gte=one_hour_ago
-        ).count()
-
-        # 统计未完成的订单数
-        incomplete_orders = RiderGrabRecord.objects.filter(
-            user=request.user,
-            completed=False,
-            grabbed_at__gte=one_hour_ago
-        ).count()
-
-        # 如果1小时内未完成的订单已达20单，则无法接单
-        if incomplete_orders >= 20:
-            return JsonResponse({
-                'code': 400,
-                'msg': '您1小时内已有20单未完成，请等待完成或1小时后再试'
-            })
-
-        # 如果1小时内已接订单数已达上限
-        if recent_grabs >= rider_setting.max_orders_per_hour:
-            return JsonResponse({
-                'code': 400,
-                'msg': f'您1小时内已接{recent_grabs}单，已达上限'
-            })
-
-        # 使用事务确保订单不会被多个骑手同时抢到
-        with transaction.atomic():
-            # 获取骑手可接的分类
-            category_ids = rider_setting.categories.values_list('id', flat=True)
-
-            # 随机选择一个分类（从骑手选中的分类中）
-            selected_category = random.choice(list(category_ids))
+            return api_error(400, '请先设置可接订单分类')
 
-            # 查找该分类下的待接订单（使用 select_for_update 锁定）
-            available_orders = Order.objects.select_for_update().filter(
-                category_id=selected_category,
-                status='pending'
-            ).order_by('created_at')[:5]  # 取前5个，增加随机性
-
-            if not available_orders:
-                return JsonResponse({'code': 404, 'msg': '当前暂无可接订单'})
-
-            # 随机选择一个订单
-            order_to_grab = random.choice(list(available_orders))
+        # 批量模式：一次认领剩余配额内的全部订单
+        try:
+            batch, limit = _parse_grab_options(request)
+        except ValueError:
+            return api_error(400, '请求数据格式错误')
 
-            # 双重检查，确保订单仍然是pending状态
-            if order_to_grab.status != 'pending':
-                return JsonResponse({'code': 400, 'msg': '订单已被他人接单'})
+        # 从派发引擎认领订单，被其他骑手锁住的订单直接跳过，不会互相阻塞
+        quota = get_rider_quota()
+        dispatcher = get_dispatcher()
+        claimed = []
+        try:
+            with transaction.atomic():
+                # 锁住骑手设置，同一骑手的接单请求和配额对账串行执行：
+                # 锁内读到的配额计数包含之前所有已提交的接单，并发的批量请求不能合计超过每小时上限
+                rider_setting = RiderSettings.objects.select_for_update().get(pk=rider_setting.pk)
+                usage = quota.usage(request.user.id)
+
+                # 如果1小时内未完成的订单已达20单，则无法接单
+                if usage['incomplete'] >= quota.MAX_INCOMPLETE_ORDERS:
+                    return api_error(400, '您1小时内已有20单未完成，请等待完成或1小时后再试')
+
+                # 如果1小时内已接订单数已达上限
+                if usage['recent_grabs'] >= rider_setting.max_orders_per_hour:
+                    return api_error(400, f"您1小时内已接{usage['recent_grabs']}单，已达上限")
+
+                count = 1
+                if batch:
+                    count = min(
+                        rider_setting.max_orders_per_hour - usage['recent_grabs'],
+                        quota.MAX_INCOMPLETE_ORDERS - usage['incomplete'],
+                        limit or quota.MAX_INCOMPLETE_ORDERS
+                    )
 
-            # 接单
-            order_to_grab.rider = request.user
-            order_to_grab.status = 'accepted'
-            order_to_grab.accepted_at = datetime.now()
-            order_to_grab.save()
+                category_ids = rider_setting.categories.values_list('id', flat=True)
+                claimed = dispatcher.claim(request.user, category_ids, count=count)
 
-            # 记录接单
-            RiderGrabRecord.objects.create(
-                user=request.user,
-                order=order_to_grab
-            )
+                if not claimed:
+                    return api_error(404, '当前暂无可接订单')
 
-            # 发送通知给下单用户
-            Notification.objects.create(
-                user=order_to_grab.customer,
-                notification_type='order',
-                title='订单已被接单',
-                content=f'您的订单{order_to_grab.order_no}已被骑手接单，骑手将很快与您联系。'
-            )
+                # 记录接单
+                records = RiderGrabRecord.objects.bulk_create([
+                    RiderGrabRecord(user=request.user, order=order) for order in claimed
+                ])
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '接单成功',
-            'data': {
-                'order_id': order_to_grab.id,
-                'order_no': order_to_grab.order_no,
-                'category': order_to_grab.category.name,
-                'price': float(order_to_grab.price),
-                'customer': {
-                    'id': order_to_grab.customer.id,
-                    'username': order_to_grab.customer.username,
-                    'phone': order_to_grab.customer.userprofile.phone if hasattr(order_to_grab.customer,
-                                                                                 'userprofile') else ''
-                }
-            }
-        })
+                # 发送通知给下单用户
+                Notification.objects.bulk_create([
+                    Notification(
+                        user=order.user,
+                        notification_type='order',
+                        title='订单已被接单',
+                        content=f'您的订单{order.order_no}已被骑手接单，骑手将很快与您联系。'
+                    )
+                    for order in claimed
+                ])
+                add_unread_notifications([order.user_id for order in claimed])
+
+                # bulk_create 不触发信号：在锁内直接计入配额（预占），
+                # 下一个拿到锁的请求不必等本请求的提交回调
+                _record_grabs(quota, records)
+        except Exception:
+            # 事务已回滚，认领的订单仍是待接状态，放回派发队列；预占的配额按数据库重建
+            dispatcher.requeue(claimed)
+            if claimed:
+                quota.reconcile(request.user.id)
+            raise
+
+        if batch:
+            return api_ok({
+                'count': len(claimed),
+                'orders': [_grabbed_order_data(order) for order in claimed]
+            }, f'接单成功，共{len(claimed)}单')
+
+        return api_ok(_grabbed_order_data(claimed[0]), '接单成功')
 
     except RiderSettings.DoesNotExist:
-        return JsonResponse({'code': 404, 'msg': '请先配置骑手设置'})
+        return api_error(404, '请先配置骑手设置')
     except Exception as e:
         logger.error(f'自动接单失败: {str(e)}')
-        return JsonResponse({'code': 500, 'msg': f'接单失败: {str(e)}'})
+        return api_error(500, f'接单失败: {str(e)}')
 
 
 # 获取骑手接单统计
@@ -1114,52 +726,22 @@ def rider_grab_stats(request):
     """获取骑手接单统计 - 需要登录"""
     # 检查用户是否是骑手
     try:
-        profile = UserProfile.objects.get(user=request.user)
+        profile = request.user.userprofile
         if not profile.is_rider:
-            return JsonResponse({
-                'code': 403,
-                'msg': '您还不是骑手，请先申请骑手认证',
-                'data': None
-            }, status=403)
+            return api_error(403, '您还不是骑手，请先申请骑手认证', status=403)
     except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户资料不存在',
-            'data': None
-        })
-
-    one_hour_ago = datetime.now() - timedelta(hours=1)
-
-    # 1小时内接单总数
-    total_grabs = RiderGrabRecord.objects.filter(
-        user=request.user,
-        grabbed_at__gte=one_hour_ago
-    ).count()
-
-    # 未完成订单数
-    incomplete_count = RiderGrabRecord.objects.filter(
-        user=request.user,
-        completed=False,
-        grabbed_at__gte=one_hour_ago
-    ).count()
-
-    # 今日总接单数
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_grabs = RiderGrabRecord.objects.filter(
-        user=request.user,
-        grabbed_at__gte=today_start
-    ).count()
-
-    return JsonResponse({
-        'code': 200,
-        'msg': '成功',
-        'data': {
-            'total_grabs': total_grabs,
-            'incomplete_count': incomplete_count,
-            'today_grabs': today_grabs,
-            'can_grab': incomplete_count < 20,
-            'max_orders': 20
-        }
+        return api_error(404, '用户资料不存在')
+
+    # 1小时内接单总数、未完成订单数、今日总接单数
+    quota = get_rider_quota()
+    usage = quota.usage(request.user.id)
+
+    return api_ok({
+        'total_grabs': usage['recent_grabs'],
+        'incomplete_count': usage['incomplete'],
+        'today_grabs': usage['today_grabs'],
+        'can_grab': usage['incomplete'] < quota.MAX_INCOMPLETE_ORDERS,
+        'max_orders': quota.MAX_INCOMPLETE_ORDERS
     })
 
 
@@ -1177,11 +759,7 @@ def user_profile_detail(request, user_id=None):
 
                 # 检查权限：只能查看自己的信息或管理员可以查看所有
                 if target_user.id != request.user.id and not request.user.is_staff:
-                    return JsonResponse({
-                        'code': 403,
-                        'msg': '权限不足',
-                        'data': None
-                    }, status=403)
+                    return api_error(403, '权限不足', status=403)
 
             # 获取客户端信息用于日志记录
             meta = request.META
@@ -1193,52 +771,34 @@ def user_profile_detail(request, user_id=None):
 
             profile_obj, created = UserProfile.objects.get_or_create(user=target_user)
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': {
-                    'id': target_user.id,
-                    'username': target_user.username,
-                    'email': target_user.email,
-                    'phone': profile_obj.phone,
-                    'real_name': profile_obj.real_name,
-                    'student_id': profile_obj.student_id,
-                    'is_verified': profile_obj.is_verified,
-                    'credit_score': profile_obj.credit_score,
-                    'is_blacklisted': profile_obj.is_blacklisted,
-                    'blacklist_reason': profile_obj.blacklist_reason,
-                    'blacklist_until': profile_obj.blacklist_until.strftime(
-                        '%Y-%m-%d %H:%M:%S') if profile_obj.blacklist_until else None,
-                    'avatar_url': profile_obj.avatar_url,
-                    'gender': profile_obj.gender,
-                    'school': profile_obj.school,
-                    'college': profile_obj.college,
-                    'major': profile_obj.major,
-                    'is_rider': profile_obj.is_rider,
-                    'created_at': target_user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-                    'last_login': profile_obj.last_login_time.strftime(
-                        '%Y-%m-%d %H:%M:%S') if profile_obj.last_login_time else None
-                }
-            })
+            return api_ok({
+                'id': target_user.id,
+                'username': target_user.username,
+                'email': target_user.email,
+                'phone': profile_obj.phone,
+                'real_name': profile_obj.real_name,
+                'student_id': profile_obj.student_id,
+                'is_verified': profile_obj.is_verified,
+                'credit_score': profile_obj.credit_score,
+                'is_blacklisted': profile_obj.is_blacklisted,
+                'blacklist_reason': profile_obj.blacklist_reason,
+                'blacklist_until': profile_obj.blacklist_until,
+                'avatar_url': profile_obj.avatar_url,
+                'gender': profile_obj.gender,
+                'school': profile_obj.school,
+                'college': profile_obj.college,
+                'major': profile_obj.major,
+                'is_rider': profile_obj.is_rider,
+                'created_at': target_user.date_joined,
+                'last_login': profile_obj.last_login_time
+            }, '获取成功')
         except User.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '用户不存在',
-                'data': None
-            })
+            return api_error(404, '用户不存在')
         except Exception as e:
             logger.error(f'获取用户资料失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用GET请求',
-        'data': None
-    })
+    return api_error(400, '请使用GET请求')
 
 
 @csrf_exempt
@@ -1254,22 +814,14 @@ def submit_real_name_auth(request):
             id_card_back = data.get('id_card_back', '')
 
             if not all([real_name, student_id]):
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '缺少必填字段',
-                    'data': None
-                })
+                return api_error(400, '缺少必填字段')
 
             user = request.user
             profile_obj, created = UserProfile.objects.get_or_create(user=user)
 
             # 检查是否已通过实名认证
             if profile_obj.is_verified:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '您已完成实名认证',
-                    'data': None
-                })
+                return api_error(400, '您已完成实名认证')
 
             # 检查是否已有待审核的实名认证申请
             pending_application = AuditApplication.objects.filter(
@@ -1279,11 +831,7 @@ def submit_real_name_auth(request):
             ).first()
 
             if pending_application:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '您已提交过实名认证申请，请等待审核结果',
-                    'data': None
-                })
+                return api_error(400, '您已提交过实名认证申请，请等待审核结果')
 
             # 更新用户资料（不立即生效，等待审核）
             profile_obj.real_name = real_name
@@ -1302,42 +850,23 @@ def submit_real_name_auth(request):
                 }
             )
 
-            # 发送通知给管理员
-            admin_users = User.objects.filter(is_staff=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    notification_type='system',
-                    title='新的实名认证申请',
-                    content=f'用户{user.username}提交了实名认证申请，请及时审核。'
-                )
+            # 通知管理员（写入发件箱，由后台批量发送）
+            notify_admins(
+                'system',
+                '新的实名认证申请',
+                f'用户{user.username}提交了实名认证申请，请及时审核。'
+            )
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '实名认证申请已提交，请等待审核',
-                'data': {
-                    'application_id': application.id
-                }
-            })
+            return api_ok({
+                'application_id': application.id
+            }, '实名认证申请已提交，请等待审核')
         except json.JSONDecodeError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
             logger.error(f'提交实名认证失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
 
 
 @csrf_exempt
@@ -1351,11 +880,7 @@ def bind_phone(request):
             verify_code = data.get('verify_code', '')
 
             if not phone:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '请填写手机号',
-                    'data': None
-                })
+                return api_error(400, '请填写手机号')
 
             # 在实际项目中，这里需要验证短信验证码
             # if not verify_phone_code(phone, verify_code):
@@ -1370,39 +895,19 @@ def bind_phone(request):
 
             # 检查手机号是否已被其他用户绑定
             if UserProfile.objects.filter(phone=phone).exclude(user=user).exists():
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '该手机号已被其他用户绑定',
-                    'data': None
-                })
+                return api_error(400, '该手机号已被其他用户绑定')
 
             profile_obj.phone = phone
             profile_obj.save()
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '手机号绑定成功',
-                'data': None
-            })
+            return api_ok(msg='手机号绑定成功')
         except json.JSONDecodeError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
             logger.error(f'绑定手机号失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
 
 
 # ===== 钱包相关API =====
@@ -1412,11 +917,7 @@ def bind_phone(request):
 def wallet_info(request):
     """获取钱包信息 - 需要登录"""
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         user = request.user
@@ -1424,27 +925,19 @@ def wallet_info(request):
         # 获取或创建钱包
         wallet, created = Wallet.objects.get_or_create(user=user)
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'user_id': user.id,
-                'username': user.username,
-                'balance': str(wallet.balance),
-                'frozen_balance': str(wallet.frozen_balance),
-                'total_income': str(wallet.total_income),
-                'total_expenditure': str(wallet.total_expenditure),
-                'created_at': wallet.created_at.strftime('%Y-%m-%d %H:%M:%S') if wallet.created_at else None
-            }
-        })
+        return api_ok({
+            'user_id': user.id,
+            'username': user.username,
+            'balance': str(wallet.balance),
+            'frozen_balance': str(wallet.frozen_balance),
+            'total_income': str(wallet.total_income),
+            'total_expenditure': str(wallet.total_expenditure),
+            'created_at': wallet.created_at
+        }, '获取成功')
 
     except Exception as e:
         logger.error(f'获取钱包信息失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
@@ -1452,11 +945,7 @@ def wallet_info(request):
 def wallet_withdraw(request):
     """提现申请 - 需要登录"""
     if request.method != 'POST':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用POST请求',
-            'data': None
-        })
+        return api_error(400, '请使用POST请求')
 
     try:
         data = json.loads(request.body)
@@ -1465,45 +954,25 @@ def wallet_withdraw(request):
         account_info = data.get('account_info', {})
 
         if not amount:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请输入提现金额',
-                'data': None
-            })
+            return api_error(400, '请输入提现金额')
 
         try:
             amount_float = float(amount)
             if amount_float <= 0:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '提现金额必须大于0',
-                    'data': None
-                })
+                return api_error(400, '提现金额必须大于0')
         except ValueError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '金额格式错误',
-                'data': None
-            })
+            return api_error(400, '金额格式错误')
 
         user = request.user
         wallet = Wallet.objects.get(user=user)
 
         # 检查余额
         if wallet.balance < amount_float:
-            return JsonResponse({
-                'code': 400,
-                'msg': '余额不足',
-                'data': None
-            })
+            return api_error(400, '余额不足')
 
         # 检查最小提现金额（示例：10元）
         if amount_float < 10:
-            return JsonResponse({
-                'code': 400,
-                'msg': '最小提现金额为10元',
-                'data': None
-            })
+            return api_error(400, '最小提现金额为10元')
 
         # 创建提现交易记录
         transaction = Transaction.objects.create(
@@ -1523,57 +992,38 @@ def wallet_withdraw(request):
         wallet.frozen_balance += amount_float
         wallet.save()
 
-        # 发送通知给管理员
-        admin_users = User.objects.filter(is_staff=True)
-        for admin in admin_users:
-            Notification.objects.create(
-                user=admin,
-                notification_type='system',
-                title='新的提现申请',
-                content=f'用户{user.username}申请提现{amount_float}元，请及时处理。'
-            )
+        # 通知管理员（写入发件箱，由后台批量发送）
+        notify_admins(
+            'system',
+            '新的提现申请',
+            f'用户{user.username}申请提现{amount_float}元，请及时处理。'
+        )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '提现申请已提交，等待审核',
-            'data': {
-                'transaction_id': transaction.id,
-                'amount': str(amount_float),
-                'status': 'pending'
-            }
-        })
+        return api_ok({
+            'transaction_id': transaction.id,
+            'amount': str(amount_float),
+            'status': 'pending'
+        }, '提现申请已提交，等待审核')
 
     except Wallet.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '钱包不存在',
-            'data': None
-        })
+        return api_error(404, '钱包不存在')
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
         logger.error(f'提现申请失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
 @api_login_required
 def wallet_transactions(request):
-    """获取交易记录 - 需要登录"""
+    """
+    获取交易记录 - 需要登录
+
+    带 cursor 参数时按 (created_at, id) 游标分页，总数按 count 参数可选
+    """
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         user = request.user
@@ -1582,6 +1032,7 @@ def wallet_transactions(request):
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('page_size', 20))
         transaction_type = request.GET.get('type', '')
+        fields = TransactionProjection.parse_fields(request)
 
         # 获取交易记录
         wallet = Wallet.objects.get(user=user)
@@ -1591,51 +1042,30 @@ def wallet_transactions(request):
         if transaction_type:
             transactions_qs = transactions_qs.filter(transaction_type=transaction_type)
 
-        # 排序和分页
-        total = transactions_qs.count()
-        transactions_qs = transactions_qs.order_by('-created_at')
-        offset = (page - 1) * page_size
-        transactions = transactions_qs[offset:offset + page_size]
-
-        transactions_data = []
-        for trans in transactions:
-            transactions_data.append({
-                'id': trans.id,
-                'transaction_type': trans.transaction_type,
-                'transaction_type_display': trans.get_transaction_type_display(),
-                'amount': str(trans.amount),
-                'status': trans.status,
-                'status_display': trans.get_status_display(),
-                'description': trans.description,
-                'metadata': trans.metadata,
-                'created_at': trans.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'completed_at': trans.completed_at.strftime('%Y-%m-%d %H:%M:%S') if trans.completed_at else None
-            })
+        # 排序和分页（只查询输出需要的列）
+        if wants_cursor(request):
+            transactions, pagination = paginate_by_cursor(
+                request, TransactionProjection.project(transactions_qs, fields, ('-created_at', '-id'))
+            )
+        else:
+            total = transactions_qs.count()
+            transactions_qs = TransactionProjection.project(transactions_qs, fields).order_by('-created_at')
+            offset = (page - 1) * page_size
+            transactions = transactions_qs[offset:offset + page_size]
+            pagination = {'total': total, 'page': page, 'page_size': page_size}
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'transactions': transactions_data,
-                'total': total,
-                'page': page,
-                'page_size': page_size
-            }
-        })
+        return api_ok({
+            'transactions': TransactionProjection.render(transactions, fields),
+            **pagination
+        }, '获取成功')
 
     except Wallet.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '钱包不存在',
-            'data': None
-        })
+        return api_error(404, '钱包不存在')
+    except ValueError as e:
+        return api_error(400, str(e))
     except Exception as e:
         logger.error(f'获取交易记录失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 # ===== 通知相关API =====
@@ -1643,13 +1073,13 @@ def wallet_transactions(request):
 @csrf_exempt
 @api_login_required
 def notification_list(request):
-    """获取用户通知列表 - 需要登录"""
+    """
+    获取用户通知列表 - 需要登录
+
+    带 cursor 参数时按 (created_at, id) 游标分页，总数按 count 参数可选
+    """
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         user = request.user
@@ -1659,6 +1089,7 @@ def notification_list(request):
         page_size = int(request.GET.get('page_size', 20))
         unread_only = request.GET.get('unread_only', 'false').lower() == 'true'
         notification_type = request.GET.get('type', '')
+        fields = NotificationProjection.parse_fields(request)
 
         # 获取通知列表
         notification_qs = Notification.objects.filter(user=user)
@@ -1669,48 +1100,32 @@ def notification_list(request):
         if notification_type:
             notification_qs = notification_qs.filter(notification_type=notification_type)
 
-        # 排序和分页
-        total = notification_qs.count()
-        notification_qs = notification_qs.order_by('-created_at')
-        offset = (page - 1) * page_size
-        notifications = notification_qs[offset:offset + page_size]
-
-        notifications_data = []
-        for notif in notifications:
-            notifications_data.append({
-                'id': notif.id,
-                'notification_type': notif.notification_type,
-                'notification_type_display': notif.get_notification_type_display(),
-                'title': notif.title,
-                'content': notif.content,
-                'is_read': notif.is_read,
-                'metadata': notif.metadata,
-                'created_at': notif.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'read_at': notif.read_at.strftime('%Y-%m-%d %H:%M:%S') if notif.read_at else None
-            })
+        # 排序和分页（只查询输出需要的列）
+        if wants_cursor(request):
+            notifications, pagination = paginate_by_cursor(
+                request, NotificationProjection.project(notification_qs, fields, ('-created_at', '-id'))
+            )
+        else:
+            total = notification_qs.count()
+            notification_qs = NotificationProjection.project(notification_qs, fields).order_by('-created_at')
+            offset = (page - 1) * page_size
+            notifications = notification_qs[offset:offset + page_size]
+            pagination = {'total': total, 'page': page, 'page_size': page_size}
 
-        # 获取未读通知数量
-        unread_count = Notification.objects.filter(user=user, is_read=False).count()
+        # 获取未读通知数量（计数表主键查找）
+        unread_count = get_user_counters(user.id).unread_notifications
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'notifications': notifications_data,
-                'total': total,
-                'unread_count': unread_count,
-                'page': page,
-                'page_size': page_size
-            }
-        })
+        return api_ok({
+            'notifications': NotificationProjection.render(notifications, fields),
+            'unread_count': unread_count,
+            **pagination
+        }, '获取成功')
 
+    except ValueError as e:
+        return api_error(400, str(e))
     except Exception as e:
         logger.error(f'获取通知列表失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
@@ -1722,43 +1137,29 @@ def notification_mark_read(request, notification_id=None):
             if notification_id:
                 # 标记单个通知为已读
                 notification = Notification.objects.get(id=notification_id, user=request.user)
-                notification.is_read = True
-                notification.read_at = timezone.now()
-                notification.save()
+                marked = Notification.objects.filter(id=notification.id, is_read=False).update(
+                    is_read=True,
+                    read_at=timezone.now()
+                )
                 message = '标记成功'
             else:
                 # 标记所有通知为已读
-                Notification.objects.filter(user=request.user, is_read=False).update(
+                marked = Notification.objects.filter(user=request.user, is_read=False).update(
                     is_read=True,
                     read_at=timezone.now()
                 )
                 message = '全部标记为已读成功'
+            add_unread_notifications([request.user.id], -marked)
 
-            return JsonResponse({
-                'code': 200,
-                'msg': message,
-                'data': None
-            })
+            return api_ok(msg=message)
 
         except Notification.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'msg': '通知不存在',
-                'data': None
-            })
+            return api_error(404, '通知不存在')
         except Exception as e:
             logger.error(f'标记通知失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
 
 
 # ===== 消息相关API =====
@@ -1766,90 +1167,97 @@ def notification_mark_read(request, notification_id=None):
 @csrf_exempt
 @api_login_required
 def conversation_list(request):
-    """获取用户会话列表 - 需要登录"""
+    """
+    获取用户会话列表 - 需要登录
+
+    其他参与者及其资料一次预取，查询次数与会话数量无关；
+    unread_count 为当前用户在该会话中的未读数（ConversationMember）。
+    传 page_size 或 cursor 时按 last_message_time 游标分页，
+    返回 {'conversations', 'next_cursor'}；否则返回全部会话列表
+    """
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         user = request.user
 
-        # 获取用户参与的所有会话
-        conversation_qs = Conversation.objects.filter(participants=user).order_by('-last_message_time')
+        # 获取用户参与的所有会话，其他参与者连同资料一起预取
+        conversation_qs = Conversation.objects.filter(members__user=user).annotate(
+            my_unread_count=F('members__unread_count')
+        ).prefetch_related(
+            Prefetch(
+                'participants',
+                queryset=User.objects.exclude(id=user.id).select_related('userprofile'),
+                to_attr='other_participants'
+            )
+        )
+
+        paginate = 'page_size' in request.GET or 'cursor' in request.GET
+        next_cursor = None
+        if paginate:
+            paginator = CursorPaginator(
+                conversation_qs,
+                ordering=('-last_message_time', '-id'),
+                page_size=request.GET.get('page_size', 20)
+            )
+            conversations, next_cursor = paginator.page(request.GET.get('cursor'))
+        else:
+            conversations = conversation_qs.order_by('-last_message_time', '-id')
 
         conversations_data = []
-        for conv in conversation_qs:
-            # 获取会话中的其他参与者
-            other_participants = conv.participants.exclude(id=user.id)
+        for conv in conversations:
             participants_data = []
-
-            for participant in other_participants:
-                try:
-                    profile = UserProfile.objects.get(user=participant)
-                    participants_data.append({
-                        'id': participant.id,
-                        'username': participant.username,
-                        'real_name': profile.real_name,
-                        'avatar_url': profile.avatar_url,
-                        'is_online': profile.is_online
-                    })
-                except UserProfile.DoesNotExist:
-                    participants_data.append({
-                        'id': participant.id,
-                        'username': participant.username,
-                        'real_name': '',
-                        'avatar_url': '',
-                        'is_online': False
-                    })
+            for participant in conv.other_participants:
+                profile = getattr(participant, 'userprofile', None)
+                participants_data.append({
+                    'id': participant.id,
+                    'username': participant.username,
+                    'real_name': profile.real_name if profile else '',
+                    'avatar_url': profile.avatar_url if profile else '',
+                    'is_online': profile.is_online if profile else False
+                })
 
             conversations_data.append({
                 'id': conv.id,
                 'participants': participants_data,
                 'last_message': conv.last_message,
-                'last_message_time': conv.last_message_time.strftime(
-                    '%Y-%m-%d %H:%M:%S') if conv.last_message_time else None,
-                'unread_count': conv.unread_count,
-                'created_at': conv.created_at.strftime('%Y-%m-%d %H:%M:%S') if conv.created_at else None
+                'last_message_time': conv.last_message_time,
+                'unread_count': conv.my_unread_count,
+                'created_at': conv.created_at
             })
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': conversations_data
-        })
+        return api_ok({
+            'conversations': conversations_data,
+            'next_cursor': next_cursor
+        } if paginate else conversations_data, '获取成功')
 
+    except ValueError as e:
+        return api_error(400, str(e))
     except Exception as e:
         logger.error(f'获取会话列表失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
 @api_login_required
 def message_list(request, conversation_id):
-    """获取会话中的消息列表 - 需要登录"""
+    """
+    获取会话中的消息列表 - 需要登录
+
+    推进当前用户的已读水位（ConversationMember.last_read_message_id）到本页最新的消息，
+    已读状态按水位计算，不逐条更新消息；发送者及其资料一并查询。
+    带 cursor 参数时按 (created_at, id) 游标向更早的消息翻页，总数按 count 参数可选
+    """
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         # 检查用户是否在会话中
         conversation = Conversation.objects.get(id=conversation_id)
-        if request.user not in conversation.participants.all():
-            return JsonResponse({
-                'code': 403,
-                'msg': '无权访问该会话',
-                'data': None
-            }, status=403)
+        members = list(ConversationMember.objects.filter(conversation=conversation))
+        member = next((m for m in members if m.user_id == request.user.id), None)
+        if member is None:
+            return api_error(403, '无权访问该会话', status=403)
 
         # 分页参数
         page = int(request.GET.get('page', 1))
@@ -1859,164 +1267,149 @@ def message_list(request, conversation_id):
         message_qs = Message.objects.filter(conversation=conversation)
 
         # 排序和分页
-        total = message_qs.count()
-        message_qs = message_qs.order_by('-created_at')
-        offset = (page - 1) * page_size
-        messages = message_qs[offset:offset + page_size]
+        message_qs = message_qs.select_related('sender__userprofile')
+        if wants_cursor(request):
+            messages, pagination = paginate_by_cursor(request, message_qs, default_page_size=50)
+        else:
+            total = message_qs.count()
+            offset = (page - 1) * page_size
+            messages = list(message_qs.order_by('-created_at')[offset:offset + page_size])
+            pagination = {'total': total, 'page': page, 'page_size': page_size}
+
+        # 推进已读水位（只前进不后退），未读数重算为水位之后他人发送的消息数；
+        # 已读状态只看水位，不再逐条更新 Message.is_read
+        my_read_id = member.last_read_message_id
+        if messages:
+            newest_id = max(msg.id for msg in messages)
+            if newest_id > member.last_read_message_id:
+                with transaction.atomic():
+                    # 先锁成员行再计数：并发 send_message 的 F('unread_count') + 1
+                    # 要么已提交并计入 remaining，要么等本事务提交后再累加，不会被覆盖
+                    locked = ConversationMember.objects.select_for_update().get(id=member.id)
+                    if newest_id > locked.last_read_message_id:
+                        remaining = Message.objects.filter(
+                            conversation=conversation,
+                            id__gt=newest_id
+                        ).exclude(sender=request.user).count()
+                        ConversationMember.objects.filter(id=member.id).update(
+                            last_read_message_id=newest_id,
+                            unread_count=remaining
+                        )
+                        add_unread_messages([request.user.id], remaining - locked.unread_count)
+                my_read_id = max(newest_id, locked.last_read_message_id)
+
+        # 他人发送的消息按自己的水位判断已读；自己发送的消息：任一其他参与者的水位已越过即为已读
+        # （Message.is_read 只保留迁移前的历史状态）
+        others_read_id = max((m.last_read_message_id for m in members if m.user_id != request.user.id), default=0)
 
         messages_data = []
         for msg in messages:
-            # 标记自己发送的消息为已读
-            if msg.sender != request.user and not msg.is_read:
-                msg.is_read = True
-                msg.save()
-
             messages_data.append({
                 'id': msg.id,
-                'sender_id': msg.sender.id,
+                'sender_id': msg.sender_id,
                 'sender_name': msg.sender.username,
                 'sender_avatar': msg.sender.userprofile.avatar_url if hasattr(msg.sender, 'userprofile') else '',
                 'content': msg.content,
                 'message_type': msg.message_type,
-                'is_read': msg.is_read,
+                'is_read': msg.is_read or msg.id <= (others_read_id if msg.sender_id == request.user.id else my_read_id),
                 'metadata': msg.metadata,
-                'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'created_at': msg.created_at
             })
 
         # 反转列表，使最新的消息在最后
         messages_data.reverse()
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'messages': messages_data,
-                'total': total,
-                'page': page,
-                'page_size': page_size,
-                'conversation_id': conversation_id
-            }
-        })
+        return api_ok({
+            'messages': messages_data,
+            'conversation_id': conversation_id,
+            **pagination
+        }, '获取成功')
 
     except Conversation.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '会话不存在',
-            'data': None
-        })
+        return api_error(404, '会话不存在')
+    except ValueError as e:
+        return api_error(400, str(e))
     except Exception as e:
         logger.error(f'获取消息列表失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_public_response(ANNOUNCEMENTS, timeout=announcement_service.response_cache_timeout)
 def announcement_list(request):
-    """获取公告列表"""
+    """
+    获取公告列表（只返回当前时间窗口内生效的公告，从缓存的生效集合读取）
+
+    带 cursor 参数时按 (priority, created_at, id) 游标分页，总数按 count 参数可选
+    """
     try:
         # 分页参数
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('page_size', 10))
         announcement_type = request.GET.get('type', '')
-
-        # 只获取生效中的公告
-        announcements_qs = Announcement.objects.filter(is_active=True)
-
-        # 按类型筛选
-        if announcement_type:
-            announcements_qs = announcements_qs.filter(announcement_type=announcement_type)
-
-        # 排序和分页
-        total = announcements_qs.count()
-        announcements_qs = announcements_qs.order_by('-priority', '-created_at')
-        offset = (page - 1) * page_size
-        announcements = announcements_qs[offset:offset + page_size]
-
-        announcements_data = []
-        for announcement in announcements:
-            announcements_data.append({
-                'id': announcement.id,
-                'announcement_type': announcement.announcement_type,
-                'announcement_type_display': announcement.get_announcement_type_display(),
-                'title': announcement.title,
-                'content': announcement.content,
-                'priority': announcement.priority,
-                'cover_image': announcement.cover_image,
-                'is_active': announcement.is_active,
-                'created_at': announcement.created_at.strftime('%Y-%m-%d %H:%M'),
-                'updated_at': announcement.updated_at.strftime('%Y-%m-%d %H:%M') if announcement.updated_at else None,
-            })
-
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'announcements': announcements_data,
-                'total': total,
-                'page': page,
-                'page_size': page_size
-            }
-        })
+        fields = AnnouncementProjection.parse_fields(request)
+
+        announcements = announcement_service.get_active_announcements(announcement_type)
+
+        # 分页
+        if wants_cursor(request):
+            announcements, pagination = paginate_list_by_cursor(
+                request,
+                announcements,
+                Announcement,
+                ordering=announcement_service.ORDERING,
+                default_page_size=10
+            )
+        else:
+            total = len(announcements)
+            offset = max(page - 1, 0) * page_size
+            announcements = announcements[offset:offset + page_size]
+            pagination = {'total': total, 'page': page, 'page_size': page_size}
+
+        return api_ok({
+            'announcements': AnnouncementProjection.render(announcements, fields),
+            **pagination
+        }, '获取成功')
+    except ValueError as e:
+        return api_error(400, str(e))
     except Exception as e:
         logger.error(f'获取公告列表失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
+
+
+BY_TYPE_FIELDS = [
+    'id', 'announcement_type', 'announcement_type_display', 'title', 'content', 'priority', 'cover_image', 'created_at'
+]
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_public_response(ANNOUNCEMENTS, timeout=announcement_service.response_cache_timeout)
 def announcement_by_type(request, announcement_type):
     """根据类型获取公告"""
     try:
-        # 获取指定类型且生效中的公告，按优先级和创建时间排序
-        announcements = Announcement.objects.filter(
-            announcement_type=announcement_type,
-            is_active=True
-        ).order_by('-priority', '-created_at')
-
-        if announcements.exists():
-            announcement = announcements.first()
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': {
-                    'id': announcement.id,
-                    'announcement_type': announcement.announcement_type,
-                    'announcement_type_display': announcement.get_announcement_type_display(),
-                    'title': announcement.title,
-                    'content': announcement.content,
-                    'priority': announcement.priority,
-                    'cover_image': announcement.cover_image,
-                    'created_at': announcement.created_at.strftime('%Y-%m-%d %H:%M'),
-                }
-            })
+        # 指定类型当前生效的公告中优先级最高、最新的一条
+        announcements = announcement_service.get_active_announcements(announcement_type)
+
+        if announcements:
+            return api_ok(AnnouncementProjection.render(announcements[:1], BY_TYPE_FIELDS)[0], '获取成功')
         else:
-            return JsonResponse({
-                'code': 404,
-                'msg': '暂无公告内容',
-                'data': None
-            })
+            return api_error(404, '暂无公告内容')
     except Exception as e:
         logger.error(f'获取公告失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'服务器错误: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
 @api_login_required
 @require_http_methods(["GET", "POST"])
 def user_feedback(request):
-    """用户反馈管理 - 需要登录"""
+    """
+    用户反馈管理 - 需要登录
+
+    GET 带 cursor 参数时按 (created_at, id) 游标分页，总数按 count 参数可选
+    """
     if request.method == 'GET':
         try:
             user = request.user
@@ -2033,6 +1426,7 @@ def user_feedback(request):
             page_size = int(request.GET.get('page_size', 10))
             status = request.GET.get('status', '')
             feedback_type = request.GET.get('type', '')
+            fields = FeedbackProjection.parse_fields(request)
 
             # 筛选
             if status:
@@ -2040,48 +1434,30 @@ def user_feedback(request):
             if feedback_type:
                 feedbacks_qs = feedbacks_qs.filter(feedback_type=feedback_type)
 
-            # 排序和分页
-            total = feedbacks_qs.count()
-            feedbacks_qs = feedbacks_qs.order_by('-created_at')
-            offset = (page - 1) * page_size
-            feedbacks = feedbacks_qs[offset:offset + page_size]
-
-            feedbacks_data = []
-            for feedback in feedbacks:
-                feedbacks_data.append({
-                    'id': feedback.id,
-                    'user_id': feedback.user.id if feedback.user else None,
-                    'username': feedback.user.username if feedback.user else '匿名',
-                    'feedback_type': feedback.feedback_type,
-                    'feedback_type_display': feedback.get_feedback_type_display(),
-                    'title': feedback.title,
-                    'content': feedback.content,
-                    'status': feedback.status,
-                    'status_display': feedback.get_status_display(),
-                    'reply': feedback.reply,
-                    'contact': feedback.contact,
-                    'created_at': feedback.created_at.strftime('%Y-%m-%d %H:%M'),
-                    'updated_at': feedback.updated_at.strftime('%Y-%m-%d %H:%M') if feedback.updated_at else None,
-                })
-
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': {
-                    'feedbacks': feedbacks_data,
-                    'total': total,
-                    'page': page,
-                    'page_size': page_size,
-                    'is_admin': is_admin
-                }
-            })
+            # 排序和分页（只查询输出需要的列）
+            if wants_cursor(request):
+                feedbacks, pagination = paginate_by_cursor(
+                    request,
+                    FeedbackProjection.project(feedbacks_qs, fields, ('-created_at', '-id')),
+                    default_page_size=10
+                )
+            else:
+                total = feedbacks_qs.count()
+                feedbacks_qs = FeedbackProjection.project(feedbacks_qs, fields).order_by('-created_at')
+                offset = (page - 1) * page_size
+                feedbacks = feedbacks_qs[offset:offset + page_size]
+                pagination = {'total': total, 'page': page, 'page_size': page_size}
+
+            return api_ok({
+                'feedbacks': FeedbackProjection.render(feedbacks, fields),
+                'is_admin': is_admin,
+                **pagination
+            }, '获取成功')
+        except ValueError as e:
+            return api_error(400, str(e), data=[])
         except Exception as e:
             logger.error(f'获取反馈列表失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'获取失败: {str(e)}',
-                'data': []
-            })
+            return api_error(500, f'获取失败: {str(e)}', data=[])
 
     elif request.method == 'POST':
         try:
@@ -2097,11 +1473,7 @@ def user_feedback(request):
             ).count()
 
             if recent_feedbacks >= 5:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '提交过于频繁，请稍后再试',
-                    'data': None
-                })
+                return api_error(400, '提交过于频繁，请稍后再试')
 
             feedback = UserFeedback.objects.create(
                 user=user,
@@ -2111,34 +1483,19 @@ def user_feedback(request):
                 contact=data.get('contact', '')
             )
 
-            # 发送通知给管理员
-            admin_users = User.objects.filter(is_staff=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    notification_type='system',
-                    title='新的用户反馈',
-                    content=f'用户{user.username}提交了反馈：{feedback.title}，请及时处理。'
-                )
+            # 通知管理员（写入发件箱，由后台批量发送）
+            notify_admins(
+                'system',
+                '新的用户反馈',
+                f'用户{user.username}提交了反馈：{feedback.title}，请及时处理。'
+            )
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '提交成功',
-                'data': {'feedback_id': feedback.id}
-            })
+            return api_ok({'feedback_id': feedback.id}, '提交成功')
         except Exception as e:
             logger.error(f'提交反馈失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'提交失败: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'提交失败: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '不支持的请求方法',
-        'data': None
-    })
+    return api_error(400, '不支持的请求方法')
 
 
 @csrf_exempt
@@ -2154,37 +1511,29 @@ def feedback_detail(request, feedback_id):
         is_admin = user.is_staff
 
         if feedback.user != user and not is_admin:
-            return JsonResponse({
-                'code': 403,
-                'msg': '无权访问该反馈',
-                'data': None
-            }, status=403)
+            return api_error(403, '无权访问该反馈', status=403)
 
         if request.method == 'GET':
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': {
-                    'id': feedback.id,
-                    'user_id': feedback.user.id if feedback.user else None,
-                    'username': feedback.user.username if feedback.user else '匿名',
-                    'user_avatar': feedback.user.userprofile.avatar_url if feedback.user and hasattr(feedback.user,
-                                                                                                     'userprofile') else '',
-                    'feedback_type': feedback.feedback_type,
-                    'feedback_type_display': feedback.get_feedback_type_display(),
-                    'title': feedback.title,
-                    'content': feedback.content,
-                    'contact': feedback.contact,
-                    'status': feedback.status,
-                    'status_display': feedback.get_status_display(),
-                    'reply': feedback.reply,
-                    'admin_reply': feedback.admin_reply,
-                    'created_at': feedback.created_at.strftime('%Y-%m-%d %H:%M'),
-                    'updated_at': feedback.updated_at.strftime('%Y-%m-%d %H:%M') if feedback.updated_at else None,
-                    'is_owner': feedback.user == user,
-                    'can_reply': is_admin
-                }
-            })
+            return api_ok({
+                'id': feedback.id,
+                'user_id': feedback.user.id if feedback.user else None,
+                'username': feedback.user.username if feedback.user else '匿名',
+                'user_avatar': feedback.user.userprofile.avatar_url if feedback.user and hasattr(feedback.user,
+                                                                                                 'userprofile') else '',
+                'feedback_type': feedback.feedback_type,
+                'feedback_type_display': feedback.get_feedback_type_display(),
+                'title': feedback.title,
+                'content': feedback.content,
+                'contact': feedback.contact,
+                'status': feedback.status,
+                'status_display': feedback.get_status_display(),
+                'reply': feedback.reply,
+                'admin_reply': feedback.admin_reply,
+                'created_at': feedback.created_at,
+                'updated_at': feedback.updated_at,
+                'is_owner': feedback.user == user,
+                'can_reply': is_admin
+            }, '获取成功')
 
         elif request.method == 'PUT':
             data = json.loads(request.body)
@@ -2211,11 +1560,7 @@ def feedback_detail(request, feedback_id):
             else:
                 # 普通用户只能更新自己的反馈内容
                 if feedback.user != user:
-                    return JsonResponse({
-                        'code': 403,
-                        'msg': '无权修改该反馈',
-                        'data': None
-                    }, status=403)
+                    return api_error(403, '无权修改该反馈', status=403)
 
                 if 'content' in data:
                     feedback.content = data['content']
@@ -2224,48 +1569,24 @@ def feedback_detail(request, feedback_id):
 
             feedback.save()
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '更新成功',
-                'data': None
-            })
+            return api_ok(msg='更新成功')
 
         elif request.method == 'DELETE':
             # 只有管理员或反馈所有者可以删除
             if not is_admin and feedback.user != user:
-                return JsonResponse({
-                    'code': 403,
-                    'msg': '无权删除该反馈',
-                    'data': None
-                }, status=403)
+                return api_error(403, '无权删除该反馈', status=403)
 
             feedback.delete()
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '删除成功',
-                'data': None
-            })
+            return api_ok(msg='删除成功')
 
     except UserFeedback.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '反馈不存在',
-            'data': None
-        })
+        return api_error(404, '反馈不存在')
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
         logger.error(f'处理反馈失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'操作失败: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'操作失败: {str(e)}')
 
 
 @csrf_exempt
@@ -2285,29 +1606,43 @@ def user_logout(request):
             except UserProfile.DoesNotExist:
                 pass
 
-            # 在实际项目中，这里可能还需要：
-            # 1. 使token失效
-            # 2. 清除session
-            # 3. 记录操作日志
+            # 吊销当前访问令牌（及客户端提交的刷新令牌）
+            revoke_token(request.token)
+            try:
+                refresh_token = json.loads(request.body or '{}').get('refresh_token')
+            except (json.JSONDecodeError, AttributeError):
+                refresh_token = None
+            if refresh_token:
+                revoke_token(refresh_token, 'refresh')
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '退出成功',
-                'data': None
-            })
+            return api_ok(msg='退出成功')
         except Exception as e:
             logger.error(f'退出登录失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def refresh_token(request):
+    """使用刷新令牌换取新的访问令牌"""
+    try:
+        data = json.loads(request.body)
+        tokens = TokenManager.refresh_access_token(data.get('refresh_token', ''))
+
+        if not tokens:
+            return api_error(401, '登录已过期，请重新登录', status=401)
+
+        return api_ok({
+            'token': tokens['access_token'],
+            **tokens
+        }, '刷新成功')
+    except json.JSONDecodeError:
+        return api_error(400, '请求数据格式错误')
+    except Exception as e:
+        logger.error(f'刷新令牌失败: {str(e)}')
+        return api_error(500, f'服务器错误: {str(e)}')
 
 
 @csrf_exempt
@@ -2333,37 +1668,41 @@ def user_login_log(request):
             except UserProfile.DoesNotExist:
                 logger.warning(f'用户资料不存在: {user.id}')
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '记录成功',
-                'data': None
-            })
+            return api_ok(msg='记录成功')
         except Exception as e:
             logger.error(f'记录访问日志失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 200,
-        'msg': '记录成功',
-        'data': None
-    })
+    return api_ok(msg='记录成功')
+
+
+def _order_count_subquery(field):
+    """按外层用户统计订单数的相关子查询（field 为 user 或 rider）"""
+    return Coalesce(Subquery(
+        Order.objects.filter(**{field: OuterRef('user_id')}).order_by()
+        .values(field).annotate(total=Count('id')).values('total')[:1]
+    ), 0)
+
+
+def _with_order_counts(profiles):
+    return profiles.annotate(
+        order_count=_order_count_subquery('user'),
+        rider_order_count=_order_count_subquery('rider')
+    )
 
 
 @csrf_exempt
 @api_login_required
 def get_user_list(request):
-    """获取用户列表（管理员） - 需要管理员权限"""
+    """
+    获取用户列表（管理员） - 需要管理员权限
+
+    按 id 倒序；带 cursor 参数时游标分页，总数按 count 参数可选。
+    下单数和接单数以相关子查询随用户一起查出，每页查询次数固定
+    """
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     if request.method == 'GET':
         try:
@@ -2400,18 +1739,18 @@ def get_user_list(request):
             elif is_blacklisted == 'false':
                 query = query.filter(is_blacklisted=False)
 
-            # 分页
-            total = query.count()
-            offset = (page - 1) * page_size
-            user_list = query[offset:offset + page_size]
+            # 分页（总数在加子查询之前统计）
+            if wants_cursor(request):
+                user_list, pagination = paginate_by_cursor(request, _with_order_counts(query), ordering=('-id',))
+            else:
+                total = query.count()
+                offset = (page - 1) * page_size
+                user_list = _with_order_counts(query).order_by('-id')[offset:offset + page_size]
+                pagination = {'total': total, 'page': page, 'page_size': page_size}
 
             # 构建返回数据
             users = []
             for profile in user_list:
-                # 统计用户的订单数（作为示例）
-                order_count = Order.objects.filter(customer=profile.user).count()
-                rider_order_count = Order.objects.filter(rider=profile.user).count()
-
                 users.append({
                     'id': profile.user.id,
                     'username': profile.user.username,
@@ -2422,36 +1761,23 @@ def get_user_list(request):
                     'credit_score': profile.credit_score,
                     'is_blacklisted': profile.is_blacklisted,
                     'is_rider': profile.is_rider,
-                    'last_login': profile.last_login_time.strftime(
-                        '%Y-%m-%d %H:%M:%S') if profile.last_login_time else '',
-                    'created_at': profile.user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-                    'order_count': order_count,
-                    'rider_order_count': rider_order_count
+                    'last_login': profile.last_login_time or '',
+                    'created_at': profile.user.date_joined,
+                    'order_count': profile.order_count,
+                    'rider_order_count': profile.rider_order_count
                 })
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': {
-                    'users': users,
-                    'total': total,
-                    'page': page,
-                    'page_size': page_size
-                }
-            })
+            return api_ok({
+                'users': users,
+                **pagination
+            }, '获取成功')
+        except ValueError as e:
+            return api_error(400, str(e))
         except Exception as e:
             logger.error(f'获取用户列表失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用GET请求',
-        'data': None
-    })
+    return api_error(400, '请使用GET请求')
 
 
 @csrf_exempt
@@ -2477,43 +1803,24 @@ def simple_login(request):
                 }
             )
 
-            # 生成token
-            token_str = f"{user.id}_{int(time.time())}_{username}"
-            token = hashlib.md5(token_str.encode()).hexdigest()
+            # 生成JWT令牌
+            tokens = TokenManager.generate_tokens(user.id)
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '登录成功（测试）',
-                'data': {
-                    'user': {
-                        'id': user.id,
-                        'username': user.username,
-                        'nickname': profile.real_name,
-                        'phone': profile.phone
-                    },
-                    'token': token
-                }
-            })
+            return api_ok({
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'nickname': profile.real_name,
+                    'phone': profile.phone
+                },
+                'token': tokens['access_token'],
+                **tokens
+            }, '登录成功（测试）')
         except Exception as e:
             logger.error(f'简单登录失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'登录失败: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'登录失败: {str(e)}')
 
-    return JsonResponse({
-        'code': 200,
-        'msg': '登录成功（测试）',
-        'data': {
-            'user': {
-                'id': 1,
-                'username': 'test_user',
-                'nickname': '测试用户'
-            },
-            'token': 'test_token_simple_login'
-        }
-    })
+    return api_error(400, '请使用POST请求')
 
 
 @csrf_exempt
@@ -2526,29 +1833,17 @@ def upload_avatar(request):
             avatar_file = request.FILES.get('avatar')
 
             if not avatar_file:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '请选择要上传的头像文件',
-                    'data': None
-                })
+                return api_error(400, '请选择要上传的头像文件')
 
             # 验证文件类型
             allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
             if avatar_file.content_type not in allowed_types:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '只支持 JPG、PNG、GIF、WEBP 格式的图片',
-                    'data': None
-                })
+                return api_error(400, '只支持 JPG、PNG、GIF、WEBP 格式的图片')
 
             # 验证文件大小（最大 2MB）
             max_size = 2 * 1024 * 1024
             if avatar_file.size > max_size:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '图片大小不能超过 2MB',
-                    'data': None
-                })
+                return api_error(400, '图片大小不能超过 2MB')
 
             # 创建存储目录
             avatar_dir = os.path.join(settings.MEDIA_ROOT, 'avatars')
@@ -2566,11 +1861,7 @@ def upload_avatar(request):
                         destination.write(chunk)
             except Exception as e:
                 logger.error(f'保存头像文件失败: {str(e)}')
-                return JsonResponse({
-                    'code': 500,
-                    'msg': f'保存文件失败: {str(e)}',
-                    'data': None
-                })
+                return api_error(500, f'保存文件失败: {str(e)}')
 
             # 生成URL
             avatar_url = f"{settings.MEDIA_URL}avatars/{filename}"
@@ -2594,27 +1885,15 @@ def upload_avatar(request):
 
             logger.info(f'用户头像上传成功: user_id={user.id}, avatar_url={avatar_url}')
 
-            return JsonResponse({
-                'code': 200,
-                'msg': '上传成功',
-                'data': {
-                    'avatar_url': avatar_url
-                }
-            })
+            return api_ok({
+                'avatar_url': avatar_url
+            }, '上传成功')
 
         except Exception as e:
             logger.error(f'头像上传失败: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'上传失败: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'上传失败: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
 
 
 # 发送消息接口
@@ -2631,31 +1910,19 @@ def send_message(request):
         message_type = data.get('message_type', 'text')
 
         if not content:
-            return JsonResponse({
-                'code': 400,
-                'msg': '消息内容不能为空',
-                'data': None
-            })
+            return api_error(400, '消息内容不能为空')
 
         sender = request.user
 
         if conversation_id:
             # 发送到现有会话
             conversation = Conversation.objects.get(id=conversation_id)
-            if sender not in conversation.participants.all():
-                return JsonResponse({
-                    'code': 403,
-                    'msg': '您不在该会话中',
-                    'data': None
-                }, status=403)
+            if not ConversationMember.objects.filter(conversation=conversation, user=sender).exists():
+                return api_error(403, '您不在该会话中', status=403)
         else:
             # 创建新会话
             if not recipient_id:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '缺少收件人ID',
-                    'data': None
-                })
+                return api_error(400, '缺少收件人ID')
 
             recipient = User.objects.get(id=recipient_id)
 
@@ -2677,63 +1944,42 @@ def send_message(request):
             message_type=message_type
         )
 
-        # 更新会话的最后消息信息
-        conversation.last_message = content[:100]  # 只保存前100个字符
-        conversation.last_message_time = timezone.now()
-
-        # 为所有参与者（除了发送者）增加未读计数
-        for participant in conversation.participants.all():
-            if participant != sender:
-                conversation.unread_count += 1
+        # 更新会话的最后消息信息，其他成员未读数原子加一
+        conversation.update_last_message(content, sender)
 
-        conversation.save()
+        # 发送者的已读水位移到自己这条消息
+        ConversationMember.objects.filter(
+            conversation=conversation,
+            user=sender,
+            last_read_message_id__lt=message.id
+        ).update(last_read_message_id=message.id)
 
         # 发送通知给其他参与者
-        for participant in conversation.participants.all():
-            if participant != sender:
-                Notification.objects.create(
-                    user=participant,
-                    notification_type='message',
-                    title='新消息',
-                    content=f'{sender.username}给您发送了新消息'
-                )
+        recipient_ids = conversation.members.exclude(user=sender).values_list('user_id', flat=True)
+        for recipient_id in recipient_ids:
+            Notification.objects.create(
+                user_id=recipient_id,
+                notification_type='message',
+                title='新消息',
+                content=f'{sender.username}给您发送了新消息'
+            )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '发送成功',
-            'data': {
-                'message_id': message.id,
-                'conversation_id': conversation.id,
-                'content': content,
-                'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            }
-        })
+        return api_ok({
+            'message_id': message.id,
+            'conversation_id': conversation.id,
+            'content': content,
+            'created_at': message.created_at
+        }, '发送成功')
 
     except Conversation.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '会话不存在',
-            'data': None
-        })
+        return api_error(404, '会话不存在')
     except User.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户不存在',
-            'data': None
-        })
+        return api_error(404, '用户不存在')
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
         logger.error(f'发送消息失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'发送失败: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'发送失败: {str(e)}')
 
 
 # 申请成为骑手
@@ -2750,11 +1996,7 @@ def apply_rider(request):
         # 检查是否已经是骑手
         profile, created = UserProfile.objects.get_or_create(user=user)
         if profile.is_rider:
-            return JsonResponse({
-                'code': 400,
-                'msg': '您已经是骑手了',
-                'data': None
-            })
+            return api_error(400, '您已经是骑手了')
 
         # 检查是否已经提交过骑手申请
         pending_application = AuditApplication.objects.filter(
@@ -2764,19 +2006,11 @@ def apply_rider(request):
         ).first()
 
         if pending_application:
-            return JsonResponse({
-                'code': 400,
-                'msg': '您已提交过骑手申请，请等待审核结果',
-                'data': None
-            })
+            return api_error(400, '您已提交过骑手申请，请等待审核结果')
 
         # 检查是否已通过实名认证
         if not profile.is_verified:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请先完成实名认证才能申请成为骑手',
-                'data': None
-            })
+            return api_error(400, '请先完成实名认证才能申请成为骑手')
 
         # 创建骑手申请
         application = AuditApplication.objects.create(
@@ -2790,123 +2024,73 @@ def apply_rider(request):
             }
         )
 
-        # 发送通知给管理员
-        admin_users = User.objects.filter(is_staff=True)
-        for admin in admin_users:
-            Notification.objects.create(
-                user=admin,
-                notification_type='system',
-                title='新的骑手申请',
-                content=f'用户{user.username}申请成为骑手，请及时审核。'
-            )
+        # 通知管理员（写入发件箱，由后台批量发送）
+        notify_admins(
+            'system',
+            '新的骑手申请',
+            f'用户{user.username}申请成为骑手，请及时审核。'
+        )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '骑手申请已提交，请等待审核',
-            'data': {
-                'application_id': application.id
-            }
-        })
+        return api_ok({
+            'application_id': application.id
+        }, '骑手申请已提交，请等待审核')
 
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
         logger.error(f'申请成为骑手失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'申请失败: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'申请失败: {str(e)}')
 
 
 # 获取系统统计数据（管理员）
 @csrf_exempt
 @api_login_required
 def system_stats(request):
-    """获取系统统计数据 - 需要管理员权限"""
+    """
+    获取系统统计数据 - 需要管理员权限
+
+    数据来自增量维护的统计表（dashboard_stats），带缓存，最多滞后约半分钟
+    """
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
-        # 用户统计
-        total_users = User.objects.count()
-        verified_users = UserProfile.objects.filter(is_verified=True).count()
-        riders = UserProfile.objects.filter(is_rider=True).count()
-        blacklisted_users = UserProfile.objects.filter(is_blacklisted=True).count()
-
-        # 今日新增用户
-        today = timezone.now().date()
-        today_users = User.objects.filter(date_joined__date=today).count()
+        return api_ok(get_dashboard_stats(), '获取成功')
 
-        # 订单统计
-        total_orders = Order.objects.count()
-        pending_orders = Order.objects.filter(status='pending').count()
-        completed_orders = Order.objects.filter(status='completed').count()
+    except Exception as e:
+        logger.error(f'获取系统统计失败: {str(e)}')
+        return api_error(500, f'获取失败: {str(e)}')
 
-        # 今日订单统计
-        today_orders = Order.objects.filter(created_at__date=today).count()
-        today_completed_orders = Order.objects.filter(status='completed', completed_at__date=today).count()
 
-        # 反馈统计
-        pending_feedbacks = UserFeedback.objects.filter(status='pending').count()
+# 微信接口调用统计（管理员）
+@csrf_exempt
+@api_login_required
+@require_http_methods(["GET"])
+def wechat_client_metrics(request):
+    """微信接口耗时直方图和熔断器状态 - 需要管理员权限"""
+    if not request.user.is_staff:
+        return api_error(403, '权限不足', status=403)
 
-        # 审核申请统计
-        pending_applications = AuditApplication.objects.filter(status='pending').count()
+    return api_ok(get_wechat_client().metrics(), '获取成功')
 
-        # 钱包统计
-        total_balance = Wallet.objects.aggregate(total=Sum('balance'))['total'] or 0
-        total_frozen = Wallet.objects.aggregate(total=Sum('frozen_balance'))['total'] or 0
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': {
-                'user_stats': {
-                    'total': total_users,
-                    'verified': verified_users,
-                    'riders': riders,
-                    'blacklisted': blacklisted_users,
-                    'today_new': today_users
-                },
-                'order_stats': {
-                    'total': total_orders,
-                    'pending': pending_orders,
-                    'completed': completed_orders,
-                    'today_total': today_orders,
-                    'today_completed': today_completed_orders
-                },
-                'system_stats': {
-                    'pending_feedbacks': pending_feedbacks,
-                    'pending_applications': pending_applications,
-                    'total_balance': float(total_balance),
-                    'total_frozen': float(total_frozen)
-                }
-            }
-        })
+# 缓存命中统计（管理员）
+@csrf_exempt
+@api_login_required
+@require_http_methods(["GET"])
+def cache_metrics(request):
+    """当前进程的缓存命中率（两级缓存后端才有统计） - 需要管理员权限"""
+    if not request.user.is_staff:
+        return api_error(403, '权限不足', status=403)
 
-    except Exception as e:
-        logger.error(f'获取系统统计失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'获取失败: {str(e)}',
-            'data': None
-        })
+    stats = getattr(cache, 'stats', None)
+    if stats is None:
+        return api_ok({'backend': settings.CACHES['default']['BACKEND'], 'stats': None}, '当前缓存后端不提供统计')
+    return api_ok({'backend': settings.CACHES['default']['BACKEND'], 'stats': stats()}, '获取成功')
 
 
 # 清除黑名单
@@ -2917,22 +2101,14 @@ def remove_from_blacklist(request, user_id):
     """将用户从黑名单移除 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     try:
         user = User.objects.get(id=user_id)
         profile = UserProfile.objects.get(user=user)
 
         if not profile.is_blacklisted:
-            return JsonResponse({
-                'code': 400,
-                'msg': '用户不在黑名单中',
-                'data': None
-            })
+            return api_error(400, '用户不在黑名单中')
 
         # 更新用户资料
         profile.is_blacklisted = False
@@ -2960,31 +2136,15 @@ def remove_from_blacklist(request, user_id):
             content='您已被从黑名单中移除，现在可以正常使用平台功能了。'
         )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '用户已从黑名单中移除',
-            'data': None
-        })
+        return api_ok(msg='用户已从黑名单中移除')
 
     except User.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户不存在',
-            'data': None
-        })
+        return api_error(404, '用户不存在')
     except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户资料不存在',
-            'data': None
-        })
+        return api_error(404, '用户资料不存在')
     except Exception as e:
         logger.error(f'移除黑名单失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'移除失败: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'移除失败: {str(e)}')
 
 
 # 修改用户信用分
@@ -2995,11 +2155,7 @@ def update_credit_score(request, user_id):
     """修改用户信用分 - 需要管理员权限"""
     # 检查管理员权限
     if not request.user.is_staff:
-        return JsonResponse({
-            'code': 403,
-            'msg': '权限不足',
-            'data': None
-        }, status=403)
+        return api_error(403, '权限不足', status=403)
 
     try:
         data = json.loads(request.body)
@@ -3007,26 +2163,14 @@ def update_credit_score(request, user_id):
         reason = data.get('reason', '管理员调整')
 
         if score is None:
-            return JsonResponse({
-                'code': 400,
-                'msg': '请输入信用分',
-                'data': None
-            })
+            return api_error(400, '请输入信用分')
 
         try:
             score_int = int(score)
             if score_int < 0 or score_int > 100:
-                return JsonResponse({
-                    'code': 400,
-                    'msg': '信用分必须在0-100之间',
-                    'data': None
-                })
+                return api_error(400, '信用分必须在0-100之间')
         except ValueError:
-            return JsonResponse({
-                'code': 400,
-                'msg': '信用分必须是整数',
-                'data': None
-            })
+            return api_error(400, '信用分必须是整数')
 
         user = User.objects.get(id=user_id)
         profile = UserProfile.objects.get(user=user)
@@ -3056,42 +2200,22 @@ def update_credit_score(request, user_id):
             content=content
         )
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '信用分更新成功',
-            'data': {
-                'user_id': user.id,
-                'username': user.username,
-                'old_score': old_score,
-                'new_score': score_int
-            }
-        })
+        return api_ok({
+            'user_id': user.id,
+            'username': user.username,
+            'old_score': old_score,
+            'new_score': score_int
+        }, '信用分更新成功')
 
     except User.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户不存在',
-            'data': None
-        })
+        return api_error(404, '用户不存在')
     except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'code': 404,
-            'msg': '用户资料不存在',
-            'data': None
-        })
+        return api_error(404, '用户资料不存在')
     except json.JSONDecodeError:
-        return JsonResponse({
-            'code': 400,
-            'msg': '请求数据格式错误',
-            'data': None
-        })
+        return api_error(400, '请求数据格式错误')
     except Exception as e:
         logger.error(f'更新信用分失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'更新失败: {str(e)}',
-            'data': None
-        })
+        return api_error(500, f'更新失败: {str(e)}')
 
 
 # 查询用户状态
@@ -3100,11 +2224,7 @@ def update_credit_score(request, user_id):
 def check_user_status(request):
     """查询用户状态 - 需要登录"""
     if request.method != 'GET':
-        return JsonResponse({
-            'code': 400,
-            'msg': '请使用GET请求',
-            'data': None
-        })
+        return api_error(400, '请使用GET请求')
 
     try:
         user = request.user
@@ -3119,41 +2239,25 @@ def check_user_status(request):
         # 检查钱包状态
         wallet, created = Wallet.objects.get_or_create(user=user)
 
-        # 检查未读通知数量
-        unread_notifications = Notification.objects.filter(user=user, is_read=False).count()
-
-        # 检查未读消息数量
-        user_conversations = Conversation.objects.filter(participants=user)
-        total_unread_messages = 0
-        for conv in user_conversations:
-            # 统计当前用户在该会话中未读的消息（其他人发送的）
-            total_unread_messages += Message.objects.filter(
-                conversation=conv,
-                is_read=False
-            ).exclude(sender=user).count()  # 排除自己发送的消息
-
-        return JsonResponse({
-            'code': 200,
-            'msg': '查询成功',
-            'data': {
-                'user_id': user.id,
-                'username': user.username,
-                'is_verified': profile.is_verified,
-                'is_rider': profile.is_rider,
-                'is_blacklisted': profile.is_blacklisted,
-                'credit_score': profile.credit_score,
-                'balance': float(wallet.balance),
-                'pending_applications': list(pending_applications),
-                'unread_notifications': unread_notifications,
-                'unread_messages': total_unread_messages,
-                'has_warnings': profile.is_blacklisted or profile.credit_score < 60
-            }
-        })
+        # 未读通知和未读消息数量（计数表主键查找）
+        counters = get_user_counters(user.id)
+        unread_notifications = counters.unread_notifications
+        total_unread_messages = counters.unread_messages
+
+        return api_ok({
+            'user_id': user.id,
+            'username': user.username,
+            'is_verified': profile.is_verified,
+            'is_rider': profile.is_rider,
+            'is_blacklisted': profile.is_blacklisted,
+            'credit_score': profile.credit_score,
+            'balance': float(wallet.balance),
+            'pending_applications': list(pending_applications),
+            'unread_notifications': unread_notifications,
+            'unread_messages': total_unread_messages,
+            'has_warnings': profile.is_blacklisted or profile.credit_score < 60
+        }, '查询成功')
 
     except Exception as e:
         logger.error(f'查询用户状态失败: {str(e)}')
-        return JsonResponse({
-            'code': 500,
-            'msg': f'查询失败: {str(e)}',
-            'data': None
-        })
\ No newline at end of file
+        return api_error(500, f'查询失败: {str(e)}')
\ No newline at end of file
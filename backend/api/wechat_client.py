@@ -0,0 +1,262 @@
+# backend/api/wechat_client.py
+import bisect
+import random
+import threading
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WechatAPIError(Exception):
+    """微信接口返回错误"""
+
+    def __init__(self, errcode, errmsg=''):
+        self.errcode = errcode
+        self.errmsg = errmsg
+        super().__init__(f"{errcode}: {errmsg}")
+
+
+class WechatClientError(Exception):
+    """请求微信接口失败（网络错误、超时、5xx）"""
+
+
+class CircuitOpenError(WechatClientError):
+    """熔断器打开，暂停请求微信接口"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，冷却时间内直接拒绝请求；
+    冷却结束后进入半开状态，放行一个试探请求，成功则关闭
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"微信接口熔断器打开，连续失败 {self.failures} 次")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """按接口统计的请求耗时直方图（秒）"""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f'le_{bound}': count for bound, count in zip(self.BUCKETS, self.counts)}
+            buckets['le_inf'] = self.counts[-1]
+            return {
+                'count': self.total,
+                'errors': self.errors,
+                'avg_ms': round(self.sum / self.total * 1000, 2) if self.total else 0,
+                'buckets': buckets,
+            }
+
+
+class WechatClient:
+    """
+    微信接口HTTP客户端
+
+    - 每个进程共享一个 requests.Session，连接池复用 TLS 连接
+    - 按接口设置超时
+    - 有限次数的重试，指数退避加随机抖动
+    - 熔断器，微信接口持续故障时快速失败
+    - 按接口统计耗时直方图
+    """
+
+    DEFAULT_BASE_URL = 'https://api.weixin.qq.com'
+
+    # 连接池配置
+    POOL_CONNECTIONS = 4
+    POOL_MAXSIZE = 32
+
+    # 按接口的超时时间 (连接超时, 读取超时)
+    DEFAULT_TIMEOUT = (3, 10)
+    ENDPOINT_TIMEOUTS = {
+        'jscode2session': (2, 5),
+        'token': (2, 5),
+        'getuserphonenumber': (2, 5),
+    }
+
+    # 重试配置
+    MAX_RETRIES = 2
+    BACKOFF_BASE = 0.1  # 秒
+    BACKOFF_MAX = 1.0
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=self.POOL_MAXSIZE,
+            max_retries=0
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+        self.breaker = CircuitBreaker()
+        self.histograms = {}
+        self._histograms_lock = threading.Lock()
+
+    def _histogram(self, endpoint):
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            with self._histograms_lock:
+                histogram = self.histograms.setdefault(endpoint, LatencyHistogram())
+        return histogram
+
+    def request(self, method, endpoint, path, idempotent=True, **kwargs):
+        """
+        请求微信接口并返回JSON
+
+        Args:
+            method: HTTP方法
+            endpoint: 接口名（用于超时配置和统计）
+            path: 接口路径
+            idempotent: 是否幂等；非幂等请求只在连接失败（请求未发出）时重试
+
+        Returns:
+            dict: 响应JSON
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            WechatClientError: 重试后仍然失败
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError('微信接口暂时不可用，请稍后重试')
+
+        kwargs.setdefault('timeout', self.ENDPOINT_TIMEOUTS.get(endpoint, self.DEFAULT_TIMEOUT))
+        url = f"{self.base_url}{path}"
+        histogram = self._histogram(endpoint)
+        last_error = None
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            if attempt:
+                # 指数退避 + 全抖动
+                time.sleep(random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt)))
+
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code >= 500:
+                    raise WechatClientError(f"HTTP {response.status_code}")
+                data = response.json()
+            except (requests.RequestException, WechatClientError, ValueError) as e:
+                histogram.observe(time.monotonic() - start, error=True)
+                last_error = e
+                logger.warning(f"请求微信接口 {endpoint} 失败（第{attempt + 1}次）: {e}")
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable:
+                    break
+                continue
+
+            histogram.observe(time.monotonic() - start)
+            self.breaker.record_success()
+            return data
+
+        self.breaker.record_failure()
+        raise WechatClientError(f"请求微信接口失败: {last_error}")
+
+    def jscode2session(self, appid, appsecret, js_code):
+        """wx.login() 的 code 换取 openid/session_key"""
+        return self.request('GET', 'jscode2session', '/sns/jscode2session', params={
+            'appid': appid,
+            'secret': appsecret,
+            'js_code': js_code,
+            'grant_type': 'authorization_code',
+        })
+
+    def fetch_access_token(self, appid, appsecret):
+        """获取接口调用凭证 access_token"""
+        return self.request('GET', 'token', '/cgi-bin/token', params={
+            'grant_type': 'client_credential',
+            'appid': appid,
+            'secret': appsecret,
+        })
+
+    def get_user_phone_number(self, access_token, phone_code):
+        """手机号授权码换取手机号（code 一次有效，不做读超时重试）"""
+        return self.request(
+            'POST', 'getuserphonenumber', '/wxa/business/getuserphonenumber',
+            idempotent=False,
+            params={'access_token': access_token},
+            json={'code': phone_code}
+        )
+
+    def metrics(self):
+        """耗时直方图和熔断器状态"""
+        return {
+            'circuit_state': self.breaker.state,
+            'endpoints': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_wechat_client(base_url=None):
+    """获取进程内共享的客户端（按 base_url 区分）"""
+    if base_url is None:
+        base_url = getattr(settings, 'WECHAT_MINIPROGRAM', {}).get('API_BASE_URL')
+    base_url = (base_url or WechatClient.DEFAULT_BASE_URL).rstrip('/')
+
+    client = _clients.get(base_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(base_url)
+            if client is None:
+                client = _clients[base_url] = WechatClient(base_url)
+    return client
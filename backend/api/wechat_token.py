@@ -0,0 +1,121 @@
+# backend/api/wechat_token.py
+import threading
+import time
+import logging
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from .wechat_client import WechatAPIError, get_wechat_client
+
+logger = logging.getLogger(__name__)
+
+# access_token 无效或已过期的错误码
+WECHAT_TOKEN_EXPIRED_ERRCODES = (40001, 42001)
+
+
+class WechatAccessTokenProvider:
+    """
+    微信接口调用凭证（access_token）提供者
+
+    - access_token 缓存在 Django cache 中，所有 worker 共享
+    - 在 expires_in 到期前提前刷新
+    - 单飞刷新：同一时刻只有一个 worker 请求微信接口，其他 worker 等待结果
+    """
+
+    DEFAULT_BASE_URL = 'https://api.weixin.qq.com'
+    REFRESH_AHEAD_SECONDS = 300  # 提前5分钟刷新
+    LOCK_TIMEOUT = 10  # 刷新锁超时时间（秒）
+    WAIT_INTERVAL = 0.05  # 等待其他 worker 刷新的轮询间隔（秒）
+
+    def __init__(self, appid, appsecret, base_url=None, cache=None):
+        self.appid = appid
+        self.appsecret = appsecret
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip('/')
+        self.client = get_wechat_client(self.base_url)
+        self.cache = cache or default_cache
+        self.cache_key = f"wechat:access_token:{appid}"
+        self.lock_key = f"{self.cache_key}:lock"
+        self._local_lock = threading.Lock()
+
+    def get_token(self):
+        """
+        获取 access_token，缓存未命中时刷新
+
+        Returns:
+            str: access_token
+
+        Raises:
+            WechatAPIError: 微信接口返回错误
+        """
+        token = self.cache.get(self.cache_key)
+        if token:
+            return token
+
+        # 同进程内的线程先排队，避免重复抢分布式锁
+        with self._local_lock:
+            token = self.cache.get(self.cache_key)
+            if token:
+                return token
+            return self._refresh_single_flight()
+
+    def invalidate(self, token=None):
+        """
+        使缓存的 access_token 失效（如微信返回 40001/42001）
+
+        Args:
+            token: 调用方使用的旧 token，仅当缓存中仍是该值时才清除
+        """
+        if token is None or self.cache.get(self.cache_key) == token:
+            self.cache.delete(self.cache_key)
+
+    def _refresh_single_flight(self):
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while True:
+            # cache.add 是原子操作，只有一个 worker 能拿到刷新锁
+            if self.cache.add(self.lock_key, 1, self.LOCK_TIMEOUT):
+                try:
+                    return self._fetch_and_store()
+                finally:
+                    self.cache.delete(self.lock_key)
+
+            # 其他 worker 正在刷新，等待其结果
+            time.sleep(self.WAIT_INTERVAL)
+            token = self.cache.get(self.cache_key)
+            if token:
+                return token
+            if time.monotonic() >= deadline:
+                logger.warning("等待 access_token 刷新超时，直接请求微信接口")
+                return self._fetch_and_store()
+
+    def _fetch_and_store(self):
+        data = self.client.fetch_access_token(self.appid, self.appsecret)
+
+        if 'errcode' in data and data['errcode'] != 0:
+            logger.error(f"获取微信access_token失败: {data}")
+            raise WechatAPIError(data.get('errcode'), data.get('errmsg', ''))
+
+        token = data['access_token']
+        expires_in = int(data.get('expires_in', 7200))
+        ttl = max(expires_in - self.REFRESH_AHEAD_SECONDS, expires_in // 2)
+        self.cache.set(self.cache_key, token, ttl)
+
+        logger.info(f"微信access_token已刷新，缓存 {ttl} 秒")
+        return token
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_access_token_provider():
+    """获取基于 settings.WECHAT_MINIPROGRAM 配置的共享 provider"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                wechat_config = getattr(settings, 'WECHAT_MINIPROGRAM', {})
+                _provider = WechatAccessTokenProvider(
+                    wechat_config.get('APPID', ''),
+                    wechat_config.get('APPSECRET', ''),
+                    base_url=wechat_config.get('API_BASE_URL')
+                )
+    return _provider
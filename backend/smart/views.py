@@ -1,20 +1,21 @@
 # smart/views.py
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.contrib.auth.models import User
 from django.conf import settings
 from .models import Welcome
-from api.models import UserProfile
+from api.http_cache import WELCOME, cache_public_response
+from api.responses import api_error, api_json, api_ok
+from api.token_utils import TokenManager
+from api.user_service import get_or_create_phone_user
+from api.wechat_client import get_wechat_client, WechatClientError
+from api.wechat_token import get_access_token_provider, WechatAPIError, WECHAT_TOKEN_EXPIRED_ERRCODES
 import json
-import requests
 import logging
-import hashlib
-import time
 
 logger = logging.getLogger(__name__)
 
 
 @csrf_exempt
+@cache_public_response(WELCOME)
 def welcome(request):
     """
     获取order最大的欢迎页图片
@@ -28,18 +29,18 @@ def welcome(request):
             # 构建完整的图片URL
             img_url = request.build_absolute_uri(res.img.url)
 
-            return JsonResponse({
+            return api_json({
                 'code': 100,
                 'msg': '成功',
                 'result': img_url,
                 'data': {
                     'img_url': img_url,
                     'order': res.order,
-                    'create_time': res.create_time.strftime('%Y-%m-%d %H:%M:%S')
+                    'create_time': res.create_time
                 }
             })
         else:
-            return JsonResponse({
+            return api_json({
                 'code': 101,
                 'msg': '暂无欢迎页图片',
                 'result': ''
@@ -47,7 +48,7 @@ def welcome(request):
 
     except Exception as e:
         logger.error(f"获取欢迎页图片失败: {str(e)}")
-        return JsonResponse({
+        return api_json({
             'code': 500,
             'msg': f'服务器错误: {str(e)}',
             'result': ''
@@ -59,15 +60,11 @@ def test_api(request):
     """
     测试接口，用于检查服务器是否正常运行
     """
-    return JsonResponse({
-        'code': 200,
-        'msg': '服务器运行正常',
-        'data': {
-            'server': 'http://127.0.0.1:8000',
-            'status': 'ok',
-            'service': 'smart_backend'
-        }
-    })
+    return api_ok({
+        'server': 'http://127.0.0.1:8000',
+        'status': 'ok',
+        'service': 'smart_backend'
+    }, '服务器运行正常')
 
 
 @csrf_exempt
@@ -93,55 +90,31 @@ def simple_login(request):
                     logger.info(f'开发环境模拟登录，手机号: {dev_phone}')
 
                     # 查找或创建用户
-                    try:
-                        user_profile = UserProfile.objects.get(phone=dev_phone)
-                        user = user_profile.user
-                        user.username = f"dev_{dev_phone}"
-                        user.save()
-                        logger.info(f'用户已存在: {user.id}')
-                    except UserProfile.DoesNotExist:
-                        # 创建测试用户
-                        user = User.objects.create_user(
-                            username=f"dev_{dev_phone}",
-                            password=None
-                        )
-                        user_profile = UserProfile.objects.create(
-                            user=user,
-                            phone=dev_phone,
-                            real_name=user_info.get('nickName', '开发用户'),
-                            student_id='',
-                            is_verified=False
-                        )
-                        logger.info(f'创建新用户: {user.id}')
-
-                    # 生成token
-                    token_str = f"{user.id}_{int(time.time())}_{dev_phone}"
-                    token = hashlib.md5(token_str.encode()).hexdigest()
-
-                    return JsonResponse({
-                        'code': 200,
-                        'msg': '登录成功',
-                        'data': {
-                            'user': {
-                                'id': user.id,
-                                'username': user.username,
-                                'nickname': user_profile.real_name,
-                                'phone': user_profile.phone,
-                                'avatar_url': user_info.get('avatarUrl', ''),
-                                'country_code': '86'
-                            },
-                            'token': token,
-                            'openid': f"dev_openid_{user.id}"
-                        }
-                    })
+                    user_profile, _ = get_or_create_phone_user(
+                        dev_phone, f"dev_{dev_phone}", user_info.get('nickName', '开发用户')
+                    )
+                    user = user_profile.user
+
+                    # 生成JWT令牌
+                    tokens = TokenManager.generate_tokens(user.id)
+
+                    return api_ok({
+                        'user': {
+                            'id': user.id,
+                            'username': user.username,
+                            'nickname': user_profile.real_name,
+                            'phone': user_profile.phone,
+                            'avatar_url': user_info.get('avatarUrl', ''),
+                            'country_code': '86'
+                        },
+                        'token': tokens['access_token'],
+                        **tokens,
+                        'openid': f"dev_openid_{user.id}"
+                    }, '登录成功')
 
                 # 真机环境：使用phone_code
                 if not phone_code:
-                    return JsonResponse({
-                        'code': 400,
-                        'msg': '缺少手机号授权码',
-                        'data': None
-                    })
+                    return api_error(400, '缺少手机号授权码')
 
                 # 获取微信配置
                 wechat_config = getattr(settings, 'WECHAT_MINIPROGRAM', {})
@@ -150,40 +123,27 @@ def simple_login(request):
 
                 if not appid or not appsecret:
                     logger.error('微信小程序配置缺失')
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': '微信小程序配置缺失',
-                        'data': None
-                    })
-
-                # 1. 获取微信access_token
-                token_url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={appid}&secret={appsecret}"
-                token_response = requests.get(token_url, timeout=10)
-                token_data = token_response.json()
-
-                if 'errcode' in token_data:
-                    logger.error(f"获取微信token失败: {token_data}")
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': f'获取微信token失败: {token_data.get("errmsg")}',
-                        'data': None
-                    })
-
-                access_token = token_data.get('access_token')
-                logger.info('获取微信access_token成功')
+                    return api_error(500, '微信小程序配置缺失')
+
+                # 1. 获取微信access_token（共享缓存）
+                token_provider = get_access_token_provider()
+                try:
+                    access_token = token_provider.get_token()
+                except WechatAPIError as e:
+                    logger.error(f"获取微信token失败: {e}")
+                    return api_error(500, f'获取微信token失败: {e.errmsg}')
+                except WechatClientError as e:
+                    logger.error(f"获取微信token失败: {e}")
+                    return api_error(500, f'获取微信token失败: {str(e)}')
 
                 # 2. 使用access_token和phone_code获取真实手机号
-                phone_url = f"https://api.weixin.qq.com/wxa/business/getuserphonenumber?access_token={access_token}"
-                phone_response = requests.post(phone_url, json={'code': phone_code}, timeout=10)
-                phone_data = phone_response.json()
+                phone_data = get_wechat_client().get_user_phone_number(access_token, phone_code)
 
                 if phone_data.get('errcode') != 0:
                     logger.error(f"获取手机号失败: {phone_data}")
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': f'获取手机号失败: {phone_data.get("errmsg")}',
-                        'data': None
-                    })
+                    if phone_data.get('errcode') in WECHAT_TOKEN_EXPIRED_ERRCODES:
+                        token_provider.invalidate(access_token)
+                    return api_error(500, f'获取手机号失败: {phone_data.get("errmsg")}')
 
                 # 3. 解析真实手机号
                 phone_info = phone_data.get('phone_info', {})
@@ -192,102 +152,49 @@ def simple_login(request):
 
                 if not pure_phone:
                     logger.error('无法解析手机号')
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': '无法解析手机号',
-                        'data': None
-                    })
+                    return api_error(500, '无法解析手机号')
 
                 logger.info(f'获取到真实手机号: {pure_phone}')
 
-                # 4. 查找或创建User和UserProfile
-                # 先查找是否已有该手机号的UserProfile
-                try:
-                    user_profile = UserProfile.objects.get(phone=pure_phone)
-                    user = user_profile.user
-                    # 更新用户信息
-                    user.username = f"wx_{pure_phone}"
-                    user.save()
-                    logger.info(f'用户已存在，更新信息: {user.id}')
-                except UserProfile.DoesNotExist:
-                    # 创建新User
-                    user = User.objects.create_user(
-                        username=f"wx_{pure_phone}",
-                        password=None  # 微信登录不需要密码
-                    )
-                    logger.info(f'创建新User: {user.id}')
-
-                    # 创建UserProfile
-                    user_profile = UserProfile.objects.create(
-                        user=user,
-                        phone=pure_phone,
-                        real_name=user_info.get('nickName', '微信用户'),
-                        student_id='',
-                        is_verified=False
-                    )
-                    logger.info(f'创建新UserProfile: {user_profile.id}')
-
-                # 5. 生成token
-                token_str = f"{user.id}_{int(time.time())}_{pure_phone}"
-                token = hashlib.md5(token_str.encode()).hexdigest()
-
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '登录成功',
-                    'data': {
-                        'user': {
-                            'id': user.id,
-                            'username': user.username,
-                            'nickname': user_profile.real_name,
-                            'phone': user_profile.phone,
-                            'avatar_url': user_info.get('avatarUrl', ''),
-                            'country_code': country_code
-                        },
-                        'token': token,
-                        'openid': f"openid_{user.id}"
-                    }
-                })
+                # 4. 查找或创建User和UserProfile（并发首次登录不会重复创建）
+                user_profile, _ = get_or_create_phone_user(
+                    pure_phone, f"wx_{pure_phone}", user_info.get('nickName', '微信用户')
+                )
+                user = user_profile.user
+
+                # 5. 生成JWT令牌
+                tokens = TokenManager.generate_tokens(user.id)
+
+                return api_ok({
+                    'user': {
+                        'id': user.id,
+                        'username': user.username,
+                        'nickname': user_profile.real_name,
+                        'phone': user_profile.phone,
+                        'avatar_url': user_info.get('avatarUrl', ''),
+                        'country_code': country_code
+                    },
+                    'token': tokens['access_token'],
+                    **tokens,
+                    'openid': f"openid_{user.id}"
+                }, '登录成功')
 
             else:
-                # 普通登录（向后兼容）
-                username = data.get('username', 'test')
-
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '登录成功',
-                    'data': {
-                        'user': {
-                            'id': 1,
-                            'username': username,
-                            'nickname': '测试用户'
-                        },
-                        'token': 'test_token_123456'
-                    }
-                })
+                # 只支持微信登录（旧的普通登录返回固定的测试令牌，无法通过令牌校验）
+                return api_error(400, '不支持的登录方式，请使用微信登录')
 
         except json.JSONDecodeError as e:
             logger.error(f'请求数据格式错误: {str(e)}')
-            return JsonResponse({
-                'code': 400,
-                'msg': '请求数据格式错误',
-                'data': None
-            })
+            return api_error(400, '请求数据格式错误')
         except Exception as e:
             logger.error(f'登录错误: {str(e)}')
-            return JsonResponse({
-                'code': 500,
-                'msg': f'服务器错误: {str(e)}',
-                'data': None
-            })
+            return api_error(500, f'服务器错误: {str(e)}')
 
-    return JsonResponse({
-        'code': 400,
-        'msg': '请使用POST请求',
-        'data': None
-    })
+    return api_error(400, '请使用POST请求')
 
 
 @csrf_exempt
+@cache_public_response(WELCOME)
 def get_welcome_images(request):
     """获取欢迎页图片列表"""
     try:
@@ -307,21 +214,14 @@ def get_welcome_images(request):
                 'order': img.order
             })
 
-        return JsonResponse({
-            'code': 200,
-            'msg': '获取成功',
-            'data': images_data
-        })
+        return api_ok(images_data, '获取成功')
     except Exception as e:
-        return JsonResponse({
-            'code': 500,
-            'msg': f'获取失败: {str(e)}',
-            'data': []
-        })
+        return api_error(500, f'获取失败: {str(e)}', data=[])
 
 
 @csrf_exempt
-def get_default_welcome(request):
+@cache_public_response(WELCOME)
+def get_default_welcome(request, image_name=None):
     """获取默认欢迎图片"""
     try:
         # 获取优先级最高的启用图片
@@ -331,18 +231,18 @@ def get_default_welcome(request):
         ).order_by('-order').first()
 
         if default_image and default_image.img:
-            return JsonResponse({
+            return api_json({
                 'code': 100,
                 'result': default_image.img.url
             })
         else:
-            return JsonResponse({
+            return api_json({
                 'code': 404,
                 'msg': '暂无欢迎页图片',
                 'result': ''
             })
     except Exception as e:
-        return JsonResponse({
+        return api_json({
             'code': 500,
             'msg': f'获取失败: {str(e)}',
             'result': ''
@@ -0,0 +1,270 @@
+# backend/smart_backend/cache.py
+"""
+两级缓存后端
+
+L1 是进程内的 LRU（短 TTL），L2 是多进程共享的缓存（Redis / memcached，测试时可用文件缓存）。
+读先查 L1，未命中再查 L2 并回填 L1；写、删除、add、incr 直接作用于 L2，同时更新本进程的 L1。
+其他进程的 L1 最多滞后 L1_TIMEOUT 秒，需要强一致的键（计数、锁）用 L1_EXCLUDE 前缀绕过 L1。
+
+键中第一个冒号之前的部分是命名空间（如 http_cache:xxx 的 http_cache），
+invalidate_namespace() 更换该命名空间的代号，其下所有键一次性失效。
+
+配置示例：
+    CACHES = {
+        'default': {
+            'BACKEND': 'smart_backend.cache.TwoTierCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+            'OPTIONS': {
+                'L2_BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+                'L1_EXCLUDE': ['rider_quota:', 'token_revocation:'],
+            },
+        }
+    }
+"""
+import time
+import pickle
+import threading
+from collections import OrderedDict
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+GENERATION_KEY_PREFIX = 'namespace_generation.'
+
+
+class LocalLRU:
+    """线程安全的进程内 LRU，值以 pickle 保存（与 LocMemCache 一致，避免调用方修改缓存中的对象）"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+        return True, pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache(BaseCache):
+    """L1 进程内 LRU + L2 共享缓存"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        l2_class = import_string(options.get('L2_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'))
+        self.l2 = l2_class(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'OPTIONS': options.get('L2_OPTIONS', {}),
+        })
+        self.l1 = LocalLRU(int(options.get('L1_MAX_ENTRIES', 1000)))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self.l1_exclude = tuple(options.get('L1_EXCLUDE', ()))
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+    # ===== 命名空间 =====
+
+    def _generation(self, namespace):
+        """命名空间当前代号；L2 中不存在时生成新的，保证不会命中失效前的键"""
+        key = GENERATION_KEY_PREFIX + namespace
+        hit, generation = self.l1.get(key)
+        if hit:
+            return generation
+        generation = self.l2.get(key)
+        if generation is None:
+            generation = time.time_ns()
+            if not self.l2.add(key, generation, None):
+                generation = self.l2.get(key, generation)
+        self.l1.set(key, generation, self.l1_timeout)
+        return generation
+
+    def invalidate_namespace(self, namespace):
+        """使命名空间下的所有键失效（其他进程最多滞后 L1_TIMEOUT 秒）"""
+        key = GENERATION_KEY_PREFIX + namespace
+        generation = time.time_ns()
+        self.l2.set(key, generation, None)
+        self.l1.set(key, generation, self.l1_timeout)
+
+    def _key(self, key):
+        namespace, sep, rest = key.partition(':')
+        if not sep:
+            return key
+        return f'{namespace}:{self._generation(namespace)}:{rest}'
+
+    # ===== L1 =====
+
+    def _l1_key(self, key, version):
+        return self.l2.make_and_validate_key(key, version=version)
+
+    def _use_l1(self, key):
+        return self.l1_timeout > 0 and not key.startswith(self.l1_exclude)
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.l1_timeout if timeout is None else min(self.l1_timeout, timeout)
+
+    def _fill_l1(self, key, value, version, timeout=DEFAULT_TIMEOUT):
+        if not self._use_l1(key):
+            return
+        ttl = self._l1_ttl(timeout)
+        if ttl > 0:
+            self.l1.set(self._l1_key(key, version), value, ttl)
+        else:
+            self.l1.delete(self._l1_key(key, version))
+
+    def _drop_l1(self, key, version):
+        self.l1.delete(self._l1_key(key, version))
+
+    def _record(self, name, count=1):
+        with self._stats_lock:
+            self._stats[name] += count
+
+    # ===== BaseCache 接口 =====
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key)
+        if self._use_l1(key):
+            hit, value = self.l1.get(self._l1_key(key, version))
+            if hit:
+                self._record('l1_hits')
+                return value
+
+        sentinel = object()
+        value = self.l2.get(key, sentinel, version=version)
+        if value is sentinel:
+            self._record('misses')
+            return default
+        self._record('l2_hits')
+        self._fill_l1(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        mapping = {self._key(key): key for key in keys}
+        found = {}
+        remaining = []
+        for key in mapping:
+            if self._use_l1(key):
+                hit, value = self.l1.get(self._l1_key(key, version))
+                if hit:
+                    found[key] = value
+                    continue
+            remaining.append(key)
+        self._record('l1_hits', len(found))
+
+        if remaining:
+            from_l2 = self.l2.get_many(remaining, version=version)
+            self._record('l2_hits', len(from_l2))
+            self._record('misses', len(remaining) - len(from_l2))
+            for key, value in from_l2.items():
+                self._fill_l1(key, value, version)
+            found.update(from_l2)
+        return {mapping[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key)
+        self.l2.set(key, value, timeout, version=version)
+        self._fill_l1(key, value, version, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {self._key(key): value for key, value in data.items()}
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            self._fill_l1(key, value, version, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._fill_l1(key, value, version, timeout)
+        else:
+            self._drop_l1(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key)
+        self._drop_l1(key, version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        key = self._key(key)
+        self._drop_l1(key, version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key) for key in keys]
+        for key in keys:
+            self._drop_l1(key, version)
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        key = self._key(key)
+        if self._use_l1(key) and self.l1.get(self._l1_key(key, version))[0]:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key)
+        self._drop_l1(key, version)
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        key = self._key(key)
+        self._drop_l1(key, version)
+        return self.l2.decr(key, delta, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    # ===== 统计 =====
+
+    def stats(self):
+        """本进程的命中统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        stats.update({
+            'lookups': lookups,
+            'hit_rate': round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else None,
+            'l1_hit_rate': round(stats['l1_hits'] / lookups, 4) if lookups else None,
+            'l1_entries': len(self.l1),
+            'l2_backend': f'{type(self.l2).__module__}.{type(self.l2).__name__}',
+        })
+        return stats
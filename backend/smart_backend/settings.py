@@ -377,6 +377,7 @@ if not DEBUG and (not WECHAT_MINIPROGRAM_APPID or not WECHAT_MINIPROGRAM_APPSECR
 WECHAT_MINIPROGRAM = {
     'APPID': WECHAT_MINIPROGRAM_APPID or '',
     'APPSECRET': WECHAT_MINIPROGRAM_APPSECRET or '',
+    'API_BASE_URL': os.environ.get('WECHAT_API_BASE_URL', 'https://api.weixin.qq.com'),
 }
 
 # 微信支付配置 - 必须从环境变量获取
@@ -517,6 +518,35 @@ CACHES = {
     }
 }
 
+# 两级缓存（CACHE_BACKEND=smart_backend.cache.TwoTierCache）：进程内 L1 + 共享 L2，CACHE_LOCATION 为 L2 地址
+if CACHES['default']['BACKEND'] == 'smart_backend.cache.TwoTierCache':
+    CACHES['default']['OPTIONS'] = {
+        'L2_BACKEND': os.environ.get('CACHE_L2_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'L1_TIMEOUT': float(os.environ.get('CACHE_L1_TIMEOUT', '5')),
+        'L1_MAX_ENTRIES': int(os.environ.get('CACHE_L1_MAX_ENTRIES', '1000')),
+        # 需要各进程立即一致的键（配额计数、微信 access_token）不经过 L1
+        'L1_EXCLUDE': [prefix for prefix in os.environ.get('CACHE_L1_EXCLUDE', 'rider_quota:,wechat:,token_revocation:').split(',')
+                       if prefix],
+    }
+
+# 骑手接单配额计数：cache（多进程共享，使用上面的缓存；未配置共享缓存时按数据库统计）/ db / memory（仅单进程）
+RIDER_QUOTA_BACKEND = os.environ.get('RIDER_QUOTA_BACKEND', 'cache')
+
+# 骑手新订单推送的发布/订阅：配置了 Redis（ORDER_FEED_REDIS_URL，默认取 Redis 缓存地址）时
+# 默认使用多进程共享的 RedisBroker；进程内 broker 只在 DEBUG 或声明单进程部署时提供推送
+_redis_cache_location = CACHES['default']['LOCATION'] if CACHES['default']['LOCATION'].startswith('redis') else ''
+ORDER_FEED_REDIS_URL = os.environ.get('ORDER_FEED_REDIS_URL', _redis_cache_location)
+ORDER_FEED_BROKER = os.environ.get(
+    'ORDER_FEED_BROKER', 'api.order_feed.RedisBroker' if ORDER_FEED_REDIS_URL else 'api.order_feed.InProcessBroker'
+)
+ORDER_FEED_SINGLE_PROCESS = os.environ.get('ORDER_FEED_SINGLE_PROCESS', 'False').lower() in ('true', '1', 't')
+
+# 接口 JSON 序列化：auto（已安装 orjson 时使用）/ orjson / json（标准库）
+API_JSON_ENCODER = os.environ.get('API_JSON_ENCODER', 'auto')
+
+# 公开只读接口（公告、订单分类、欢迎页）的响应缓存秒数，数据变更时自动失效
+PUBLIC_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('PUBLIC_RESPONSE_CACHE_TIMEOUT', '600'))
+
 # 邮件配置
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', '')